@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import CacheVersion
+
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+def dashboard_version_key(user_id):
+    return f'dashboard_version:{user_id}'
+
+
+def dashboard_cache_key(user_id):
+    """The cache key of the user's dashboard under its current version.
+
+    Look it up before reading the dashboard data, and store the data under
+    the same key.
+    """
+    version, = get_versions(dashboard_version_key(user_id))
+    return f'dashboard:{user_id}:{version}'
+
+
+def get_cached_dashboard(cache_key):
+    return cache.get(cache_key)
+
+
+def set_cached_dashboard(cache_key, data):
+    cache.set(cache_key, data, DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_dashboard(*user_ids):
+    """Retire cached dashboards; called whenever balances, budgets or goals change.
+
+    Bumps the users' dashboard versions in the database, inside the
+    surrounding transaction, so every server process stops serving the
+    dashboards it cached. Call it in the transaction making the change, or
+    after the change has been written.
+    """
+    keys = [dashboard_version_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        bump_versions(*keys)
+
+
+def bump_versions(*keys):
+    """Move the version counters of ``keys`` on.
+
+    The counters live in the database rather than the cache, which is local
+    to each server process, so every process sees a bump. The update is part
+    of the surrounding transaction: it commits together with the change it
+    announces and rolls back with it.
+    """
+    keys = sorted(set(keys))
+    # Counters never bumped read as 0; the row is created first so that two
+    # first bumps racing each other both count
+    CacheVersion.objects.bulk_create([CacheVersion(key=key) for key in keys], ignore_conflicts=True)
+    CacheVersion.objects.filter(key__in=keys).update(version=F('version') + 1)
+
+
+def get_versions(*keys):
+    """The current counters of ``keys``, in order, read with one query.
+
+    Read them before the rows they guard: data cached under a version is
+    then never older than that version.
+    """
+    versions = dict(CacheVersion.objects.filter(key__in=keys).values_list('key', 'version'))
+    return tuple(versions.get(key, 0) for key in keys)
@@ -74,3 +74,16 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"Profile for {self.user.email}"
+
+
+class CacheVersion(models.Model):
+    """A counter bumped whenever the rows behind a cache change.
+
+    Every server process reads the counter into its cache keys, so a bump
+    committed by one process invalidates the entries cached by all of them.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
@@ -0,0 +1,131 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNRESOLVED = '<unresolved>'
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts the queries of a request and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class Series:
+    """Aggregates for one (view, method) pair; bucket counts are stored non-cumulative"""
+    __slots__ = ('requests', 'latency_sum', 'latency_buckets', 'query_sum', 'query_buckets', 'db_seconds')
+
+    def __init__(self):
+        self.requests = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.query_sum = 0
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.db_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Request metrics aggregated in this process.
+
+    Each server process keeps its own registry, so with several workers
+    every scrape sees the process that served it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, method, seconds, queries, db_seconds):
+        latency_bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        query_bucket = bisect_left(QUERY_BUCKETS, queries)
+        with self._lock:
+            series = self._series.get((view, method))
+            if series is None:
+                series = self._series[(view, method)] = Series()
+            series.requests += 1
+            series.latency_sum += seconds
+            series.latency_buckets[latency_bucket] += 1
+            series.query_sum += queries
+            series.query_buckets[query_bucket] += 1
+            series.db_seconds += db_seconds
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            snapshot = [
+                (view, method, series.requests, series.latency_sum, list(series.latency_buckets),
+                 series.query_sum, list(series.query_buckets), series.db_seconds)
+                for (view, method), series in sorted(self._series.items())
+            ]
+
+        lines = [
+            '# HELP ecofin_http_requests_total Requests handled, by resolved URL name and method.',
+            '# TYPE ecofin_http_requests_total counter',
+        ]
+        for view, method, requests, *_ in snapshot:
+            lines.append(f'ecofin_http_requests_total{{{_labels(view, method)}}} {requests}')
+
+        lines += [
+            '# HELP ecofin_http_request_duration_seconds Time to produce the response.',
+            '# TYPE ecofin_http_request_duration_seconds histogram',
+        ]
+        for view, method, requests, latency_sum, latency_buckets, *_ in snapshot:
+            lines += _histogram('ecofin_http_request_duration_seconds', _labels(view, method),
+                                LATENCY_BUCKETS, latency_buckets, latency_sum, requests)
+
+        lines += [
+            '# HELP ecofin_http_request_queries Database queries run per request.',
+            '# TYPE ecofin_http_request_queries histogram',
+        ]
+        for view, method, requests, _, _, query_sum, query_buckets, _ in snapshot:
+            lines += _histogram('ecofin_http_request_queries', _labels(view, method),
+                                QUERY_BUCKETS, query_buckets, query_sum, requests)
+
+        lines += [
+            '# HELP ecofin_http_request_db_seconds_total Time spent in database queries.',
+            '# TYPE ecofin_http_request_db_seconds_total counter',
+        ]
+        for view, method, *_, db_seconds in snapshot:
+            lines.append(f'ecofin_http_request_db_seconds_total{{{_labels(view, method)}}} {db_seconds!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method):
+    return f'view="{_escape(view)}",method="{_escape(method)}"'
+
+
+def _histogram(name, labels, bounds, buckets, total, count):
+    lines = []
+    cumulative = 0
+    for bound, observed in zip(bounds, buckets):
+        cumulative += observed
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total!r}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+    return lines
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,55 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import UNRESOLVED, QueryTimer, registry
+from .profiling import profile_request, profile_trigger
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """Record latency, query count and database time per resolved URL name and method.
+
+    Listed first in MIDDLEWARE so the timings include the other middleware.
+    Queries run while a streaming response is consumed fall outside the
+    request and are not counted. Served by /api/_metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        # Clients choose the method, so unknown ones share a label
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        registry.observe(view, method, elapsed, timer.count, timer.seconds)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests that staff ask for with an X-Profile header, or a sampled share of all requests.
+
+    Captures go to the ring buffer in api.profiling and are downloaded from
+    /api/_profiles/. A request that is not profiled only pays for the trigger
+    check. Listed after AuthenticationMiddleware so session users are known.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, trigger)
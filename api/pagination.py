@@ -0,0 +1,172 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on (created_at, id), newest first.
+
+    Each page is a range seek past the last row of the previous one, so pages
+    cost the same however deep the client scrolls; no OFFSET and no COUNT(*).
+    Subclasses can order on another column through ``ordering_field`` and
+    ``parse_position``.
+    """
+    ordering_field = 'created_at'
+    parse_position = staticmethod(datetime.fromisoformat)
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        field = self.ordering_field
+        if cursor is None:
+            self.reverse = False
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            self.reverse, position, pk = cursor
+            if self.reverse:
+                # Walking back towards newer rows
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gte': position}) & (Q(**{f'{field}__gt': position}) | Q(id__gt=pk))
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lte': position}) & (Q(**{f'{field}__lt': position}) | Q(id__lt=pk))
+                ).order_by(f'-{field}', '-id')
+
+        # Fetch one extra row to learn whether another page exists
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, position, pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return direction == 'p', self.parse_position(position), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        raw = f"{'p' if reverse else 'n'}|{getattr(obj, self.ordering_field).isoformat()}|{obj.pk}"
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, b64encode(raw.encode('ascii')).decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ContributionCursorPagination(KeysetPagination):
+    """Cursor pagination over a goal's contributions on (date, id), newest first"""
+    ordering_field = 'date'
+    parse_position = staticmethod(date.fromisoformat)
+
+
+class SearchCursorPagination(KeysetPagination):
+    """Forward-only cursor over (rank, id) for ranked full-text results.
+
+    The search callable receives the (rank, id) to seek past, or None for the
+    first page, and the number of rows to return.
+    """
+    page_size = 50
+    max_page_size = 200
+
+    def paginate_search(self, request, search):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        rows = search(self.decode_rank_cursor(request), self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return [pk for pk, rank in self.page]
+
+    def decode_rank_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            rank, pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return float(rank), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        pk, rank = self.page[-1]
+        raw = f'{rank!r}|{pk}'
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, b64encode(raw.encode('ascii')).decode('ascii'))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,169 @@
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Staff send "X-Profile: 1" to have a request profiled
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+DEFAULT_BUFFER_SIZE = 50
+
+# cProfile cannot run two profilers at once on newer Pythons, so one request
+# is profiled at a time; requests arriving meanwhile run unprofiled
+_profiler_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+class QueryRecorder:
+    """connection.execute_wrapper keeping the SQL of a request and each statement's duration.
+
+    Parameters are not kept, so captures hold no customer data.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+
+class Capture:
+    """One profiled request"""
+
+    def __init__(self, request, response, profiler, queries, seconds, trigger):
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        self.id = next(_ids)
+        self.captured_at = timezone.now()
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.view = match.view_name if match else None
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        self.status = response.status_code
+        self.seconds = seconds
+        self.trigger = trigger
+        self.queries = queries
+        self.profiler = profiler
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'captured_at': self.captured_at,
+            'method': self.method,
+            'path': self.path,
+            'view': self.view,
+            'user': self.user_id,
+            'status': self.status,
+            'duration_ms': round(self.seconds * 1000, 2),
+            'query_count': len(self.queries),
+            'query_ms': round(sum(seconds for sql, seconds in self.queries) * 1000, 2),
+            'trigger': self.trigger,
+        }
+
+    def report(self, limit=40):
+        """The summary plus the SQL and the most expensive functions by cumulative time"""
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return {
+            **self.summary(),
+            'sql': [{'sql': sql, 'ms': round(seconds * 1000, 3)} for sql, seconds in self.queries],
+            'profile': stream.getvalue(),
+        }
+
+    def profile_data(self):
+        """The profile in the pstats file format, for snakeviz or pstats.Stats"""
+        return marshal.dumps(self.profiler.stats)
+
+
+class CaptureBuffer:
+    """The most recent captures; the oldest is dropped once the buffer is full"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._captures = deque(maxlen=size)
+
+    def add(self, capture):
+        with self._lock:
+            self._captures.append(capture)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._captures))
+
+    def get(self, capture_id):
+        with self._lock:
+            return next((capture for capture in self._captures if capture.id == capture_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._captures.clear()
+
+
+captures = CaptureBuffer(getattr(settings, 'PROFILE_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+
+
+def profile_trigger(request):
+    """Why the request should be profiled ('header' or 'sample'), or None"""
+    if PROFILE_HEADER in request.META:
+        return 'header' if is_staff_request(request) else None
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def is_staff_request(request):
+    """Whether a session user or a JWT bearer is staff; usable in middleware and plain views"""
+    # API clients authenticate in the view, so a JWT is checked here as well
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(authenticated and authenticated[0].is_staff)
+
+
+def profile_request(request, get_response, trigger):
+    """Run the request under cProfile with its SQL recorded, and keep the capture.
+
+    Returns the response; if another request is being profiled, this one
+    simply runs unprofiled.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        seconds = time.perf_counter() - started
+        profiler.create_stats()
+    finally:
+        _profiler_lock.release()
+
+    captures.add(Capture(request, response, profiler, recorder.queries, seconds, trigger))
+    return response
@@ -0,0 +1,28 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer
+
+
+class CSVRenderer(BaseRenderer):
+    """Renderer for CSV endpoints.
+
+    Successful responses are streamed by the view itself; this renderer only
+    needs to negotiate the ``.csv`` format and render error payloads.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if isinstance(data, dict):
+            for key, value in data.items():
+                writer.writerow([key, value])
+        else:
+            writer.writerow([data])
+        return buffer.getvalue().encode(self.charset)
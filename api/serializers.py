@@ -1,9 +1,14 @@
+from decimal import Decimal
+from django.db import models
 from rest_framework import serializers
 from accounts.models import User, UserProfile
-from banking.models import Account, Transaction, Transfer, Statement
+from banking.models import Account, Transaction, Transfer, Statement, DailyBalance
 from transactions.models import Category, EnhancedTransaction, Tag, RecurringGroup
 from budgets.models import Budget, BudgetItem
+from budgets.counters import spent_for_budgets
+from budgets.evaluation import progress_percentage
 from goals.models import Goal, GoalContribution
+from goals.forecasting import forecast_goals
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -47,6 +52,11 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'account', 'account_number', 'transaction_type', 'amount', 'balance_after', 'description', 'created_at', 'reference_number']
         read_only_fields = ['id', 'account', 'transaction_type', 'amount', 'balance_after', 'created_at', 'reference_number']
 
+class DailyBalanceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyBalance
+        fields = ['date', 'opening_balance', 'closing_balance', 'transaction_count', 'total_debits', 'total_credits']
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -62,27 +72,72 @@ class EnhancedTransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'bank_transaction', 'category', 'category_name', 'notes', 'location', 'is_recurring', 'is_split']
         read_only_fields = ['id', 'bank_transaction']
 
+def budget_item_spent(context, budgets):
+    """Spent per budget item, read from the spend counters once per serialization"""
+    spent = context.setdefault('budget_item_spent', {})
+    evaluated = context.setdefault('evaluated_budgets', set())
+    pending = {budget.pk: budget for budget in budgets if budget.pk not in evaluated}
+    if pending:
+        spent.update(spent_for_budgets(pending.values()))
+        evaluated.update(pending)
+    return spent
+
+class BudgetSpentListSerializer(serializers.ListSerializer):
+    """Reads spend for every budget in the list with one query before serializing"""
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        budget_item_spent(self.context, {self.child.get_budget(instance) for instance in instances})
+        return super().to_representation(instances)
+
 class BudgetItemSerializer(serializers.ModelSerializer):
     category_name = serializers.ReadOnlyField(source='category.name')
-    spent = serializers.ReadOnlyField()
-    remaining = serializers.ReadOnlyField()
-    progress_percentage = serializers.ReadOnlyField()
+    spent = serializers.SerializerMethodField()
+    remaining = serializers.SerializerMethodField()
+    progress_percentage = serializers.SerializerMethodField()
 
     class Meta:
         model = BudgetItem
         fields = ['id', 'budget', 'category', 'category_name', 'amount', 'spent', 'remaining', 'progress_percentage']
         read_only_fields = ['id', 'budget']
+        list_serializer_class = BudgetSpentListSerializer
+
+    def get_budget(self, obj):
+        return obj.budget
+
+    def get_spent(self, obj):
+        return budget_item_spent(self.context, [obj.budget])[obj.pk]
+
+    def get_remaining(self, obj):
+        return obj.amount - self.get_spent(obj)
+
+    def get_progress_percentage(self, obj):
+        return progress_percentage(obj.amount, self.get_spent(obj))
 
 class BudgetSerializer(serializers.ModelSerializer):
     items = BudgetItemSerializer(many=True, read_only=True)
-    spent = serializers.ReadOnlyField()
-    remaining = serializers.ReadOnlyField()
-    progress_percentage = serializers.ReadOnlyField()
+    spent = serializers.SerializerMethodField()
+    remaining = serializers.SerializerMethodField()
+    progress_percentage = serializers.SerializerMethodField()
 
     class Meta:
         model = Budget
         fields = ['id', 'name', 'amount', 'period', 'start_date', 'end_date', 'is_active', 'created_at', 'updated_at', 'items', 'spent', 'remaining', 'progress_percentage']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = BudgetSpentListSerializer
+
+    def get_budget(self, obj):
+        return obj
+
+    def get_spent(self, obj):
+        spent = budget_item_spent(self.context, [obj])
+        return sum((spent[item.pk] for item in obj.items.all()), Decimal('0.00'))
+
+    def get_remaining(self, obj):
+        return obj.amount - self.get_spent(obj)
+
+    def get_progress_percentage(self, obj):
+        return progress_percentage(obj.amount, self.get_spent(obj))
 
 class GoalContributionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -90,13 +145,87 @@ class GoalContributionSerializer(serializers.ModelSerializer):
         fields = ['id', 'goal', 'amount', 'date', 'notes', 'from_account']
         read_only_fields = ['id', 'goal']
 
+def goal_forecasts(context, goals):
+    """Forecasts per goal, evaluated for every goal in the list at once"""
+    forecasts = context.setdefault('goal_forecasts', {})
+    pending = [goal for goal in goals if goal.pk not in forecasts]
+    if pending:
+        forecasts.update(forecast_goals(pending))
+    return forecasts
+
+class GoalForecastListSerializer(serializers.ListSerializer):
+    """Forecasts every goal in the list in one pass before serializing"""
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        goal_forecasts(self.context, instances)
+        return super().to_representation(instances)
+
 class GoalSerializer(serializers.ModelSerializer):
-    contributions = GoalContributionSerializer(many=True, read_only=True)
+    """A goal with summary contribution stats; the history is under /goals/{id}/contributions/"""
+    contribution_count = serializers.SerializerMethodField()
+    contribution_total = serializers.SerializerMethodField()
+    last_contribution_date = serializers.SerializerMethodField()
+    contributed_30d = serializers.SerializerMethodField()
+    contributed_90d = serializers.SerializerMethodField()
     progress_percentage = serializers.ReadOnlyField()
-    days_remaining = serializers.ReadOnlyField()
-    is_on_track = serializers.ReadOnlyField()
+    days_remaining = serializers.SerializerMethodField()
+    is_on_track = serializers.SerializerMethodField()
+    projected_completion_date = serializers.SerializerMethodField()
+    required_monthly_contribution = serializers.SerializerMethodField()
 
     class Meta:
         model = Goal
-        fields = ['id', 'name', 'goal_type', 'target_amount', 'current_amount', 'start_date', 'target_date', 'status', 'description', 'icon', 'color', 'created_at', 'updated_at', 'contributions', 'progress_percentage', 'days_remaining', 'is_on_track']
+        fields = ['id', 'name', 'goal_type', 'target_amount', 'current_amount', 'start_date', 'target_date', 'status', 'description', 'icon', 'color', 'created_at', 'updated_at', 'contribution_count', 'contribution_total', 'last_contribution_date', 'contributed_30d', 'contributed_90d', 'progress_percentage', 'days_remaining', 'is_on_track', 'projected_completion_date', 'required_monthly_contribution']
         read_only_fields = ['id', 'current_amount', 'created_at', 'updated_at']
+        list_serializer_class = GoalForecastListSerializer
+
+    # The stats are annotated by goals.forecasting.with_contribution_stats; a
+    # goal that was just created has no contributions yet
+
+    def get_contribution_count(self, obj):
+        return getattr(obj, 'contribution_count', 0)
+
+    def get_contribution_total(self, obj):
+        return getattr(obj, 'contribution_total', None) or Decimal('0.00')
+
+    def get_last_contribution_date(self, obj):
+        return getattr(obj, 'last_contribution_date', None)
+
+    def get_contributed_30d(self, obj):
+        """Amount contributed over the last 30 days"""
+        return getattr(obj, 'contributed_30d', None) or Decimal('0.00')
+
+    def get_contributed_90d(self, obj):
+        """Amount contributed over the last 90 days"""
+        return getattr(obj, 'contributed_90d', None) or Decimal('0.00')
+
+    def get_forecast(self, obj):
+        return goal_forecasts(self.context, [obj])[obj.pk]
+
+    def get_days_remaining(self, obj):
+        return self.get_forecast(obj).days_remaining
+
+    def get_is_on_track(self, obj):
+        return self.get_forecast(obj).is_on_track
+
+    def get_projected_completion_date(self, obj):
+        return self.get_forecast(obj).projected_completion_date
+
+    def get_required_monthly_contribution(self, obj):
+        return self.get_forecast(obj).required_monthly_contribution
+
+class PostingSerializer(serializers.Serializer):
+    """A single deposit or withdrawal within a bulk postings request"""
+    account = serializers.IntegerField()
+    transaction_type = serializers.ChoiceField(choices=['deposit', 'withdrawal'])
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    description = serializers.CharField(required=False, allow_blank=True)
+
+class ContributionPostingSerializer(serializers.Serializer):
+    """A single goal contribution within a bulk contribute request"""
+    goal = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    account = serializers.IntegerField(required=False, allow_null=True)
+    date = serializers.DateField(required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
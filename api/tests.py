@@ -1,3 +1,487 @@
-from django.test import TestCase
+import csv
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from banking.filters import day_start
+from banking.models import Account, AccountType, DailyBalance, Statement
+from transactions.models import Category, EnhancedTransaction
+from transactions.rollups import rebuild_rollups
+from transactions.search import search_ranked
+from budgets.models import Budget, BudgetItem
+from goals.models import Goal, GoalContribution
+
+from .metrics import registry
+from .profiling import captures
+
+
+class QueryPlanTests(TestCase):
+    """Run EXPLAIN QUERY PLAN on the SQL issued by hot paths and fail on full table scans"""
+
+    # Plan lines like "SCAN banking_transaction" or "SCAN banking_transaction USING INDEX ..."
+    # mean every row is visited; "SEARCH ..." means an index seek. "SCAN <fts table>
+    # VIRTUAL TABLE INDEX ..." is a full-text index lookup, not a table scan
+    FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE)')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='plans@example.com', password='x', first_name='Plan', last_name='Test')
+        other = User.objects.create_user(email='other@example.com', password='x', first_name='Other', last_name='User')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        cls.account = Account.objects.create(user=cls.user, account_type=account_type, account_number='PLAN0001')
+        other_account = Account.objects.create(user=other, account_type=account_type, account_number='PLAN0002')
+
+        cls.category = category = Category.objects.create(name='Food', category_type='expense', is_system=True)
+        for account in (cls.account, other_account):
+            account.deposit(Decimal('500.00'))
+            for _ in range(3):
+                txn = account.transactions.create(
+                    transaction_type='withdrawal', amount=Decimal('10.00'), description='Groceries'
+                )
+                EnhancedTransaction.objects.create(bank_transaction=txn, category=category)
+
+        budget = Budget.objects.create(user=cls.user, name='Monthly', amount=Decimal('300.00'))
+        cls.budget_item = BudgetItem.objects.create(budget=budget, category=category, amount=Decimal('100.00'))
+        Goal.objects.create(user=cls.user, name='Holiday', goal_type='travel',
+                            target_amount=Decimal('1000.00'), target_date='2030-01-01')
+
+    def setUp(self):
+        # A cached dashboard would hide the queries under test
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNoFullScans(self, queries):
+        selects = [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, 'No SELECT statements were captured')
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                scans = self.FULL_SCAN.findall(plan)
+                self.assertFalse(scans, f'Full table scan of {scans} in plan:\n{plan}\nfor query:\n{sql}')
+
+    def test_transaction_list_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/', {
+                'account': self.account.id,
+                'transaction_type': 'withdrawal',
+                'start_date': '2000-01-01',
+                'end_date': '2100-01-01',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(queries)
+
+    def test_budget_item_spent_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.budget_item.spent
+        self.assertNoFullScans(queries)
+
+    def test_account_statement_query_plan(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/banking/accounts/{self.account.account_number}/statement/', {
+                'start_date': '2000-01-01',
+                'end_date': '2100-01-01',
+                'format': 'csv',
+            })
+            # The CSV is streamed, so its query only runs as the body is consumed
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(queries)
+
+    def test_account_statement_page_query_plan(self):
+        # Closed periods, so the statement is built and stored: first from the
+        # checkpoints, then from the transactions of an account without any
+        self.client.force_login(self.user)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        for end_date in (yesterday, yesterday - timedelta(days=1)):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/banking/accounts/{self.account.account_number}/statement/', {
+                    'start_date': '2000-01-01',
+                    'end_date': end_date.isoformat(),
+                })
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(Statement.objects.filter(account=self.account, end_date=end_date).exists())
+            self.assertNoFullScans(queries)
+            DailyBalance.objects.filter(account=self.account).delete()
+
+    def test_dashboard_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(queries)
+
+    def test_category_totals_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/by_category/', {'period': 'this_month'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['Food']['count'], 3)
+        self.assertLessEqual(len(queries), 2)
+        self.assertNoFullScans(queries)
+
+    def test_cashflow_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/analytics/cashflow/', {'granularity': 'week'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(row['transaction_count'] for row in response.json()['results']), 4)
+        self.assertNoFullScans(queries)
+
+    def test_category_rollup_query_plan(self):
+        child = Category.objects.create(name='Groceries', category_type='expense', user=self.user, parent=self.category)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/categories/{self.category.pk}/rollup/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['subcategories'], [child.pk])
+        self.assertEqual(response.json()['count'], 3)
+        self.assertNoFullScans(queries)
+
+    def test_transaction_search_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/search/', {'q': 'grocer', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+        self.assertNoFullScans(queries)
+
+    def test_goal_list_query_plan(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/goals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('required_monthly_contribution', response.json()[0])
+        self.assertEqual(len(queries), 1)
+        self.assertNoFullScans(queries)
+
+    def test_goal_contributions_query_plan(self):
+        goal = Goal.objects.get(user=self.user)
+        for day in ('2026-01-01', '2026-02-01', '2026-03-01'):
+            GoalContribution.objects.create(goal=goal, amount=Decimal('25.00'), date=day)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/goals/{goal.pk}/contributions/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['date'] for row in response.json()['results']], ['2026-03-01', '2026-02-01'])
+        self.assertIsNotNone(response.json()['next'])
+        self.assertNoFullScans(queries)
+
+
+class DashboardCacheTests(TestCase):
+    """The cached dashboard is keyed by a version every server process reads from the database"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='dash@example.com', password='x', first_name='Dash', last_name='Board')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='DASH0001')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def total_balance(self):
+        return Decimal(str(self.client.get('/api/users/dashboard/').json()['account_summary']['total_balance']))
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.total_balance()
+        with CaptureQueriesContext(connection) as queries:
+            self.total_balance()
+        # Only the version lookup
+        self.assertEqual(len(queries), 1)
+
+    def test_posting_invalidates_cached_dashboard(self):
+        self.assertEqual(self.total_balance(), Decimal('0.00'))
+        self.account.deposit(Decimal('125.00'))
+        self.assertEqual(self.total_balance(), Decimal('125.00'))
+        self.account.withdraw(Decimal('25.00'))
+        self.assertEqual(self.total_balance(), Decimal('100.00'))
+
+
+class BulkPostingTests(TestCase):
+    """The bulk postings endpoint reports each item's outcome"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='bulk@example.com', password='x', first_name='Bulk', last_name='Test')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='BULK0001')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_items_succeed_and_fail_independently(self):
+        response = self.client.post('/api/accounts/bulk-postings/', {'postings': [
+            {'account': self.account.pk, 'transaction_type': 'deposit', 'amount': '40.00'},
+            {'account': self.account.pk, 'transaction_type': 'withdrawal', 'amount': '-5'},
+            {'account': self.account.pk, 'transaction_type': 'withdrawal', 'amount': '90.00'},
+            {'account': self.account.pk, 'transaction_type': 'withdrawal', 'amount': '15.00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['success'], body['posted'], body['failed']), (False, 2, 2))
+        results = body['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertIn('amount', results[1]['error'])
+        self.assertEqual(results[2]['error'], 'Insufficient funds')
+        self.assertEqual(Decimal(results[3]['balance_after']), Decimal('25.00'))
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('25.00'))
+
+
+class AccountLinkingTests(TestCase):
+    """Discovery lists only unlinked accounts under the user's email, and linking is idempotent"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='link@example.com', password='x', first_name='Link', last_name='Test')
+        other = User.objects.create_user(email='notme@example.com', password='x', first_name='Not', last_name='Me')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.linked = Account.objects.create(user=self.user, account_type=account_type, account_number='LINK0001')
+        self.foreign = Account.objects.create(user=other, account_type=account_type, account_number='LINK0002')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_available_excludes_linked_and_foreign_accounts(self):
+        response = self.client.get('/api/accounts/available/')
+        self.assertEqual(response.status_code, 200)
+        numbers = {account['account_number'] for account in response.json()}
+        self.assertNotIn(self.linked.account_number, numbers)
+        self.assertNotIn(self.foreign.account_number, numbers)
+
+    def test_foreign_accounts_cannot_be_linked(self):
+        response = self.client.post('/api/accounts/link/', {'account_ids': [self.foreign.pk]}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Account.objects.filter(user=self.user).count(), 1)
+
+    def test_relinking_is_a_no_op(self):
+        for _ in range(2):
+            response = self.client.post('/api/accounts/link/', {'account_ids': [self.linked.pk, self.linked.pk]}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['accounts'], [])
+        self.assertEqual(list(Account.objects.filter(user=self.user)), [self.linked])
+        self.assertEqual(Account.objects.count(), 2)
+
+
+class KeysetPaginationTests(TestCase):
+    """Transaction pages seek past (created_at, id), so rows sharing a timestamp are neither skipped nor repeated"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='pages@example.com', password='x', first_name='Page', last_name='Test')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        account = Account.objects.create(user=self.user, account_type=account_type, account_number='PAGE0001')
+        for n in range(7):
+            account.transactions.create(transaction_type='deposit', amount=Decimal('1.00'), description=f'Deposit {n}')
+        # Five rows share one timestamp; the newest and oldest stand apart
+        now = timezone.now()
+        ids = list(account.transactions.order_by('pk').values_list('pk', flat=True))
+        account.transactions.filter(pk__in=ids[1:6]).update(created_at=now - timedelta(hours=1))
+        account.transactions.filter(pk=ids[0]).update(created_at=now - timedelta(hours=2))
+        account.transactions.filter(pk=ids[6]).update(created_at=now)
+        self.expected = [ids[6]] + ids[5:0:-1] + [ids[0]]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_next_walks_every_row_once_and_previous_returns(self):
+        pages = []
+        url = '/api/transactions/?page_size=3'
+        while url:
+            body = self.client.get(url).json()
+            pages.append(body)
+            url = body['next']
+        seen = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.client.get(pages[1]['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], self.expected[:3])
+        self.assertIsNone(previous['previous'])
+
+
+class SearchPaginationTests(TestCase):
+    """Search pages seek past (rank, id), so every match is served once in rank order"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='ranked@example.com', password='x', first_name='Rank', last_name='Ed')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        account = Account.objects.create(user=self.user, account_type=account_type, account_number='RANK0001')
+        # Identical descriptions tie on rank; the others rank apart
+        for description in ['Coffee'] * 3 + ['Coffee beans and more coffee'] * 2 + ['Morning coffee at the station']:
+            account.transactions.create(transaction_type='withdrawal', amount=Decimal('3.00'), description=description)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_every_match_in_rank_order(self):
+        ranked = search_ranked(self.user, 'coffee', limit=100)
+        expected = [pk for pk, rank in ranked]
+        self.assertEqual(len(expected), 6)
+        # Page boundaries fall inside runs of equal rank
+        self.assertEqual(len({rank for pk, rank in ranked}), 3)
+        seen = []
+        url = '/api/transactions/search/?q=coffee&page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            seen += [row['id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(seen, expected)
+
+
+class CashFlowTests(TestCase):
+    """The cash-flow series follows the ledger's postings, bucketed by week or month"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='flow@example.com', password='x', first_name='Cash', last_name='Flow')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        checking = Account.objects.create(user=self.user, account_type=account_type, account_number='FLOW0001')
+        savings = Account.objects.create(user=self.user, account_type=account_type, account_number='FLOW0002')
+        for day, post in (
+            (date(2026, 1, 15), lambda: checking.deposit(Decimal('200.00'))),
+            (date(2026, 1, 20), lambda: checking.withdraw(Decimal('50.00'))),
+            (date(2026, 2, 10), lambda: checking.transfer(savings, Decimal('30.00'))),
+        ):
+            with mock.patch('django.utils.timezone.now', return_value=day_start(day) + timedelta(hours=12)):
+                post()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def series(self, granularity):
+        response = self.client.get('/api/analytics/cashflow/', {
+            'granularity': granularity, 'start_date': '2026-01-01', 'end_date': '2026-02-28',
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row['period'], Decimal(str(row['credits'])), Decimal(str(row['debits'])),
+             Decimal(str(row['net'])), row['transaction_count'])
+            for row in response.json()['results']
+        ]
+
+    def test_monthly_buckets(self):
+        self.assertEqual(self.series('month'), [
+            ('2026-01-01', Decimal('200.00'), Decimal('50.00'), Decimal('150.00'), 2),
+            # Both legs of the transfer between the user's accounts
+            ('2026-02-01', Decimal('30.00'), Decimal('30.00'), Decimal('0.00'), 2),
+        ])
+
+    def test_weekly_buckets_start_on_monday(self):
+        self.assertEqual(self.series('week'), [
+            ('2026-01-12', Decimal('200.00'), Decimal('0.00'), Decimal('200.00'), 1),
+            ('2026-01-19', Decimal('0.00'), Decimal('50.00'), Decimal('-50.00'), 1),
+            ('2026-02-09', Decimal('30.00'), Decimal('30.00'), Decimal('0.00'), 2),
+        ])
+
+    def test_postings_match_rebuilt_rollups(self):
+        live = self.series('week')
+        rebuild_rollups(self.user)
+        self.assertEqual(self.series('week'), live)
+
+
+class StatementExportTests(TestCase):
+    """The streamed CSV statement lists the range's transactions in posting order"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='export@example.com', password='x', first_name='Ex', last_name='Port')
+        other = User.objects.create_user(email='private@example.com', password='x', first_name='Pri', last_name='Vate')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='EXPO0001')
+        self.foreign = Account.objects.create(user=other, account_type=account_type, account_number='EXPO0002')
+        for day, hour, post in (
+            (date(2025, 12, 31), 9, lambda: self.account.deposit(Decimal('10.00'))),
+            (date(2026, 1, 10), 9, lambda: self.account.deposit(Decimal('100.00'))),
+            (date(2026, 1, 12), 9, lambda: self.account.withdraw(Decimal('40.00'))),
+            (date(2026, 1, 12), 15, lambda: self.account.deposit(Decimal('5.00'))),
+            (date(2026, 2, 1), 9, lambda: self.account.withdraw(Decimal('1.00'))),
+        ):
+            with mock.patch('django.utils.timezone.now', return_value=day_start(day) + timedelta(hours=hour)):
+                post()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rows_in_the_range_are_streamed_in_order(self):
+        response = self.client.get(f'/api/accounts/{self.account.pk}/statement.csv',
+                                   {'start_date': '2026-01-01', 'end_date': '2026-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['Date', 'Description', 'Type', 'Amount', 'Balance'])
+        self.assertEqual([(row[0], row[2], row[3], row[4]) for row in rows[1:]], [
+            ('2026-01-10 09:00', 'deposit', '100.00', '110.00'),
+            ('2026-01-12 09:00', 'withdrawal', '40.00', '70.00'),
+            ('2026-01-12 15:00', 'deposit', '5.00', '75.00'),
+        ])
+
+    def test_other_users_account_is_not_found(self):
+        response = self.client.get(f'/api/accounts/{self.foreign.pk}/statement.csv')
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsTests(TestCase):
+    """The metrics middleware and the Prometheus endpoint"""
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(email='metrics@example.com', password='x', first_name='Metric', last_name='Test')
+        self.staff = User.objects.create_user(email='metrics-staff@example.com', password='x', first_name='Metric',
+                                              last_name='Staff', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def staff_client(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        return client
+
+    def test_requests_are_recorded_per_view_and_method(self):
+        self.client.get('/api/goals/')
+        self.client.get('/api/goals/')
+        body = self.staff_client().get('/api/_metrics').content.decode()
+        self.assertIn('ecofin_http_requests_total{view="goal-list",method="GET"} 2', body)
+        self.assertIn('ecofin_http_request_queries_bucket{view="goal-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('ecofin_http_request_db_seconds_total{view="goal-list",method="GET"}', body)
+
+    def test_staff_only_without_token(self):
+        self.assertEqual(APIClient().get('/api/_metrics').status_code, 401)
+        client = APIClient()
+        client.force_login(self.user)
+        self.assertEqual(client.get('/api/_metrics').status_code, 401)
+        self.assertEqual(self.staff_client().get('/api/_metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_admits_scraper(self):
+        self.assertEqual(APIClient().get('/api/_metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = APIClient().get('/api/_metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.staff_client().get('/api/_metrics').status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    """Request profiling on demand and the admin-only capture endpoints"""
+
+    def setUp(self):
+        captures.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', password='x', first_name='Staff', last_name='User', is_staff=True)
+        self.client = APIClient()
+        self.client.force_login(self.staff)
+        self.client.force_authenticate(self.staff)
+
+    def test_header_from_staff_is_captured(self):
+        self.client.get('/api/goals/', HTTP_X_PROFILE='1')
+        self.client.get('/api/goals/')
+        summaries = self.client.get('/api/_profiles/').json()
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]['view'], 'goal-list')
+
+        report = self.client.get(f"/api/_profiles/{summaries[0]['id']}/").json()
+        self.assertEqual(len(report['sql']), report['query_count'])
+        self.assertIn('cumulative', report['profile'])
+        download = self.client.get(f"/api/_profiles/{summaries[0]['id']}/", {'download': 1})
+        self.assertEqual(download['Content-Type'], 'application/octet-stream')
+
+    def test_header_from_other_users_is_ignored(self):
+        user = User.objects.create_user(email='plain@example.com', password='x', first_name='Plain', last_name='User')
+        client = APIClient()
+        client.force_login(user)
+        client.force_authenticate(user)
+        client.get('/api/goals/', HTTP_X_PROFILE='1')
+        self.assertEqual(captures.list(), [])
+        self.assertEqual(client.get('/api/_profiles/').status_code, 403)
@@ -4,7 +4,8 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .views import (
     UserViewSet, AccountViewSet, TransactionViewSet,
-    CategoryViewSet, BudgetViewSet, BudgetItemViewSet, GoalViewSet
+    CategoryViewSet, BudgetViewSet, BudgetItemViewSet, GoalViewSet, AnalyticsViewSet,
+    metrics, profile_list, profile_detail
 )
 
 router = DefaultRouter()
@@ -15,8 +16,12 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'budgets', BudgetViewSet)
 router.register(r'budget-items', BudgetItemViewSet)
 router.register(r'goals', GoalViewSet)
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
+    path('_metrics', metrics, name='metrics'),
+    path('_profiles/', profile_list, name='profile-list'),
+    path('_profiles/<int:capture_id>/', profile_detail, name='profile-detail'),
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
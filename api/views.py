@@ -2,22 +2,76 @@ from rest_framework import viewsets, permissions, status, serializers
 from django.conf import settings
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.db.models import Sum, Count, DecimalField, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from datetime import timedelta
+import hmac
+from decimal import Decimal, InvalidOperation
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 
 from accounts.models import User, UserProfile
-from banking.models import Account, Transaction, Transfer, Statement
+from accounts.cache import dashboard_cache_key, get_cached_dashboard, invalidate_dashboard, set_cached_dashboard
+from banking.models import Account, Transaction, Transfer, Statement, DailyBalance
+from banking.ledger import post_batch
+from banking.exports import statement_csv_response
+from banking.filters import TransactionFilter, created_between, date_range
 from transactions.models import Category, EnhancedTransaction, Tag, RecurringGroup
+from transactions.aggregation import category_totals, subtree_totals
+from transactions.tree import get_category_tree
+from transactions.search import build_match, search_ranked
+from transactions.rollups import GRANULARITIES, cash_flow
 from budgets.models import Budget, BudgetItem
 from goals.models import Goal, GoalContribution
+from goals.contributions import post_contribution, post_contributions
+from goals.forecasting import with_contribution_stats
 
 from .serializers import (
     UserSerializer, UserProfileSerializer, AccountSerializer,
     TransactionSerializer, CategorySerializer, EnhancedTransactionSerializer,
-    BudgetSerializer, BudgetItemSerializer, GoalSerializer, GoalContributionSerializer
+    BudgetSerializer, BudgetItemSerializer, GoalSerializer, GoalContributionSerializer,
+    PostingSerializer, ContributionPostingSerializer, DailyBalanceSerializer
 )
+from .renderers import CSVRenderer
+from .metrics import registry as metrics_registry
+from .profiling import captures, is_staff_request
+from .pagination import ContributionCursorPagination, KeysetPagination, SearchCursorPagination
+
+@require_GET
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format.
+
+    Only staff may read them; set METRICS_TOKEN to also admit a scraper
+    sending "Authorization: Bearer <token>".
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scraper = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not scraper and not is_staff_request(request):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_list(request):
+    """Profiled requests still in the capture buffer, newest first"""
+    return Response([capture.summary() for capture in captures.list()])
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_detail(request, capture_id):
+    """One capture: its SQL and the most expensive functions; ?download=1 returns the raw pstats file"""
+    capture = captures.get(capture_id)
+    if capture is None:
+        return Response({'error': 'Capture not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.query_params.get('download'):
+        response = HttpResponse(capture.profile_data(), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="request-{capture.id}.prof"'
+        return response
+    return Response(capture.report())
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -46,41 +100,67 @@ class UserViewSet(viewsets.ModelViewSet):
         """Get dashboard data for the current user"""
         user = request.user
 
-        # Get account summary
-        accounts = Account.objects.filter(user=user)
-        account_summary = {
-            'total_balance': accounts.aggregate(Sum('balance'))['balance__sum'] or 0,
-            'account_count': accounts.count(),
-        }
-
-        # Get recent transactions
+        cache_key = dashboard_cache_key(user.id)
+        dashboard_data = get_cached_dashboard(cache_key)
+        if dashboard_data is not None:
+            return Response(dashboard_data)
+
+        # Account, budget and goal summaries as scalar subqueries over one row
+        month_start = timezone.now().date().replace(day=1)
+        accounts = Account.objects.filter(user=OuterRef('pk')).order_by().values('user')
+        active_budgets = Budget.objects.filter(user=OuterRef('pk'), is_active=True).order_by().values('user')
+        active_goals = Goal.objects.filter(user=OuterRef('pk')).exclude(status='completed').order_by().values('user')
+
+        def scalar(queryset, aggregate, output_field=None):
+            output_field = output_field or DecimalField(max_digits=14, decimal_places=2)
+            return Coalesce(Subquery(queryset.annotate(value=aggregate).values('value')), 0,
+                            output_field=output_field)
+
+        summary = User.objects.filter(pk=user.pk).annotate(
+            total_balance=scalar(accounts, Sum('balance')),
+            account_count=scalar(accounts, Count('id'), IntegerField()),
+            month_opening_balance=scalar(
+                accounts.annotate(month_opening=DailyBalance.balance_expression(month_start - timedelta(days=1))),
+                Sum('month_opening')
+            ),
+            budget_count=scalar(active_budgets, Count('id'), IntegerField()),
+            total_budget=scalar(active_budgets, Sum('amount')),
+            goal_count=scalar(active_goals, Count('id'), IntegerField()),
+            total_goal_amount=scalar(active_goals, Sum('target_amount')),
+            total_current_amount=scalar(active_goals, Sum('current_amount')),
+        ).values(
+            'total_balance', 'account_count', 'month_opening_balance', 'budget_count', 'total_budget',
+            'goal_count', 'total_goal_amount', 'total_current_amount'
+        ).get()
+
+        # Get recent transactions, bounded by the checkpoints so only the latest active days are sorted
         recent_transactions = Transaction.objects.filter(
             account__user=user
-        ).order_by('-created_at')[:10]
-
-        # Get budget summary
-        active_budgets = Budget.objects.filter(user=user, is_active=True)
-        budget_summary = {
-            'budget_count': active_budgets.count(),
-            'total_budget': active_budgets.aggregate(Sum('amount'))['amount__sum'] or 0,
-        }
-
-        # Get goal summary
-        active_goals = Goal.objects.filter(user=user).exclude(status='completed')
-        goal_summary = {
-            'goal_count': active_goals.count(),
-            'total_goal_amount': active_goals.aggregate(Sum('target_amount'))['target_amount__sum'] or 0,
-            'total_current_amount': active_goals.aggregate(Sum('current_amount'))['current_amount__sum'] or 0,
-        }
+        ).select_related('account').order_by('-created_at')
+        recent_start = DailyBalance.recent_activity_start(user, 10)
+        if recent_start:
+            recent_transactions = recent_transactions.filter(created_between(recent_start))
+        recent_transactions = recent_transactions[:10]
 
-        # Combine all data
         dashboard_data = {
-            'account_summary': account_summary,
+            'account_summary': {
+                'total_balance': summary['total_balance'],
+                'account_count': summary['account_count'],
+                'month_opening_balance': summary['month_opening_balance'],
+            },
             'recent_transactions': TransactionSerializer(recent_transactions, many=True).data,
-            'budget_summary': budget_summary,
-            'goal_summary': goal_summary,
+            'budget_summary': {
+                'budget_count': summary['budget_count'],
+                'total_budget': summary['total_budget'],
+            },
+            'goal_summary': {
+                'goal_count': summary['goal_count'],
+                'total_goal_amount': summary['total_goal_amount'],
+                'total_current_amount': summary['total_current_amount'],
+            },
         }
 
+        set_cached_dashboard(cache_key, dashboard_data)
         return Response(dashboard_data)
 
 class AccountViewSet(viewsets.ModelViewSet):
@@ -95,57 +175,28 @@ class AccountViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def _unlinked_accounts(self, request):
+        """Banking-system accounts under the user's email that are not linked to the user yet"""
+        linked = Account.objects.filter(user=request.user, account_number=OuterRef('account_number'))
+        return Account.objects.filter(user__email=request.user.email).exclude(Exists(linked)).select_related('account_type')
+
     @action(detail=False, methods=['get'])
     def available(self, request):
         """Get accounts from the banking system that are not yet linked to the EcoFin app"""
-        # Get the user's email to match with banking system accounts
-        user_email = request.user.email
-        print(f"Looking for accounts for user email: {user_email}")
-
-        # Get accounts already linked to the EcoFin app
-        linked_account_numbers = set(Account.objects.filter(user=request.user).values_list('account_number', flat=True))
-        print(f"Already linked account numbers: {linked_account_numbers}")
-
-        # Get accounts from the banking system that match the user's email and are not yet linked
-        from banking.models import Account as BankingAccount
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-
-        # Get the user from the banking system
-        banking_users = User.objects.filter(email=user_email)
-        print(f"Found {len(banking_users)} users with email {user_email}")
-
-        # Get all banking accounts
-        all_banking_accounts = BankingAccount.objects.all()
-        print(f"Total banking accounts: {len(all_banking_accounts)}")
-
-        # Get accounts from the banking system that match the user's email
-        available_accounts = BankingAccount.objects.filter(user__email=user_email)
-        print(f"Found {len(available_accounts)} accounts for user email {user_email}")
-
-        # Filter out accounts that are already linked
-        available_accounts = [account for account in available_accounts
-                             if account.account_number not in linked_account_numbers]
-        print(f"After filtering, {len(available_accounts)} accounts are available to link")
-
-        # Serialize the accounts
-        data = []
-        for account in available_accounts:
-            try:
-                account_data = {
-                    'id': account.id,
-                    'account_number': account.account_number,
-                    'account_type': account.account_type.id if account.account_type else None,
-                    'account_type_name': account.account_type.name if account.account_type else 'Unknown',
-                    'balance': float(account.balance),
-                    'currency': account.currency,
-                    'status': account.status,
-                    'nickname': account.nickname or f'Account {account.account_number}',
-                }
-                data.append(account_data)
-            except Exception as e:
-                print(f"Error serializing account {account.id}: {str(e)}")
-
+        # One anti-join query; account types come with it
+        data = [
+            {
+                'id': account.id,
+                'account_number': account.account_number,
+                'account_type': account.account_type_id,
+                'account_type_name': account.account_type.name if account.account_type else 'Unknown',
+                'balance': float(account.balance),
+                'currency': account.currency,
+                'status': account.status,
+                'nickname': account.nickname or f'Account {account.account_number}',
+            }
+            for account in self._unlinked_accounts(request).order_by('pk')
+        ]
         return Response(data)
 
     @action(detail=False, methods=['post'])
@@ -155,24 +206,27 @@ class AccountViewSet(viewsets.ModelViewSet):
 
         if not account_ids:
             return Response({'error': 'No account IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(account_ids, list):
+            return Response({'error': 'account_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            account_ids = {int(account_id) for account_id in account_ids}
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid account ID'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get the banking system accounts
-        from banking.models import Account as BankingAccount
-        banking_accounts = BankingAccount.objects.filter(id__in=account_ids, user__email=request.user.email)
-
+        banking_accounts = list(
+            Account.objects.filter(id__in=account_ids, user__email=request.user.email).select_related('account_type')
+        )
         if not banking_accounts:
             return Response({'error': 'No valid accounts found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Link the accounts to the EcoFin app
-        linked_accounts = []
-        for banking_account in banking_accounts:
-            # Check if account is already linked
-            if Account.objects.filter(account_number=banking_account.account_number, user=request.user).exists():
-                continue
-
-            try:
-                # Create a new account in the EcoFin app linked to the banking system account
-                account = Account.objects.create(
+        # One existence check for the whole batch, then one bulk insert
+        with transaction.atomic():
+            already_linked = set(Account.objects.filter(
+                user=request.user,
+                account_number__in=[account.account_number for account in banking_accounts]
+            ).values_list('account_number', flat=True))
+            to_link = [
+                Account(
                     user=request.user,
                     account_number=banking_account.account_number,
                     account_type=banking_account.account_type,
@@ -181,10 +235,18 @@ class AccountViewSet(viewsets.ModelViewSet):
                     status=banking_account.status,
                     nickname=banking_account.nickname or f'Account {banking_account.account_number}'
                 )
-            except Exception as e:
-                print(f"Error linking account {banking_account.id}: {str(e)}")
-                continue
-            linked_accounts.append(self.get_serializer(account).data)
+                for banking_account in banking_accounts
+                if banking_account.account_number not in already_linked
+            ]
+            # Account numbers are unique, so a number held by another user is
+            # skipped rather than failing the batch
+            Account.objects.bulk_create(to_link, batch_size=500, ignore_conflicts=True)
+            linked = Account.objects.filter(
+                user=request.user,
+                account_number__in=[account.account_number for account in to_link]
+            ).select_related('account_type').order_by('pk')
+            linked_accounts = self.get_serializer(linked, many=True).data
+            invalidate_dashboard(request.user.pk)
 
         return Response({
             'success': True,
@@ -224,6 +286,40 @@ class AccountViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='bulk-postings')
+    def bulk_postings(self, request):
+        """Apply a batch of deposits and withdrawals across the user's accounts"""
+        postings = request.data.get('postings')
+
+        if not isinstance(postings, list) or not postings:
+            return Response({'error': 'A non-empty list of postings is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Validate each posting on its own so one bad item does not reject the batch
+        results = [None] * len(postings)
+        valid_indexes = []
+        valid_postings = []
+        for index, item in enumerate(postings):
+            serializer = PostingSerializer(data=item)
+            if serializer.is_valid():
+                valid_indexes.append(index)
+                valid_postings.append(serializer.validated_data)
+            else:
+                results[index] = {'index': index, 'success': False, 'error': serializer.errors}
+
+        if valid_postings:
+            posted = post_batch(valid_postings, accounts=self.get_queryset())
+            for index, result in zip(valid_indexes, posted):
+                result['index'] = index
+                results[index] = result
+
+        failed = sum(1 for result in results if not result['success'])
+        return Response({
+            'success': failed == 0,
+            'posted': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
+
     @csrf_exempt
     @action(detail=False, methods=['post'], url_path='link-by-number')
     def link_by_number(self, request):
@@ -269,6 +365,42 @@ class AccountViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['get'], url_path='balance-history')
+    def balance_history(self, request, pk=None):
+        """Daily balance history for an account, served from the balance checkpoints"""
+        account = self.get_object()
+
+        try:
+            start_date, end_date = date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = DailyBalance.objects.filter(
+            account=account,
+            date__gte=start_date,
+            date__lte=end_date
+        ).order_by('date')
+
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'opening_balance': DailyBalance.balance_on(account, start_date - timedelta(days=1)),
+            'closing_balance': DailyBalance.balance_on(account, end_date),
+            'days': DailyBalanceSerializer(days, many=True).data
+        })
+
+    @action(detail=True, methods=['get'], renderer_classes=[CSVRenderer])
+    def statement(self, request, pk=None, format=None):
+        """Stream the account statement as CSV (also served at statement.csv)"""
+        account = self.get_object()
+
+        try:
+            start_date, end_date = date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return statement_csv_response(account, start_date, end_date)
+
     @action(detail=True, methods=['post'])
     def transfer(self, request, pk=None):
         source_account = self.get_object()
@@ -301,67 +433,82 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Users can only see transactions from their accounts
-        queryset = Transaction.objects.filter(account__user=self.request.user)
-
-        # Filter by account if specified
-        account_id = self.request.query_params.get('account')
-        if account_id:
-            queryset = queryset.filter(account_id=account_id)
-
-        # Filter by transaction type if specified
-        transaction_type = self.request.query_params.get('transaction_type')
-        if transaction_type:
-            queryset = queryset.filter(transaction_type=transaction_type)
-
-        # Filter by date range if specified
-        start_date = self.request.query_params.get('start_date')
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-
-        end_date = self.request.query_params.get('end_date')
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        queryset = Transaction.objects.filter(account__user=self.request.user).select_related('account')
 
-        # Debug the filter parameters
-        print(f"Filtering transactions with:")
-        print(f"Account ID: {account_id}")
-        print(f"Transaction Type: {transaction_type}")
-        print(f"Start Date: {start_date}")
-        print(f"End Date: {end_date}")
-        print(f"Query: {queryset.query}")
-
-        return queryset
+        # Filter by accounts, types, date range/period and amount range if specified
+        filters = TransactionFilter(self.request.query_params)
+        if not filters.is_valid:
+            raise serializers.ValidationError(filters.errors)
+        return filters.filter_queryset(queryset)
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
-        transactions = self.get_queryset().order_by('-created_at')[:20]
+        # First page of 20 by default; follow the cursor for older transactions
+        self.paginator.page_size = 20
+        transactions = self.paginate_queryset(self.get_queryset())
         serializer = self.get_serializer(transactions, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
-    def by_category(self, request):
-        # Get transactions grouped by category
-        enhanced_transactions = EnhancedTransaction.objects.filter(
-            bank_transaction__account__user=request.user
+    def search(self, request):
+        # Ranked full-text search over description, notes, location, tags and
+        # category, paged with a (rank, id) cursor
+        query = request.query_params.get('q', '')
+        if build_match(query) is None:
+            return Response({'error': 'Search query must contain at least one word'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchCursorPagination()
+        ids = paginator.paginate_search(
+            request, lambda after, limit: search_ranked(request.user, query, after=after, limit=limit)
         )
+        transactions = Transaction.objects.select_related('account').in_bulk(ids)
+        serializer = self.get_serializer([transactions[pk] for pk in ids if pk in transactions], many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        # Group by category
-        category_data = {}
-        for et in enhanced_transactions:
-            category_name = et.category.name if et.category else 'Uncategorized'
-            if category_name not in category_data:
-                category_data[category_name] = {
-                    'count': 0,
-                    'total': 0,
-                }
+    @action(detail=False, methods=['get'])
+    def by_category(self, request):
+        # Totals per category, grouped in the database; split transactions
+        # count towards their split categories
+        filters = TransactionFilter(request.query_params)
+        if not filters.is_valid:
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(category_totals(request.user, request.query_params))
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
 
-            category_data[category_name]['count'] += 1
-            category_data[category_name]['total'] += et.bank_transaction.amount
+    # Default look-back per granularity when no dates are given
+    DEFAULT_DAYS = {'day': 30, 'week': 26 * 7, 'month': 3 * 365}
 
-        return Response(category_data)
+    @action(detail=False, methods=['get'])
+    def cashflow(self, request):
+        # Served from the daily cash-flow rollups, never from the Transaction rows
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in GRANULARITIES:
+            return Response({'error': f"Granularity must be one of: {', '.join(GRANULARITIES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        filters = TransactionFilter(request.query_params)
+        categories = [value.strip() for item in request.query_params.getlist('category') for value in item.split(',') if value.strip()]
+        if not all(value.isdigit() for value in categories):
+            filters.errors['category'] = 'Category ids must be integers'
+        if not filters.is_valid:
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        end_date = filters.end_date or timezone.localdate()
+        start_date = filters.start_date or end_date - timedelta(days=self.DEFAULT_DAYS[granularity])
+        series = cash_flow(request.user, granularity, start_date, end_date,
+                           account_ids=filters.accounts, category_ids=categories)
+        return Response({
+            'granularity': granularity,
+            'start_date': start_date,
+            'end_date': end_date,
+            'results': series,
+        })
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -370,11 +517,38 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can see system categories and their own categories
-        return Category.objects.filter(is_system=True) | Category.objects.filter(user=self.request.user)
+        return Category.objects.filter(Category.visible_to(self.request.user))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user, is_system=False)
 
+    @action(detail=True, methods=['get'])
+    def rollup(self, request, pk=None):
+        # Totals for the category and all its subcategories, resolved from the
+        # cached category tree rather than with recursive queries
+        tree = get_category_tree(request.user)
+        try:
+            category_id = int(pk)
+        except (TypeError, ValueError):
+            category_id = None
+        if category_id not in tree:
+            return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        filters = TransactionFilter(request.query_params)
+        if not filters.is_valid:
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        subtree = tree.subtree(category_id)
+        totals = subtree_totals(request.user, subtree, request.query_params)
+        return Response({
+            'category': category_id,
+            'name': tree.names[category_id],
+            'path': [tree.names[ancestor] for ancestor in tree.path(category_id)],
+            'subcategories': sorted(subtree - {category_id}),
+            'count': totals['count'],
+            'total': totals['total'],
+        })
+
 class BudgetViewSet(viewsets.ModelViewSet):
     queryset = Budget.objects.all()
     serializer_class = BudgetSerializer
@@ -382,7 +556,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see their own budgets
-        return Budget.objects.filter(user=self.request.user)
+        return Budget.objects.filter(user=self.request.user).prefetch_related('items__category')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -390,7 +564,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def items(self, request, pk=None):
         budget = self.get_object()
-        items = BudgetItem.objects.filter(budget=budget)
+        items = BudgetItem.objects.filter(budget=budget).select_related('budget', 'category')
         serializer = BudgetItemSerializer(items, many=True)
         return Response(serializer.data)
 
@@ -401,7 +575,7 @@ class BudgetItemViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see budget items from their budgets
-        return BudgetItem.objects.filter(budget__user=self.request.user)
+        return BudgetItem.objects.filter(budget__user=self.request.user).select_related('budget', 'category')
 
     def perform_create(self, serializer):
         # Ensure the budget belongs to the user
@@ -420,7 +594,7 @@ class GoalViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see their own goals
-        return Goal.objects.filter(user=self.request.user)
+        return with_contribution_stats(Goal.objects.filter(user=self.request.user))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -428,50 +602,86 @@ class GoalViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def contribute(self, request, pk=None):
         goal = self.get_object()
-        amount = request.data.get('amount')
         notes = request.data.get('notes', '')
         account_id = request.data.get('account_id')
 
         try:
-            # Handle amount conversion safely
+            amount = Decimal(str(request.data.get('amount')))
+        except InvalidOperation:
+            return Response({'error': 'Invalid amount format'}, status=status.HTTP_400_BAD_REQUEST)
+        if not amount.is_finite() or amount <= 0:
+            return Response({'error': 'Amount must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        account = None
+        if account_id:
             try:
-                amount = float(amount)
-            except (ValueError, TypeError):
-                return Response({'error': 'Invalid amount format'}, status=status.HTTP_400_BAD_REQUEST)
+                account = Account.objects.get(id=account_id, user=request.user)
+            except Account.DoesNotExist:
+                return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            if amount <= 0:
-                return Response({'error': 'Amount must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        # The withdrawal and the contribution commit together or not at all
+        try:
+            post_contribution(goal, amount, notes=notes, account=account)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get account if provided
-            account = None
-            if account_id:
-                try:
-                    account = Account.objects.get(id=account_id, user=request.user)
-                except Account.DoesNotExist:
-                    return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+        goal.refresh_from_db(fields=['current_amount', 'status'])
+        return Response({
+            'success': True,
+            'current_amount': goal.current_amount,
+            'progress': goal.progress_percentage
+        })
 
-            # Create contribution with proper decimal conversion
-            from decimal import Decimal
-            contribution = GoalContribution.objects.create(
-                goal=goal,
-                amount=Decimal(str(amount)),  # Convert to Decimal safely
-                notes=notes,
-                from_account=account
+    @action(detail=True, methods=['get'])
+    def contributions(self, request, pk=None):
+        """The goal's contributions, newest first, cursor paginated"""
+        # Only an existence check, not the annotated goal queryset
+        try:
+            goal_id = int(pk)
+        except (TypeError, ValueError):
+            goal_id = None
+        if goal_id is None or not Goal.objects.filter(pk=goal_id, user=request.user).exists():
+            return Response({'error': 'Goal not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = ContributionCursorPagination()
+        page = paginator.paginate_queryset(GoalContribution.objects.filter(goal_id=goal_id), request, view=self)
+        serializer = GoalContributionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-contribute')
+    def bulk_contribute(self, request):
+        """Post a batch of contributions across the user's goals, e.g. an automated savings sweep"""
+        contributions = request.data.get('contributions')
+
+        if not isinstance(contributions, list) or not contributions:
+            return Response({'error': 'A non-empty list of contributions is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Validate each contribution on its own so one bad item does not reject the batch
+        results = [None] * len(contributions)
+        valid_indexes = []
+        valid_contributions = []
+        for index, item in enumerate(contributions):
+            serializer = ContributionPostingSerializer(data=item)
+            if serializer.is_valid():
+                valid_indexes.append(index)
+                valid_contributions.append(serializer.validated_data)
+            else:
+                results[index] = {'index': index, 'success': False, 'error': serializer.errors}
+
+        if valid_contributions:
+            posted = post_contributions(
+                valid_contributions,
+                goals=Goal.objects.filter(user=request.user),
+                accounts=Account.objects.filter(user=request.user)
             )
+            for index, result in zip(valid_indexes, posted):
+                result['index'] = index
+                results[index] = result
 
-            # If account provided, withdraw the amount
-            if account:
-                try:
-                    account.withdraw(Decimal(str(amount)))  # Convert to Decimal safely
-                except ValueError as e:
-                    # Rollback contribution if withdrawal fails
-                    contribution.delete()
-                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-            return Response({
-                'success': True,
-                'current_amount': goal.current_amount,
-                'progress': goal.progress_percentage
-            })
-        except ValueError as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        failed = sum(1 for result in results if not result['success'])
+        return Response({
+            'success': failed == 0,
+            'posted': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
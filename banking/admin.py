@@ -1,5 +1,10 @@
+import uuid
+
 from django.contrib import admin
-from .models import AccountType, Account, Transfer, Transaction, Statement
+from django.db.models import Q
+
+from transactions.search import matching_transactions
+from .models import AccountType, Account, Transfer, Transaction, Statement, DailyBalance
 
 @admin.register(AccountType)
 class AccountTypeAdmin(admin.ModelAdmin):
@@ -30,6 +35,19 @@ class TransactionAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'reference_number')
     date_hierarchy = 'created_at'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index for the text, exact lookups for the identifiers,
+        # instead of LIKE '%...%' over every row
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        q = matching_transactions(search_term) | Q(account__account_number=search_term)
+        try:
+            q |= Q(reference_number=uuid.UUID(search_term))
+        except ValueError:
+            pass
+        return queryset.filter(q), False
+
 @admin.register(Statement)
 class StatementAdmin(admin.ModelAdmin):
     list_display = ('account', 'start_date', 'end_date', 'opening_balance', 'closing_balance', 'generated_at')
@@ -37,3 +55,10 @@ class StatementAdmin(admin.ModelAdmin):
     search_fields = ('account__account_number',)
     readonly_fields = ('generated_at',)
     date_hierarchy = 'generated_at'
+
+@admin.register(DailyBalance)
+class DailyBalanceAdmin(admin.ModelAdmin):
+    list_display = ('account', 'date', 'closing_balance', 'transaction_count', 'total_debits', 'total_credits')
+    list_filter = ('date',)
+    search_fields = ('account__account_number',)
+    date_hierarchy = 'date'
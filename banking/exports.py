@@ -0,0 +1,40 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+from .filters import created_between
+from .models import Transaction
+
+STATEMENT_CSV_HEADER = ['Date', 'Description', 'Type', 'Amount', 'Balance']
+
+
+class Echo:
+    """File-like object whose write() hands the row back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def statement_rows(account, start_date, end_date, chunk_size=2000):
+    """Yield statement rows for the date range, fetching tuples in chunks"""
+    rows = Transaction.objects.filter(
+        created_between(start_date, end_date),
+        account=account
+    ).order_by('created_at', 'id').values_list(
+        'created_at', 'description', 'transaction_type', 'amount', 'balance_after'
+    )
+
+    yield STATEMENT_CSV_HEADER
+    for created_at, description, transaction_type, amount, balance_after in rows.iterator(chunk_size=chunk_size):
+        yield [created_at.strftime('%Y-%m-%d %H:%M'), description, transaction_type, amount, balance_after]
+
+
+def statement_csv_response(account, start_date, end_date):
+    """Stream an account statement as CSV without holding it in memory"""
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in statement_rows(account, start_date, end_date)),
+        content_type='text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{account.account_number}_statement_{start_date}_to_{end_date}.csv"'
+    return response
@@ -0,0 +1,184 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Transaction
+
+
+def day_start(day):
+    """Timezone-aware start of a local calendar day"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def created_between(start_date=None, end_date=None, field='created_at'):
+    """Q for rows created from start_date through end_date (inclusive local days).
+
+    The range is expressed as half-open timestamp bounds, [start, end + 1 day),
+    so the column is compared directly and an index on it stays usable, unlike
+    ``created_at__date`` which wraps the column in a date cast.
+    """
+    q = Q()
+    if start_date:
+        q &= Q(**{f'{field}__gte': day_start(start_date)})
+    if end_date:
+        q &= Q(**{f'{field}__lt': day_start(end_date + timedelta(days=1))})
+    return q
+
+
+# Named periods period_bounds understands
+PERIODS = ['today', 'this_week', 'this_month', 'last_month', 'this_year', 'last_30_days', 'last_90_days']
+
+
+def period_bounds(period, today=None):
+    """Translate a named period into (start_date, end_date), or None if unknown"""
+    today = today or timezone.localdate()
+    if period == 'today':
+        return today, today
+    if period == 'this_week':
+        return today - timedelta(days=today.weekday()), today
+    if period == 'this_month':
+        return today.replace(day=1), today
+    if period == 'last_month':
+        end_date = today.replace(day=1) - timedelta(days=1)
+        return end_date.replace(day=1), end_date
+    if period == 'this_year':
+        return today.replace(month=1, day=1), today
+    if period == 'last_30_days':
+        return today - timedelta(days=30), today
+    if period == 'last_90_days':
+        return today - timedelta(days=90), today
+    return None
+
+
+def parse_dates(params, errors):
+    """(start_date, end_date) from the period, start_date and end_date parameters.
+
+    Either bound may be None. Explicit dates take precedence over the period;
+    invalid values are skipped and reported in ``errors``.
+    """
+    start_date = end_date = None
+
+    period = params.get('period')
+    if period:
+        bounds = period_bounds(period)
+        if bounds:
+            start_date, end_date = bounds
+        else:
+            errors['period'] = f"Period must be one of: {', '.join(PERIODS)}"
+
+    for name in ('start_date', 'end_date'):
+        value = params.get(name)
+        if not value:
+            continue
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            errors[name] = f'Invalid {name.replace("_", " ")} format'
+            continue
+        if name == 'start_date':
+            start_date = parsed
+        else:
+            end_date = parsed
+
+    return start_date, end_date
+
+
+def date_range(params, default_period='last_30_days'):
+    """(start_date, end_date) from request parameters, with missing bounds taken from ``default_period``.
+
+    Raises ValueError describing the invalid parameters.
+    """
+    errors = {}
+    start_date, end_date = parse_dates(params, errors)
+    if errors:
+        raise ValueError('; '.join(errors.values()))
+    default_start, default_end = period_bounds(default_period)
+    return start_date or default_start, end_date or default_end
+
+
+class TransactionFilter:
+    """Turns request parameters into index-friendly filters over Transaction.
+
+    Supported parameters:
+        account         one or more accounts (comma separated or repeated)
+        <type_param>    one or more transaction types
+        start_date      YYYY-MM-DD, inclusive
+        end_date        YYYY-MM-DD, inclusive
+        period          today, this_week, this_month, last_month, this_year,
+                        last_30_days or last_90_days; explicit dates take precedence
+        min_amount      inclusive lower bound on amount
+        max_amount      inclusive upper bound on amount
+
+    Invalid values are skipped and reported in ``errors``.
+    """
+    PERIODS = PERIODS
+
+    def __init__(self, params, account_lookup='account_id', type_param='transaction_type', prefix=''):
+        self.params = params
+        self.account_lookup = account_lookup
+        self.type_param = type_param
+        self.prefix = prefix
+        self.errors = {}
+
+        self.accounts = self._get_accounts()
+        self.transaction_types = self._get_types()
+        self.start_date, self.end_date = self._get_dates()
+        self.min_amount = self._get_amount('min_amount')
+        self.max_amount = self._get_amount('max_amount')
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    def filter_queryset(self, queryset):
+        q = Q()
+        if self.accounts:
+            q &= Q(**{f'{self.prefix}{self.account_lookup}__in': self.accounts})
+        if self.transaction_types:
+            q &= Q(**{f'{self.prefix}transaction_type__in': self.transaction_types})
+        if self.min_amount is not None:
+            q &= Q(**{f'{self.prefix}amount__gte': self.min_amount})
+        if self.max_amount is not None:
+            q &= Q(**{f'{self.prefix}amount__lte': self.max_amount})
+        q &= created_between(self.start_date, self.end_date, field=f'{self.prefix}created_at')
+        return queryset.filter(q)
+
+    def _get_list(self, name):
+        if hasattr(self.params, 'getlist'):
+            raw = self.params.getlist(name)
+        else:
+            raw = [self.params[name]] if self.params.get(name) else []
+        return [value.strip() for item in raw for value in str(item).split(',') if value.strip()]
+
+    def _get_accounts(self):
+        accounts = self._get_list('account')
+        if self.account_lookup.endswith('_id') and not all(value.isdigit() for value in accounts):
+            self.errors['account'] = 'Account ids must be integers'
+            return [value for value in accounts if value.isdigit()]
+        return accounts
+
+    def _get_types(self):
+        types = self._get_list(self.type_param)
+        valid_types = dict(Transaction.TRANSACTION_TYPES)
+        invalid = [value for value in types if value not in valid_types]
+        if invalid:
+            self.errors[self.type_param] = f"Unknown transaction type(s): {', '.join(invalid)}"
+        return [value for value in types if value in valid_types]
+
+    def _get_dates(self):
+        return parse_dates(self.params, self.errors)
+
+    def _get_amount(self, name):
+        value = self.params.get(name)
+        if not value:
+            return None
+        try:
+            amount = Decimal(value)
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
+            self.errors[name] = f'Invalid {name.replace("_", " ")}'
+            return None
+        return amount
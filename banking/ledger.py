@@ -0,0 +1,248 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.cache import invalidate_dashboard
+from transactions.postings import process_postings
+
+from .models import Account, DailyBalance, Transaction, Transfer
+
+
+def _lock_accounts(account_ids):
+    """Lock account rows in ascending id order so concurrent transfers cannot deadlock"""
+    return list(
+        Account.objects.select_for_update()
+        .filter(pk__in=sorted(set(account_ids)))
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def _current_balances(account_ids):
+    """Read back balances after an F() update, inside the same transaction"""
+    return dict(Account.objects.filter(pk__in=account_ids).values_list('pk', 'balance'))
+
+
+def _credit(account_id, amount):
+    Account.objects.filter(pk=account_id).update(
+        balance=F('balance') + amount,
+        updated_at=timezone.now()
+    )
+
+
+def _debit(account_id, amount):
+    """Debit an account only if it has enough funds; the check and the update are one statement"""
+    updated = Account.objects.filter(pk=account_id, balance__gte=amount).update(
+        balance=F('balance') - amount,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        raise ValueError("Insufficient funds")
+
+
+def _checkpoint(account_id, closing_balance, credits=0, debits=0, count=1):
+    """Fold postings into today's DailyBalance row for the account.
+
+    Callers hold the account lock, so the update-then-create cannot race.
+    """
+    today = timezone.localdate()
+    updated = DailyBalance.objects.filter(account_id=account_id, date=today).update(
+        closing_balance=closing_balance,
+        transaction_count=F('transaction_count') + count,
+        total_credits=F('total_credits') + credits,
+        total_debits=F('total_debits') + debits
+    )
+    if not updated:
+        DailyBalance.objects.create(
+            account_id=account_id,
+            date=today,
+            closing_balance=closing_balance,
+            transaction_count=count,
+            total_credits=credits,
+            total_debits=debits
+        )
+
+
+def post_deposit(account, amount, description=None):
+    """Credit an account and record the deposit transaction atomically"""
+    if amount <= 0:
+        raise ValueError("Deposit amount must be positive")
+
+    with transaction.atomic():
+        _lock_accounts([account.pk])
+        _credit(account.pk, amount)
+        balance = _current_balances([account.pk])[account.pk]
+        _checkpoint(account.pk, balance, credits=amount)
+        invalidate_dashboard(account.user_id)
+        txn = Transaction.objects.create(
+            account=account,
+            transaction_type='deposit',
+            amount=amount,
+            balance_after=balance,
+            description=description or f"Deposit to account {account.account_number}"
+        )
+
+    account.balance = balance
+    return txn
+
+
+def post_withdrawal(account, amount, description=None):
+    """Debit an account and record the withdrawal transaction atomically"""
+    if amount <= 0:
+        raise ValueError("Withdrawal amount must be positive")
+
+    with transaction.atomic():
+        _lock_accounts([account.pk])
+        _debit(account.pk, amount)
+        balance = _current_balances([account.pk])[account.pk]
+        _checkpoint(account.pk, balance, debits=amount)
+        invalidate_dashboard(account.user_id)
+        txn = Transaction.objects.create(
+            account=account,
+            transaction_type='withdrawal',
+            amount=amount,
+            balance_after=balance,
+            description=description or f"Withdrawal from account {account.account_number}"
+        )
+
+    account.balance = balance
+    return txn
+
+
+def post_transfer(source_account, destination_account, amount):
+    """Move funds between two accounts and record the transfer atomically"""
+    if amount <= 0:
+        raise ValueError("Transfer amount must be positive")
+    if source_account.pk == destination_account.pk:
+        raise ValueError("Cannot transfer to the same account")
+
+    account_ids = [source_account.pk, destination_account.pk]
+
+    with transaction.atomic():
+        _lock_accounts(account_ids)
+        _debit(source_account.pk, amount)
+        _credit(destination_account.pk, amount)
+        balances = _current_balances(account_ids)
+        _checkpoint(source_account.pk, balances[source_account.pk], debits=amount)
+        _checkpoint(destination_account.pk, balances[destination_account.pk], credits=amount)
+        invalidate_dashboard(source_account.user_id, destination_account.user_id)
+
+        transfer = Transfer.objects.create(
+            source_account=source_account,
+            destination_account=destination_account,
+            amount=amount,
+            status='completed'
+        )
+        legs = Transaction.objects.bulk_create([
+            Transaction(
+                account=source_account,
+                transaction_type='transfer_out',
+                amount=amount,
+                balance_after=balances[source_account.pk],
+                description=f"Transfer to account {destination_account.account_number}",
+                related_transfer=transfer
+            ),
+            Transaction(
+                account=destination_account,
+                transaction_type='transfer_in',
+                amount=amount,
+                balance_after=balances[destination_account.pk],
+                description=f"Transfer from account {source_account.account_number}",
+                related_transfer=transfer
+            ),
+        ])
+        process_postings(legs)
+
+    source_account.balance = balances[source_account.pk]
+    destination_account.balance = balances[destination_account.pk]
+    return transfer
+
+
+def post_batch(postings, accounts=None):
+    """Apply many deposits and withdrawals in one transaction.
+
+    ``postings`` is a sequence of dicts with ``account`` (id), ``transaction_type``
+    ('deposit' or 'withdrawal'), ``amount`` and an optional ``description``.
+    Postings are grouped per account and running balances are computed in memory,
+    so each account gets one balance update and all transactions one bulk insert.
+    A posting that references an unknown account or would overdraw is rejected on
+    its own; the rest of the batch is still applied. Returns one result dict per
+    posting, in input order.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+
+    results = [None] * len(postings)
+    by_account = {}
+    for index, posting in enumerate(postings):
+        by_account.setdefault(posting['account'], []).append(index)
+
+    with transaction.atomic():
+        locked = {
+            account.pk: account
+            for account in accounts.select_for_update()
+            .filter(pk__in=sorted(by_account))
+            .order_by('pk')
+        }
+
+        new_transactions = []
+        posted_indexes = []
+        totals = {}
+        for account_id, indexes in by_account.items():
+            account = locked.get(account_id)
+            if account is None:
+                for index in indexes:
+                    results[index] = {'index': index, 'success': False, 'error': 'Account not found'}
+                continue
+
+            balance = account.balance
+            credits = debits = count = 0
+            for index in indexes:
+                posting = postings[index]
+                amount = posting['amount']
+                if posting['transaction_type'] == 'withdrawal':
+                    if amount > balance:
+                        results[index] = {'index': index, 'success': False, 'error': 'Insufficient funds'}
+                        continue
+                    balance -= amount
+                    debits += amount
+                    default_description = f"Withdrawal from account {account.account_number}"
+                else:
+                    balance += amount
+                    credits += amount
+                    default_description = f"Deposit to account {account.account_number}"
+
+                new_transactions.append(Transaction(
+                    account=account,
+                    transaction_type=posting['transaction_type'],
+                    amount=amount,
+                    balance_after=balance,
+                    description=posting.get('description') or default_description
+                ))
+                posted_indexes.append(index)
+                count += 1
+
+            if count:
+                totals[account_id] = (balance, credits, debits, count)
+
+        created = Transaction.objects.bulk_create(new_transactions, batch_size=1000)
+        process_postings(created)
+
+        now = timezone.now()
+        for account_id, (closing_balance, credits, debits, count) in totals.items():
+            Account.objects.filter(pk=account_id).update(
+                balance=F('balance') + credits - debits,
+                updated_at=now
+            )
+            _checkpoint(account_id, closing_balance, credits=credits, debits=debits, count=count)
+        invalidate_dashboard(*(locked[account_id].user_id for account_id in totals))
+
+    for index, txn in zip(posted_indexes, created):
+        results[index] = {
+            'index': index,
+            'success': True,
+            'transaction_id': txn.pk,
+            'reference': str(txn.reference_number),
+            'balance_after': txn.balance_after,
+        }
+    return results
@@ -0,0 +1,85 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from banking.models import Account, AccountType
+
+
+class Command(BaseCommand):
+    help = 'Measure ledger transfer throughput under concurrent workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help='Worker counts to benchmark')
+        parser.add_argument('--transfers', type=int, default=200,
+                            help='Transfers performed by each worker')
+        parser.add_argument('--accounts', type=int, default=10,
+                            help='Number of accounts transfers are spread across')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.create_user(
+            email=f'ledger-benchmark-{uuid.uuid4().hex[:8]}@example.com',
+            first_name='Ledger',
+            last_name='Benchmark'
+        )
+        account_type = AccountType.objects.first() or AccountType.objects.create(
+            name='Benchmark', description='Ledger benchmark account type'
+        )
+        accounts = [
+            Account.objects.create(
+                user=user,
+                account_type=account_type,
+                account_number=f'BM{uuid.uuid4().hex[:16]}',
+                balance=Decimal('1000000.00')
+            )
+            for _ in range(options['accounts'])
+        ]
+
+        try:
+            self.stdout.write(f"{'workers':>8} {'transfers':>10} {'errors':>7} {'seconds':>8} {'tx/sec':>9}")
+            for workers in options['workers']:
+                completed, errors, elapsed = self._run(accounts, workers, options['transfers'])
+                self.stdout.write(
+                    f"{workers:>8} {completed:>10} {errors:>7} {elapsed:>8.2f} {completed / elapsed:>9.1f}"
+                )
+        finally:
+            # Deleting the user cascades to the benchmark accounts and their ledger rows
+            user.delete()
+
+    def _run(self, accounts, workers, transfers):
+        counts = {'completed': 0, 'errors': 0}
+        lock = threading.Lock()
+        account_ids = [account.pk for account in accounts]
+
+        def worker():
+            completed = errors = 0
+            try:
+                for _ in range(transfers):
+                    source_id, destination_id = random.sample(account_ids, 2)
+                    source = Account.objects.get(pk=source_id)
+                    destination = Account.objects.get(pk=destination_id)
+                    try:
+                        source.transfer(destination, Decimal('1.00'))
+                        completed += 1
+                    except (ValueError, OperationalError):
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                counts['completed'] += completed
+                counts['errors'] += errors
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['completed'], counts['errors'], time.perf_counter() - started
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from banking.models import Account, Statement
+from banking.statements import build_statements, stored_statements
+
+
+class Command(BaseCommand):
+    help = 'Generate month-end statements for every account'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to generate as YYYY-MM; defaults to the previous month')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Accounts handled per chunk (one short transaction each)')
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Chunks processed in parallel')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds each worker sleeps between chunks to leave room for interactive traffic')
+
+    def handle(self, *args, **options):
+        start_date, end_date = self._month_bounds(options['month'])
+        if end_date >= timezone.localdate():
+            raise CommandError(f'{start_date:%Y-%m} has not ended yet')
+
+        account_ids = list(Account.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        chunks = [account_ids[i:i + chunk_size] for i in range(0, len(account_ids), chunk_size)]
+
+        def run_chunk(chunk):
+            try:
+                created = self._generate_chunk(chunk, start_date, end_date)
+                if options['pause']:
+                    time.sleep(options['pause'])
+                return created
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            created = sum(executor.map(run_chunk, chunks))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {created} statements for {start_date} to {end_date} '
+            f'({len(account_ids)} accounts in {len(chunks)} chunks)'
+        ))
+
+    def _month_bounds(self, month):
+        if month:
+            try:
+                start_date = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Month must use the YYYY-MM format')
+        else:
+            start_date = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        next_month = date(start_date.year + start_date.month // 12, start_date.month % 12 + 1, 1)
+        return start_date, next_month - timedelta(days=1)
+
+    def _generate_chunk(self, account_ids, start_date, end_date):
+        existing = set(stored_statements(start_date, end_date).filter(
+            account_id__in=account_ids
+        ).values_list('account_id', flat=True))
+
+        pending = [account_id for account_id in account_ids if account_id not in existing]
+        if not pending:
+            return 0
+
+        # Statements that could only use the current balance are not stored
+        statements = [
+            statement for statement in build_statements(pending, start_date, end_date)
+            if not statement.provisional
+        ]
+        with transaction.atomic():
+            # Rows stored before the month ended are replaced
+            Statement.objects.filter(
+                account_id__in=[statement.account_id for statement in statements],
+                start_date=start_date,
+                end_date=end_date
+            ).delete()
+            Statement.objects.bulk_create(statements, ignore_conflicts=True)
+        return len(statements)
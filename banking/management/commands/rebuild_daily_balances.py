@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+from banking.models import Account, DailyBalance, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailyBalance checkpoints from the Transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', action='append', dest='accounts',
+                            help='Account number to rebuild (repeatable); defaults to all accounts')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.all().order_by('pk')
+        if options['accounts']:
+            accounts = accounts.filter(account_number__in=options['accounts'])
+
+        rebuilt = 0
+        for account in accounts.iterator():
+            rebuilt += self._rebuild(account)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} daily balance checkpoints'))
+
+    def _rebuild(self, account):
+        days = list(
+            Transaction.objects.filter(account=account)
+            .annotate(day=TruncDate('created_at'))
+            .values('day')
+            .annotate(
+                count=Count('id'),
+                credits=Sum('amount', filter=Q(transaction_type__in=Transaction.CREDIT_TYPES)),
+                debits=Sum('amount', filter=Q(transaction_type__in=Transaction.DEBIT_TYPES)),
+            )
+            .order_by('-day')
+        )
+
+        # Walk backwards from the current balance so balances the account was
+        # opened or linked with are carried into every checkpoint
+        checkpoints = []
+        closing_balance = account.balance
+        for day in days:
+            credits = day['credits'] or Decimal('0.00')
+            debits = day['debits'] or Decimal('0.00')
+            checkpoints.append(DailyBalance(
+                account=account,
+                date=day['day'],
+                closing_balance=closing_balance,
+                transaction_count=day['count'],
+                total_credits=credits,
+                total_debits=debits
+            ))
+            closing_balance = closing_balance - credits + debits
+
+        with transaction.atomic():
+            DailyBalance.objects.filter(account=account).delete()
+            DailyBalance.objects.bulk_create(checkpoints, batch_size=1000)
+        return len(checkpoints)
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+
+from banking.models import Account
+from banking.reconciliation import OPENING_BALANCES, reconcile_range
+
+TOTALS = ('accounts', 'transactions', 'drifted_transactions', 'drifted_balances',
+          'repaired_transactions', 'repaired_balances')
+
+
+class Command(BaseCommand):
+    help = 'Check every balance_after and account balance against the transaction history, optionally repairing drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes reconciling account ranges in parallel; 1 runs in this process')
+        parser.add_argument('--range-size', type=int, default=500,
+                            help='Account ids handed to a worker at a time')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Transactions per bulk_update when repairing')
+        parser.add_argument('--opening', choices=OPENING_BALANCES, default='consensus',
+                            help='Opening balance of each account: the one most balance_after values agree on '
+                                 '(consensus) or zero')
+        parser.add_argument('--repair', action='store_true',
+                            help='Rewrite drifted balance_after values and account balances')
+        parser.add_argument('--checkpoint', default='reconcile_ledger.checkpoint.json',
+                            help='File recording finished ranges; removed once the run completes')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the ranges the checkpoint file records as finished')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        settings = {key: options[key] for key in ('range_size', 'opening', 'repair')}
+        state = self._load_checkpoint(options['checkpoint'], settings) if options['resume'] else None
+        if state is None:
+            state = {'settings': settings, 'done': [], 'totals': dict.fromkeys(TOTALS, 0)}
+        done = {tuple(bounds) for bounds in state['done']}
+
+        # Ranges are aligned on id values, so they stay the same between runs
+        size = options['range_size']
+        ids = Account.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        ranges = []
+        if ids['first'] is not None:
+            ranges = [
+                (start, start + size - 1)
+                for start in range((ids['first'] - 1) // size * size + 1, ids['last'] + 1, size)
+            ]
+        pending = [bounds for bounds in ranges if bounds not in done]
+        if done:
+            self.stdout.write(f'Resuming: {len(ranges) - len(pending)} of {len(ranges)} ranges already reconciled')
+
+        jobs = [
+            (first_id, last_id, options['opening'], options['repair'], options['batch_size'])
+            for first_id, last_id in pending
+        ]
+        if options['workers'] > 1:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+                futures = [pool.submit(reconcile_range, *job) for job in jobs]
+                for future in as_completed(futures):
+                    self._record(future.result(), state, options['checkpoint'])
+        else:
+            # A single worker runs in this process, on its connection
+            for job in jobs:
+                self._record(reconcile_range(*job), state, options['checkpoint'])
+
+        if os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+        totals = state['totals']
+        summary = (
+            f"Reconciled {totals['accounts']} accounts and {totals['transactions']} transactions "
+            f"in {time.monotonic() - started:.1f}s: {totals['drifted_transactions']} balance_after and "
+            f"{totals['drifted_balances']} account balances drifted"
+        )
+        if options['repair']:
+            summary += f"; repaired {totals['repaired_transactions']} and {totals['repaired_balances']}"
+            if totals['repaired_transactions'] or totals['repaired_balances']:
+                summary += ' (run rebuild_daily_balances to refresh the checkpoints)'
+        style = self.style.WARNING if totals['drifted_transactions'] or totals['drifted_balances'] else self.style.SUCCESS
+        self.stdout.write(style(summary))
+
+    def _record(self, result, state, checkpoint):
+        for entry in result['drift']:
+            self._report(entry)
+        for key in TOTALS:
+            state['totals'][key] += result[key]
+        state['done'].append([result['first_id'], result['last_id']])
+        self._save_checkpoint(checkpoint, state)
+
+    def _report(self, entry):
+        parts = []
+        if entry['transactions']:
+            parts.append(f"{entry['transactions']} transactions with a wrong balance_after "
+                         f"(first id {entry['first_transaction']})")
+        if 'expected_balance' in entry:
+            balance = f"balance {entry['balance']}, ledger says {entry['expected_balance']}"
+            if entry.get('repaired') is False:
+                balance += ' (changed during the run, not repaired)'
+            parts.append(balance)
+        self.stdout.write(f"Account {entry['account_id']}: {'; '.join(parts)}")
+
+    def _load_checkpoint(self, path, settings):
+        try:
+            with open(path) as checkpoint:
+                state = json.load(checkpoint)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise CommandError(f'Checkpoint {path} is not valid JSON')
+        if state.get('settings') != settings:
+            raise CommandError(
+                f"Checkpoint {path} was written with {state.get('settings')}; rerun with the same options or without --resume"
+            )
+        return state
+
+    def _save_checkpoint(self, path, state):
+        # Write then rename, so an interrupted write cannot corrupt the checkpoint
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-18 08:42
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+CREDIT_TYPES = ['deposit', 'transfer_in', 'interest']
+DEBIT_TYPES = ['withdrawal', 'transfer_out', 'fee']
+
+
+def backfill_daily_balances(apps, schema_editor):
+    """One checkpoint per account and active day, like the rebuild_daily_balances command"""
+    Account = apps.get_model('banking', 'Account')
+    Transaction = apps.get_model('banking', 'Transaction')
+    DailyBalance = apps.get_model('banking', 'DailyBalance')
+
+    balances = dict(Account.objects.values_list('pk', 'balance'))
+    days = Transaction.objects.annotate(day=TruncDate('created_at')).order_by().values(
+        'account_id', 'day'
+    ).annotate(
+        count=Count('id'),
+        credits=Sum('amount', filter=Q(transaction_type__in=CREDIT_TYPES)),
+        debits=Sum('amount', filter=Q(transaction_type__in=DEBIT_TYPES)),
+    ).order_by('account_id', '-day')
+
+    # Walk each account backwards from its current balance, newest day first
+    checkpoints = []
+    closing = {}
+    for row in days.iterator():
+        account_id = row['account_id']
+        closing_balance = closing.get(account_id, balances[account_id])
+        credits = row['credits'] or Decimal('0.00')
+        debits = row['debits'] or Decimal('0.00')
+        checkpoints.append(DailyBalance(
+            account_id=account_id,
+            date=row['day'],
+            closing_balance=closing_balance,
+            transaction_count=row['count'],
+            total_credits=credits,
+            total_debits=debits
+        ))
+        closing[account_id] = closing_balance - credits + debits
+    DailyBalance.objects.bulk_create(checkpoints, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('closing_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('total_debits', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('total_credits', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balances', to='banking.account')),
+            ],
+            options={
+                'unique_together': {('account', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-18 08:45
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+CREDIT_TYPES = ['deposit', 'transfer_in', 'interest']
+DEBIT_TYPES = ['withdrawal', 'transfer_out', 'fee']
+
+
+def dedupe_statements(apps, schema_editor):
+    """Keep the newest statement per (account, start_date, end_date) and fill its aggregates.
+
+    Statements generated before their period ended took the account balance of
+    that moment as the closing balance, so they are deleted rather than kept.
+    """
+    Statement = apps.get_model('banking', 'Statement')
+    Transaction = apps.get_model('banking', 'Transaction')
+
+    seen = set()
+    discarded = []
+    for statement in Statement.objects.order_by('-generated_at', '-id'):
+        key = (statement.account_id, statement.start_date, statement.end_date)
+        if key in seen or statement.end_date >= timezone.localdate(statement.generated_at):
+            discarded.append(statement.pk)
+            continue
+        seen.add(key)
+
+        totals = Transaction.objects.filter(
+            account_id=statement.account_id,
+            created_at__date__gte=statement.start_date,
+            created_at__date__lte=statement.end_date
+        ).aggregate(
+            count=Count('id'),
+            credits=Sum('amount', filter=Q(transaction_type__in=CREDIT_TYPES)),
+            debits=Sum('amount', filter=Q(transaction_type__in=DEBIT_TYPES)),
+        )
+        statement.transaction_count = totals['count']
+        statement.total_credits = totals['credits'] or 0
+        statement.total_debits = totals['debits'] or 0
+        statement.save(update_fields=['transaction_count', 'total_credits', 'total_debits'])
+
+    Statement.objects.filter(pk__in=discarded).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='total_credits',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='total_debits',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='transaction_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(dedupe_statements, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='statement',
+            unique_together={('account', 'start_date', 'end_date')},
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from accounts.cache import invalidate_dashboard
 import uuid
 
 class AccountType(models.Model):
@@ -45,80 +48,32 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.account_number} - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_dashboard(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            invalidate_dashboard(self.user_id)
+        return result
+
     def deposit(self, amount):
         """Add funds to account"""
-        if amount <= 0:
-            raise ValueError("Deposit amount must be positive")
-        self.balance += amount
-        self.save()
-        Transaction.objects.create(
-            account=self,
-            transaction_type='deposit',
-            amount=amount,
-            description=f"Deposit to account {self.account_number}"
-        )
+        from .ledger import post_deposit
+        post_deposit(self, amount)
         return self.balance
 
     def withdraw(self, amount):
         """Remove funds from account"""
-        if amount <= 0:
-            raise ValueError("Withdrawal amount must be positive")
-        if amount > self.balance:
-            raise ValueError("Insufficient funds")
-        self.balance -= amount
-        self.save()
-        Transaction.objects.create(
-            account=self,
-            transaction_type='withdrawal',
-            amount=amount,
-            description=f"Withdrawal from account {self.account_number}"
-        )
+        from .ledger import post_withdrawal
+        post_withdrawal(self, amount)
         return self.balance
 
     def transfer(self, destination_account, amount):
         """Transfer funds to another account"""
-        if amount <= 0:
-            raise ValueError("Transfer amount must be positive")
-        if amount > self.balance:
-            raise ValueError("Insufficient funds")
-
-        # Create a transfer record
-        transfer = Transfer.objects.create(
-            source_account=self,
-            destination_account=destination_account,
-            amount=amount,
-            status='pending'
-        )
-
-        # Perform the transfer
-        self.balance -= amount
-        self.save()
-
-        destination_account.balance += amount
-        destination_account.save()
-
-        # Update transfer status
-        transfer.status = 'completed'
-        transfer.save()
-
-        # Create transaction records
-        Transaction.objects.create(
-            account=self,
-            transaction_type='transfer_out',
-            amount=amount,
-            description=f"Transfer to account {destination_account.account_number}",
-            related_transfer=transfer
-        )
-
-        Transaction.objects.create(
-            account=destination_account,
-            transaction_type='transfer_in',
-            amount=amount,
-            description=f"Transfer from account {self.account_number}",
-            related_transfer=transfer
-        )
-
-        return transfer
+        from .ledger import post_transfer
+        return post_transfer(self, destination_account, amount)
 
 class Transfer(models.Model):
     """Record of transfers between accounts"""
@@ -152,6 +107,9 @@ class Transaction(models.Model):
         ('fee', 'Fee'),
     ]
 
+    CREDIT_TYPES = ['deposit', 'transfer_in', 'interest']
+    DEBIT_TYPES = ['withdrawal', 'transfer_out', 'fee']
+
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
     transaction_type = models.CharField(max_length=15, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -161,14 +119,27 @@ class Transaction(models.Model):
     related_transfer = models.ForeignKey(Transfer, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     reference_number = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
+    class Meta:
+        indexes = [
+            # Per-account history and the join from account__user both seek on this
+            models.Index(fields=['account', 'created_at'], name='txn_account_created_idx'),
+            models.Index(fields=['transaction_type', 'created_at'], name='txn_type_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} - {self.amount} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
     def save(self, *args, **kwargs):
-        # Set balance_after if not provided
-        if not self.balance_after and self.account:
-            self.balance_after = self.account.balance
+        # Set balance_after if not provided, from the stored balance rather
+        # than a possibly stale in-memory account; a balance of zero is a value
+        if self.balance_after is None and self.account_id:
+            self.balance_after = Account.objects.filter(pk=self.account_id).values_list('balance', flat=True).first()
+        is_new = self._state.adding
         super().save(*args, **kwargs)
+        if is_new:
+            # Bulk-created rows are processed by the ledger itself
+            from transactions.postings import process_postings
+            process_postings([self])
 
 class Statement(models.Model):
     """Monthly account statements"""
@@ -177,8 +148,81 @@ class Statement(models.Model):
     end_date = models.DateField()
     opening_balance = models.DecimalField(max_digits=12, decimal_places=2)
     closing_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_debits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_credits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     generated_at = models.DateTimeField(auto_now_add=True)
     pdf_file = models.FileField(upload_to='statements/', null=True, blank=True)
 
+    class Meta:
+        unique_together = ['account', 'start_date', 'end_date']
+
     def __str__(self):
         return f"Statement for {self.account.account_number} - {self.start_date} to {self.end_date}"
+
+    @property
+    def net_change(self):
+        return self.closing_balance - self.opening_balance
+
+class DailyBalance(models.Model):
+    """End-of-day balance checkpoint, maintained by the ledger as postings happen"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_balances')
+    date = models.DateField()
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_debits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_credits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    class Meta:
+        unique_together = ['account', 'date']
+
+    def __str__(self):
+        return f"{self.account.account_number} - {self.date}: {self.closing_balance}"
+
+    @property
+    def opening_balance(self):
+        return self.closing_balance - self.total_credits + self.total_debits
+
+    @classmethod
+    def balance_expression(cls, day, account_ref='pk', current=True):
+        """Expression for an account's balance at the end of ``day``, for use in annotate().
+
+        An account without checkpoints falls back to its current balance, or
+        to NULL when ``current`` is False.
+        """
+        before = cls.objects.filter(account=OuterRef(account_ref), date__lte=day).order_by('-date')
+        # With no activity up to this day, the balance is what the first active day opened with
+        after = cls.objects.filter(account=OuterRef(account_ref), date__gt=day).order_by('date')
+        return Coalesce(
+            Subquery(before.values('closing_balance')[:1]),
+            Subquery(after.values(
+                opening=F('closing_balance') - F('total_credits') + F('total_debits')
+            )[:1]),
+            *([F('balance')] if current else []),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+
+    @classmethod
+    def recent_activity_start(cls, user, count):
+        """First day that still has to be read to find a user's ``count`` newest transactions.
+
+        Every checkpoint has at least one transaction, so the ``count`` most recent
+        active days always hold them. Returns None when there are fewer checkpointed
+        days than that and the caller has to read the full history.
+        """
+        days = list(
+            cls.objects.filter(account__user=user)
+            .values_list('date', flat=True)
+            .distinct()
+            .order_by('-date')[:count]
+        )
+        if len(days) < count:
+            return None
+        return days[-1]
+
+    @classmethod
+    def balance_on(cls, account, day):
+        """Balance of an account at the end of ``day``, read from checkpoints"""
+        return Account.objects.filter(pk=account.pk).annotate(
+            balance_on=cls.balance_expression(day)
+        ).values_list('balance_on', flat=True).get()
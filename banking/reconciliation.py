@@ -0,0 +1,133 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, When, Window
+
+from accounts.cache import invalidate_dashboard
+
+from .models import Account, Transaction
+
+CENT = Decimal('0.01')
+# Wide enough for a running total over an account's whole history
+RUNNING_FIELD = DecimalField(max_digits=20, decimal_places=2)
+SIGNED_AMOUNT = Case(
+    When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('amount')),
+    default=-F('amount'),
+    output_field=RUNNING_FIELD
+)
+
+# Where an account's history starts from: 'consensus' takes the opening
+# balance most of its balance_after values agree on, so accounts opened or
+# linked with a balance reconcile and a few bad rows cannot shift it; 'zero'
+# treats the rows as the full history
+OPENING_BALANCES = ('consensus', 'zero')
+
+
+def running_balances(first_id, last_id):
+    """Stream (transaction id, account id, balance_after, running total) for a range of accounts.
+
+    The running total is the SUM() window of signed amounts over each
+    account's history in (created_at, id) order, computed by the database.
+    """
+    return Transaction.objects.filter(account_id__gte=first_id, account_id__lte=last_id).annotate(
+        running=Window(
+            Sum(SIGNED_AMOUNT),
+            partition_by=[F('account_id')],
+            order_by=[F('created_at').asc(), F('id').asc()],
+            output_field=RUNNING_FIELD
+        )
+    ).order_by('account_id', 'created_at', 'id').values_list(
+        'pk', 'account_id', 'balance_after', 'running'
+    ).iterator(chunk_size=5000)
+
+
+def opening_balance(history, opening):
+    """The balance an account's history starts from; ``history`` is its (id, balance_after, running) rows"""
+    if opening == 'zero':
+        return Decimal('0.00')
+    # Ties go to the oldest row's value
+    candidates = Counter(balance_after - running for pk, balance_after, running in history if balance_after is not None)
+    return candidates.most_common(1)[0][0] if candidates else Decimal('0.00')
+
+
+def reconcile_range(first_id, last_id, opening='consensus', repair=False, batch_size=1000):
+    """Check, and optionally repair, the ledger of the accounts with ids in [first_id, last_id].
+
+    Every transaction's balance_after must equal the opening balance plus the
+    running total of the account's transactions, and the account balance
+    must equal the last of those. Repairs rewrite balance_after with chunked
+    bulk_updates; an account balance is only rewritten if it still holds the
+    value that was checked, so a posting made meanwhile is never overwritten.
+    Returns a summary dict with one drift entry per drifted account.
+    """
+    accounts = {
+        pk: (balance, user_id)
+        for pk, balance, user_id in Account.objects.filter(pk__range=(first_id, last_id)).values_list('pk', 'balance', 'user_id')
+    }
+    result = {
+        'first_id': first_id,
+        'last_id': last_id,
+        'accounts': len(accounts),
+        'transactions': 0,
+        'drifted_transactions': 0,
+        'drifted_balances': 0,
+        'repaired_transactions': 0,
+        'repaired_balances': 0,
+        'drift': [],
+    }
+    fixes = []
+    closing = {}
+    drift = {}
+
+    def flush():
+        if repair and fixes:
+            with transaction.atomic():
+                Transaction.objects.bulk_update(fixes, ['balance_after'], batch_size=batch_size)
+            result['repaired_transactions'] += len(fixes)
+        fixes.clear()
+
+    def check(account_id, history):
+        start = opening_balance(history, opening)
+        for pk, balance_after, running in history:
+            expected = (start + running).quantize(CENT)
+            if balance_after != expected:
+                entry = drift.setdefault(account_id, {'account_id': account_id, 'transactions': 0, 'first_transaction': pk})
+                entry['transactions'] += 1
+                result['drifted_transactions'] += 1
+                fixes.append(Transaction(pk=pk, balance_after=expected))
+                if len(fixes) >= batch_size:
+                    flush()
+        closing[account_id] = expected
+        result['transactions'] += len(history)
+
+    # Rows arrive grouped by account; each account's history is checked as a whole
+    account_id, history = None, []
+    for pk, current, balance_after, running in running_balances(first_id, last_id):
+        if current != account_id:
+            if history:
+                check(account_id, history)
+            account_id, history = current, []
+        history.append((pk, balance_after, running))
+    if history:
+        check(account_id, history)
+    flush()
+
+    for account_id, expected in closing.items():
+        balance, user_id = accounts.get(account_id, (None, None))
+        if balance is None or balance == expected:
+            continue
+        entry = drift.setdefault(account_id, {'account_id': account_id, 'transactions': 0, 'first_transaction': None})
+        entry['balance'] = str(balance)
+        entry['expected_balance'] = str(expected)
+        result['drifted_balances'] += 1
+        if repair:
+            with transaction.atomic():
+                updated = Account.objects.filter(pk=account_id, balance=balance).update(balance=expected)
+                if updated:
+                    invalidate_dashboard(user_id)
+            result['repaired_balances'] += updated
+            entry['repaired'] = bool(updated)
+
+    result['drift'] = [drift[account_id] for account_id in sorted(drift)]
+    return result
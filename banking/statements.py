@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .filters import created_between, day_start
+from .models import Account, DailyBalance, Statement, Transaction
+
+BALANCE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def ledger_balance_expression(day):
+    """An account's balance at the end of ``day`` from Transaction.balance_after, for use in annotate().
+
+    NULL when the account has no transaction carrying a balance_after.
+    """
+    end = day_start(day + timedelta(days=1))
+    posted = Transaction.objects.filter(account=OuterRef('pk'), balance_after__isnull=False)
+    before = posted.filter(created_at__lt=end).order_by('-created_at', '-pk')
+    # With no transaction up to this day, the balance is what the next one started from
+    after = posted.filter(created_at__gte=end).order_by('created_at', 'pk').annotate(
+        opening=Case(
+            When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('balance_after') - F('amount')),
+            default=F('balance_after') + F('amount'),
+            output_field=BALANCE_FIELD
+        )
+    )
+    return Coalesce(
+        Subquery(before.values('balance_after')[:1]),
+        Subquery(after.values('opening')[:1]),
+        output_field=BALANCE_FIELD
+    )
+
+
+def build_statements(account_ids, start_date, end_date):
+    """Build unsaved statements for many accounts with a fixed number of queries.
+
+    Balances and debit/credit/count totals come from the DailyBalance checkpoints
+    rather than from the Transaction rows. Accounts without checkpoints are
+    read from their transactions' balance_after instead; when they have no
+    transactions either, the current balance is all there is, and the
+    statement is marked ``provisional`` so that it is never stored.
+    """
+    accounts = Account.objects.filter(pk__in=account_ids).annotate(
+        checkpointed=Exists(DailyBalance.objects.filter(account=OuterRef('pk'))),
+        opening=Coalesce(
+            DailyBalance.balance_expression(start_date - timedelta(days=1), current=False),
+            ledger_balance_expression(start_date - timedelta(days=1))
+        ),
+        closing=Coalesce(
+            DailyBalance.balance_expression(end_date, current=False),
+            ledger_balance_expression(end_date)
+        ),
+    ).values_list('pk', 'balance', 'checkpointed', 'opening', 'closing')
+
+    totals = {
+        row['account_id']: row
+        for row in DailyBalance.objects.filter(
+            account_id__in=account_ids,
+            date__gte=start_date,
+            date__lte=end_date
+        ).values('account_id').annotate(
+            count=Sum('transaction_count'),
+            debits=Sum('total_debits'),
+            credits=Sum('total_credits'),
+        )
+    }
+
+    accounts = list(accounts)
+    unchecked = [account_id for account_id, balance, checkpointed, *_ in accounts if not checkpointed]
+    if unchecked:
+        totals.update(
+            (row['account_id'], row)
+            for row in Transaction.objects.filter(
+                created_between(start_date, end_date),
+                account_id__in=unchecked
+            ).order_by().values('account_id').annotate(
+                count=Count('pk'),
+                debits=Sum('amount', filter=Q(transaction_type__in=Transaction.DEBIT_TYPES)),
+                credits=Sum('amount', filter=Q(transaction_type__in=Transaction.CREDIT_TYPES)),
+            )
+        )
+
+    statements = []
+    for account_id, balance, checkpointed, opening, closing in accounts:
+        total = totals.get(account_id, {})
+        statement = Statement(
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date,
+            opening_balance=balance if opening is None else opening,
+            closing_balance=balance if closing is None else closing,
+            transaction_count=total.get('count') or 0,
+            total_debits=total.get('debits') or 0,
+            total_credits=total.get('credits') or 0,
+        )
+        statement.provisional = opening is None or closing is None
+        statements.append(statement)
+    return statements
+
+
+def stored_statements(start_date, end_date):
+    """Stored statements for a date range that were generated after the range closed.
+
+    Rows generated while their period was still open may hold the balance of
+    that moment rather than the one at the end of the period, so they are
+    never reused.
+    """
+    return Statement.objects.filter(
+        start_date=start_date,
+        end_date=end_date,
+        generated_at__gte=day_start(end_date + timedelta(days=1))
+    )
+
+
+def get_statement(account, start_date, end_date):
+    """Return the statement for a date range, reusing the stored one when possible.
+
+    Periods that include today are still changing, so they are built on the fly
+    and not saved; closed periods are stored once and reused afterwards, unless
+    their balances could only be taken from the account's current balance.
+    """
+    statement = stored_statements(start_date, end_date).filter(account=account).first()
+    if statement:
+        return statement
+
+    statement = build_statements([account.pk], start_date, end_date)[0]
+    statement.account = account
+    if end_date >= timezone.localdate() or statement.provisional:
+        return statement
+
+    try:
+        with transaction.atomic():
+            # A row stored before the period closed is replaced
+            Statement.objects.filter(account=account, start_date=start_date, end_date=end_date).delete()
+            statement.save()
+    except IntegrityError:
+        # Another request stored the same statement first
+        statement = Statement.objects.get(account=account, start_date=start_date, end_date=end_date)
+    return statement
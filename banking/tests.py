@@ -1,3 +1,370 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+
+from .filters import TransactionFilter, date_range, day_start
+from .ledger import post_batch, post_transfer
+from .reconciliation import reconcile_range
+from .models import Account, AccountType, DailyBalance, Statement, Transaction, Transfer
+from .statements import get_statement
+
+
+class BankingTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='bank@example.com', password='x', first_name='Bank', last_name='Test')
+        cls.other = User.objects.create_user(email='elsewhere@example.com', password='x', first_name='Else', last_name='Where')
+        cls.account_type = AccountType.objects.create(name='Checking', description='Checking')
+
+    def create_account(self, number, user=None, balance=Decimal('0.00')):
+        return Account.objects.create(user=user or self.user, account_type=self.account_type,
+                                      account_number=number, balance=balance)
+
+
+class DateRangeTests(TestCase):
+    """The API date ranges and TransactionFilter share one parser"""
+
+    def test_explicit_dates_and_period(self):
+        today = timezone.localdate()
+        self.assertEqual(date_range({'start_date': '2026-01-05', 'end_date': '2026-02-01'}),
+                         (date(2026, 1, 5), date(2026, 2, 1)))
+        self.assertEqual(date_range({'period': 'this_month'}), (today.replace(day=1), today))
+        self.assertEqual(date_range({}), (today - timedelta(days=30), today))
+        self.assertEqual(date_range({'period': 'this_month', 'end_date': '2030-01-01'}),
+                         (today.replace(day=1), date(2030, 1, 1)))
+
+    def test_invalid_values_are_reported_alike(self):
+        params = {'start_date': '05/01/2026', 'period': 'fortnight'}
+        with self.assertRaises(ValueError) as raised:
+            date_range(params)
+        self.assertEqual(set(TransactionFilter(params).errors), {'start_date', 'period'})
+        self.assertIn('Invalid start date format', str(raised.exception))
+
+
+class LedgerTests(BankingTestCase):
+    """Deposits, withdrawals and transfers change balances and rows together or not at all"""
+
+    def setUp(self):
+        self.checking = self.create_account('LEDG0001')
+        self.savings = self.create_account('LEDG0002')
+        self.checking.deposit(Decimal('100.00'))
+
+    def snapshot(self):
+        return (
+            list(Account.objects.order_by('pk').values_list('pk', 'balance')),
+            list(Transaction.objects.order_by('pk').values_list('pk', 'balance_after')),
+            list(DailyBalance.objects.order_by('pk').values_list('pk', 'closing_balance', 'transaction_count')),
+            Transfer.objects.count(),
+        )
+
+    def test_insufficient_withdrawal_changes_nothing(self):
+        before = self.snapshot()
+        with self.assertRaisesMessage(ValueError, 'Insufficient funds'):
+            self.checking.withdraw(Decimal('100.01'))
+        self.assertEqual(self.snapshot(), before)
+
+    def test_insufficient_transfer_changes_nothing(self):
+        before = self.snapshot()
+        with self.assertRaisesMessage(ValueError, 'Insufficient funds'):
+            self.checking.transfer(self.savings, Decimal('250.00'))
+        self.assertEqual(self.snapshot(), before)
+
+    def test_transfer_writes_both_legs(self):
+        transfer = self.checking.transfer(self.savings, Decimal('40.00'))
+        legs = {
+            txn.transaction_type: txn
+            for txn in Transaction.objects.filter(related_transfer=transfer)
+        }
+        self.assertEqual(set(legs), {'transfer_out', 'transfer_in'})
+        self.assertEqual((legs['transfer_out'].account_id, legs['transfer_out'].balance_after),
+                         (self.checking.pk, Decimal('60.00')))
+        self.assertEqual((legs['transfer_in'].account_id, legs['transfer_in'].balance_after),
+                         (self.savings.pk, Decimal('40.00')))
+        self.assertEqual(Account.objects.get(pk=self.checking.pk).balance, Decimal('60.00'))
+        self.assertEqual(Account.objects.get(pk=self.savings.pk).balance, Decimal('40.00'))
+
+    def test_failed_leg_rolls_back_transfer(self):
+        before = self.snapshot()
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                post_transfer(self.checking, self.savings, Decimal('40.00'))
+        self.assertEqual(self.snapshot(), before)
+
+    def test_balance_after_is_set_on_every_row(self):
+        self.checking.withdraw(Decimal('30.00'))
+        self.checking.transfer(self.savings, Decimal('25.00'))
+        self.savings.deposit(Decimal('5.00'))
+        self.savings.transfer(self.checking, Decimal('10.00'))
+
+        for account in (self.checking, self.savings):
+            running = Decimal('0.00')
+            for txn in Transaction.objects.filter(account=account).order_by('created_at', 'pk'):
+                running += txn.amount if txn.transaction_type in Transaction.CREDIT_TYPES else -txn.amount
+                self.assertEqual(txn.balance_after, running, txn)
+            self.assertEqual(Account.objects.get(pk=account.pk).balance, running)
+
+
+class PostBatchTests(BankingTestCase):
+    """Batched postings are applied or rejected one by one, with running balances per account"""
+
+    def setUp(self):
+        self.checking = self.create_account('BATCH001')
+        self.savings = self.create_account('BATCH002', balance=Decimal('10.00'))
+        self.foreign = self.create_account('BATCH003', user=self.other, balance=Decimal('500.00'))
+
+    def post(self, *postings):
+        return post_batch([
+            {'account': account.pk if isinstance(account, Account) else account,
+             'transaction_type': transaction_type, 'amount': Decimal(amount)}
+            for account, transaction_type, amount in postings
+        ], accounts=Account.objects.filter(user=self.user))
+
+    def test_mixed_success_and_failure(self):
+        results = self.post(
+            (self.checking, 'deposit', '50.00'),
+            (self.savings, 'withdrawal', '25.00'),
+            (self.checking, 'withdrawal', '20.00'),
+            (self.savings, 'deposit', '1.00'),
+        )
+        self.assertEqual([result['success'] for result in results], [True, False, True, True])
+        self.assertEqual(results[1], {'index': 1, 'success': False, 'error': 'Insufficient funds'})
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertEqual(Account.objects.get(pk=self.checking.pk).balance, Decimal('30.00'))
+        self.assertEqual(Account.objects.get(pk=self.savings.pk).balance, Decimal('11.00'))
+        self.assertEqual(Transaction.objects.filter(account__in=[self.checking, self.savings]).count(), 3)
+
+    def test_running_balance_after_within_one_account(self):
+        results = self.post(
+            (self.checking, 'deposit', '100.00'),
+            (self.checking, 'withdrawal', '30.00'),
+            (self.checking, 'withdrawal', '80.00'),
+            (self.checking, 'deposit', '5.50'),
+            (self.checking, 'withdrawal', '75.50'),
+        )
+        self.assertEqual(
+            [result.get('balance_after') for result in results],
+            [Decimal('100.00'), Decimal('70.00'), None, Decimal('75.50'), Decimal('0.00')]
+        )
+        stored = Transaction.objects.filter(account=self.checking).order_by('pk').values_list('balance_after', flat=True)
+        self.assertEqual(list(stored), [Decimal('100.00'), Decimal('70.00'), Decimal('75.50'), Decimal('0.00')])
+        self.assertEqual(Account.objects.get(pk=self.checking.pk).balance, Decimal('0.00'))
+        checkpoint = DailyBalance.objects.get(account=self.checking)
+        self.assertEqual((checkpoint.closing_balance, checkpoint.transaction_count), (Decimal('0.00'), 4))
+
+    def test_unknown_and_foreign_accounts_are_rejected(self):
+        unknown = Account.objects.order_by('-pk').values_list('pk', flat=True).first() + 100
+        results = self.post(
+            (self.foreign, 'withdrawal', '50.00'),
+            (unknown, 'deposit', '10.00'),
+            (self.checking, 'deposit', '10.00'),
+        )
+        self.assertEqual(results[0], {'index': 0, 'success': False, 'error': 'Account not found'})
+        self.assertEqual(results[1], {'index': 1, 'success': False, 'error': 'Account not found'})
+        self.assertTrue(results[2]['success'])
+        self.assertEqual(Account.objects.get(pk=self.foreign.pk).balance, Decimal('500.00'))
+        self.assertFalse(Transaction.objects.filter(account=self.foreign).exists())
+
+
+class StatementTests(BankingTestCase):
+    """Closed-period statements never store the current balance as a historical one"""
+
+    def setUp(self):
+        self.end_date = timezone.localdate().replace(day=1) - timedelta(days=1)
+        self.start_date = self.end_date.replace(day=1)
+
+    def test_statement_without_checkpoints_uses_balance_after(self):
+        account = self.create_account('STMT0001')
+        account.deposit(Decimal('100.00'))
+        account.withdraw(Decimal('30.00'))
+        account.deposit(Decimal('50.00'))
+        # History from before the checkpoints existed: two postings last month, one since
+        first, second, third = Transaction.objects.filter(account=account).order_by('pk')
+        Transaction.objects.filter(pk=first.pk).update(created_at=day_start(self.start_date) + timedelta(hours=9))
+        Transaction.objects.filter(pk=second.pk).update(created_at=day_start(self.end_date) + timedelta(hours=9))
+        DailyBalance.objects.filter(account=account).delete()
+
+        statement = get_statement(account, self.start_date, self.end_date)
+        self.assertEqual(statement.opening_balance, Decimal('0.00'))
+        self.assertEqual(statement.closing_balance, Decimal('70.00'))
+        self.assertEqual(statement.transaction_count, 2)
+        self.assertEqual(statement.total_credits, Decimal('100.00'))
+        self.assertEqual(statement.total_debits, Decimal('30.00'))
+        self.assertTrue(Statement.objects.filter(pk=statement.pk).exists())
+
+    def test_statement_without_history_is_not_stored(self):
+        account = self.create_account('STMT0002', balance=Decimal('80.00'))
+        statement = get_statement(account, self.start_date, self.end_date)
+        self.assertTrue(statement.provisional)
+        self.assertEqual(statement.closing_balance, Decimal('80.00'))
+        self.assertFalse(Statement.objects.filter(account=account).exists())
+
+    def legacy_statement(self, account, start_date, end_date):
+        # The old view stored the balance of the moment, mid-period, as the closing balance
+        statement = Statement.objects.create(account=account, start_date=start_date, end_date=end_date,
+                                             opening_balance=Decimal('0.00'), closing_balance=Decimal('999.00'))
+        Statement.objects.filter(pk=statement.pk).update(generated_at=day_start(end_date) + timedelta(hours=12))
+        return statement
+
+    def test_statement_stored_before_the_period_closed_is_replaced(self):
+        account = self.create_account('STMT0003')
+        with mock.patch('django.utils.timezone.now', return_value=day_start(self.end_date) + timedelta(hours=9)):
+            account.deposit(Decimal('70.00'))
+        legacy = self.legacy_statement(account, self.start_date, self.end_date)
+
+        statement = get_statement(account, self.start_date, self.end_date)
+        self.assertEqual(statement.closing_balance, Decimal('70.00'))
+        self.assertFalse(Statement.objects.filter(pk=legacy.pk).exists())
+        self.assertEqual(Statement.objects.get(account=account).closing_balance, Decimal('70.00'))
+
+    def test_open_period_ignores_stored_statement(self):
+        account = self.create_account('STMT0004')
+        account.deposit(Decimal('70.00'))
+        today = timezone.localdate()
+        self.legacy_statement(account, today - timedelta(days=30), today)
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/banking/accounts/{account.account_number}/statement/')
+        self.assertEqual(response.context['statement'].closing_balance, Decimal('70.00'))
+
+    def test_migration_discards_statements_generated_before_close(self):
+        account = self.create_account('STMT0005')
+        legacy = self.legacy_statement(account, self.start_date, self.end_date)
+        earlier = self.end_date.replace(day=1) - timedelta(days=1)
+        closed = Statement.objects.create(account=account, start_date=earlier.replace(day=1), end_date=earlier,
+                                          opening_balance=Decimal('0.00'), closing_balance=Decimal('0.00'))
+
+        migration = import_module('banking.migrations.0004_statement_aggregates')
+        migration.dedupe_statements(apps, None)
+        self.assertEqual(list(Statement.objects.filter(account=account).values_list('pk', flat=True)), [closed.pk])
+        self.assertFalse(Statement.objects.filter(pk=legacy.pk).exists())
+
+
+class DailyBalanceRebuildTests(BankingTestCase):
+    """Checkpoints rebuilt from the history equal the ones the ledger maintained"""
+
+    def setUp(self):
+        checking = self.create_account('DAY00001')
+        savings = self.create_account('DAY00002', balance=Decimal('40.00'))
+        now = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=now - timedelta(days=3)):
+            checking.deposit(Decimal('200.00'))
+            checking.withdraw(Decimal('35.50'))
+        with mock.patch('django.utils.timezone.now', return_value=now - timedelta(days=1)):
+            checking.transfer(savings, Decimal('60.00'))
+        savings.withdraw(Decimal('10.00'))
+        savings.transfer(checking, Decimal('7.75'))
+        self.live = self.checkpoints()
+
+    def checkpoints(self):
+        return list(DailyBalance.objects.order_by('account_id', 'date').values_list(
+            'account_id', 'date', 'closing_balance', 'transaction_count', 'total_debits', 'total_credits'
+        ))
+
+    def test_rebuild_matches_live_postings(self):
+        self.assertEqual(len(self.live), 5)
+        DailyBalance.objects.all().delete()
+        call_command('rebuild_daily_balances', stdout=StringIO())
+        self.assertEqual(self.checkpoints(), self.live)
+
+    def test_migration_backfill_matches_live_postings(self):
+        migration = import_module('banking.migrations.0002_dailybalance')
+        DailyBalance.objects.all().delete()
+        migration.backfill_daily_balances(apps, None)
+        self.assertEqual(self.checkpoints(), self.live)
+
+
+class ReconciliationTests(BankingTestCase):
+    """reconcile_ledger finds and repairs drift, and resumes from its checkpoint file"""
+
+    def setUp(self):
+        self.accounts = [self.create_account(f'RECO000{n}') for n in range(1, 4)]
+        for account in self.accounts:
+            account.deposit(Decimal('100.00'))
+            account.withdraw(Decimal('20.00'))
+            account.deposit(Decimal('5.00'))
+            account.withdraw(Decimal('1.00'))
+        self.first_id, self.last_id = self.accounts[0].pk, self.accounts[-1].pk
+        self.checkpoint = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'reconcile.json')
+
+    def corrupt(self):
+        txn = Transaction.objects.filter(account=self.accounts[0]).order_by('pk')[1]
+        Transaction.objects.filter(pk=txn.pk).update(balance_after=Decimal('999.00'))
+        Account.objects.filter(pk=self.accounts[2].pk).update(balance=Decimal('50.00'))
+        return txn
+
+    def reconcile(self, **options):
+        output = StringIO()
+        call_command('reconcile_ledger', workers=1, checkpoint=self.checkpoint, stdout=output, **options)
+        return output.getvalue()
+
+    def test_clean_ledger_has_no_drift(self):
+        result = reconcile_range(self.first_id, self.last_id)
+        self.assertEqual((result['transactions'], result['drifted_transactions'], result['drifted_balances']), (12, 0, 0))
+
+    def test_drift_is_detected(self):
+        txn = self.corrupt()
+        result = reconcile_range(self.first_id, self.last_id)
+        self.assertEqual((result['drifted_transactions'], result['drifted_balances']), (1, 1))
+        self.assertEqual(result['drift'], [
+            {'account_id': self.accounts[0].pk, 'transactions': 1, 'first_transaction': txn.pk},
+            {'account_id': self.accounts[2].pk, 'transactions': 0, 'first_transaction': None,
+             'balance': '50.00', 'expected_balance': '84.00'},
+        ])
+        # Checking alone changes nothing
+        self.assertIn('1 balance_after and 1 account balances drifted', self.reconcile())
+        self.assertEqual(Transaction.objects.get(pk=txn.pk).balance_after, Decimal('999.00'))
+
+    def test_repair_fixes_drift(self):
+        txn = self.corrupt()
+        self.assertIn('repaired 1 and 1', self.reconcile(repair=True))
+        self.assertEqual(Transaction.objects.get(pk=txn.pk).balance_after, Decimal('80.00'))
+        self.assertEqual(Account.objects.get(pk=self.accounts[2].pk).balance, Decimal('84.00'))
+        result = reconcile_range(self.first_id, self.last_id)
+        self.assertEqual((result['drifted_transactions'], result['drifted_balances']), (0, 0))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_resumes_interrupted_run(self):
+        self.corrupt()
+        calls = []
+
+        def interrupted(first_id, *args):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(first_id)
+            return reconcile_range(first_id, *args)
+
+        with mock.patch('banking.management.commands.reconcile_ledger.reconcile_range', side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.reconcile(range_size=1)
+        with open(self.checkpoint) as checkpoint:
+            state = json.load(checkpoint)
+        self.assertEqual(state['done'], [[self.first_id, self.first_id]])
+        self.assertEqual(state['totals']['drifted_transactions'], 1)
+
+        with mock.patch('banking.management.commands.reconcile_ledger.reconcile_range', wraps=reconcile_range) as resumed:
+            output = self.reconcile(range_size=1, resume=True)
+        self.assertIn('Resuming: 1 of 3 ranges already reconciled', output)
+        self.assertEqual([call.args[0] for call in resumed.call_args_list], [self.accounts[1].pk, self.accounts[2].pk])
+        # Totals carry over from the interrupted run
+        self.assertIn('Reconciled 3 accounts and 12 transactions', output)
+        self.assertIn('1 balance_after and 1 account balances drifted', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
 
-# Create your tests here.
+    def test_resume_refuses_other_options(self):
+        with open(self.checkpoint, 'w') as checkpoint:
+            json.dump({'settings': {'range_size': 7, 'opening': 'zero', 'repair': False}, 'done': [], 'totals': {}}, checkpoint)
+        with self.assertRaisesMessage(CommandError, 'rerun with the same options'):
+            self.reconcile(resume=True)
@@ -3,16 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Sum
-from django.http import HttpResponse
 import uuid
 import random
 import string
-import csv
-import io
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-from .models import Account, AccountType, Transaction, Transfer, Statement
+from .models import Account, AccountType, Transaction, Transfer
 from .forms import AccountForm, DepositForm, WithdrawForm, TransferForm
+from .exports import statement_csv_response
+from .filters import TransactionFilter, created_between
+from .statements import get_statement
 
 def home(request):
     """Banking home page"""
@@ -179,65 +179,25 @@ def account_statement(request, account_number):
     """Generate account statement"""
     account = get_object_or_404(Account, account_number=account_number, user=request.user)
 
-    # Default to last 30 days if no date range provided
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
+    # Read the date range or period, defaulting to the last 30 days
+    filters = TransactionFilter(request.GET)
+    for error in filters.errors.values():
+        messages.error(request, error)
+    end_date = filters.end_date or timezone.now().date()
+    start_date = filters.start_date or end_date - timedelta(days=30)
 
-    if request.GET.get('start_date'):
-        try:
-            start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
-        except ValueError:
-            messages.error(request, 'Invalid start date format')
-
-    if request.GET.get('end_date'):
-        try:
-            end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
-        except ValueError:
-            messages.error(request, 'Invalid end date format')
+    # Stream CSV if requested
+    if request.GET.get('format') == 'csv':
+        return statement_csv_response(account, start_date, end_date)
 
     # Get transactions for the date range
     transactions = Transaction.objects.filter(
-        account=account,
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
+        created_between(start_date, end_date),
+        account=account
     ).order_by('created_at')
 
-    # Calculate opening and closing balances
-    opening_transaction = Transaction.objects.filter(
-        account=account,
-        created_at__date__lt=start_date
-    ).order_by('-created_at').first()
-
-    opening_balance = opening_transaction.balance_after if opening_transaction else 0
-    closing_balance = account.balance
-
-    # Generate CSV if requested
-    if request.GET.get('format') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{account.account_number}_statement_{start_date}_to_{end_date}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Description', 'Type', 'Amount', 'Balance'])
-
-        for transaction in transactions:
-            writer.writerow([
-                transaction.created_at.strftime('%Y-%m-%d %H:%M'),
-                transaction.description,
-                transaction.transaction_type,
-                transaction.amount,
-                transaction.balance_after
-            ])
-
-        return response
-
-    # Create a statement record
-    statement = Statement.objects.create(
-        account=account,
-        start_date=start_date,
-        end_date=end_date,
-        opening_balance=opening_balance,
-        closing_balance=closing_balance
-    )
+    # Reuse the stored statement for this range, or build one from the daily checkpoints
+    statement = get_statement(account, start_date, end_date)
 
     context = {
         'account': account,
@@ -245,8 +205,8 @@ def account_statement(request, account_number):
         'statement': statement,
         'start_date': start_date,
         'end_date': end_date,
-        'opening_balance': opening_balance,
-        'closing_balance': closing_balance,
+        'opening_balance': statement.opening_balance,
+        'closing_balance': statement.closing_balance,
     }
     return render(request, 'banking/account_statement.html', context)
 
@@ -257,33 +217,11 @@ def transaction_list(request):
         account__user=request.user
     ).order_by('-created_at')
 
-    # Filter by account if specified
-    account_filter = request.GET.get('account')
-    if account_filter:
-        transactions = transactions.filter(account__account_number=account_filter)
-
-    # Filter by transaction type if specified
-    type_filter = request.GET.get('type')
-    if type_filter:
-        transactions = transactions.filter(transaction_type=type_filter)
-
-    # Filter by date range if specified
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-
-    if start_date:
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            transactions = transactions.filter(created_at__date__gte=start_date)
-        except ValueError:
-            messages.error(request, 'Invalid start date format')
-
-    if end_date:
-        try:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            transactions = transactions.filter(created_at__date__lte=end_date)
-        except ValueError:
-            messages.error(request, 'Invalid end date format')
+    # Filter by accounts, types, date range/period and amount range if specified
+    filters = TransactionFilter(request.GET, account_lookup='account__account_number', type_param='type')
+    for error in filters.errors.values():
+        messages.error(request, error)
+    transactions = filters.filter_queryset(transactions)
 
     # Get all accounts for filtering
     accounts = Account.objects.filter(user=request.user)
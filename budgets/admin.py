@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Budget, BudgetItem, BudgetAlert
+from .models import Budget, BudgetItem, BudgetAlert, BudgetSpendCounter
 
 class BudgetItemInline(admin.TabularInline):
     model = BudgetItem
@@ -29,3 +29,10 @@ class BudgetAlertAdmin(admin.ModelAdmin):
     list_display = ('budget', 'threshold_percentage', 'is_active', 'last_triggered')
     list_filter = ('threshold_percentage', 'is_active')
     search_fields = ('budget__name',)
+
+@admin.register(BudgetSpendCounter)
+class BudgetSpendCounterAdmin(admin.ModelAdmin):
+    list_display = ('budget_item', 'period_start', 'period_end', 'spent', 'updated_at')
+    list_filter = ('period_start',)
+    search_fields = ('budget_item__budget__name', 'budget_item__category__name')
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,45 @@
+from django.utils import timezone
+
+from .counters import spent_by_budget
+from .evaluation import period_bounds
+from .models import BudgetAlert
+
+
+def used_percentage(amount, spent):
+    """Percentage of a budget amount used; not capped, so overspending shows above 100"""
+    if amount == 0:
+        return 100 if spent > 0 else 0
+    return spent / amount * 100
+
+
+def evaluate_alerts(budgets, now=None):
+    """Trigger the alerts of the given budgets whose threshold was newly crossed.
+
+    A threshold counts as newly crossed when the budget's usage has reached it
+    and the alert has not fired yet in the current budget period. Spend comes
+    from the counters, and every triggered alert is stamped with one UPDATE.
+    Returns the ids of the triggered alerts.
+    """
+    now = now or timezone.now()
+    budgets = {budget.pk: budget for budget in budgets if budget.pk}
+    if not budgets:
+        return []
+
+    spent = spent_by_budget(budgets.values())
+    usage = {pk: used_percentage(budget.amount, spent[pk]) for pk, budget in budgets.items()}
+    period_start = {pk: period_bounds(budget)[0] for pk, budget in budgets.items()}
+
+    triggered = []
+    alerts = BudgetAlert.objects.filter(budget_id__in=budgets, is_active=True).values_list(
+        'pk', 'budget_id', 'threshold_percentage', 'last_triggered'
+    )
+    for alert_id, budget_id, threshold, last_triggered in alerts:
+        if usage[budget_id] < threshold:
+            continue
+        if last_triggered and timezone.localtime(last_triggered).date() >= period_start[budget_id]:
+            continue
+        triggered.append(alert_id)
+
+    if triggered:
+        BudgetAlert.objects.filter(pk__in=triggered).update(last_triggered=now)
+    return triggered
@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .evaluation import SPEND_TYPES, evaluate_budget_items, period_bounds
+from .models import Budget, BudgetItem, BudgetSpendCounter
+
+
+def refresh_counters(budgets):
+    """Recompute and store the spend counters of every item of the given budgets.
+
+    Returns the fresh amounts as {item_pk: Decimal}.
+    """
+    budgets = [budget for budget in budgets if budget.pk]
+    if not budgets:
+        return {}
+
+    bounds = {budget.pk: period_bounds(budget) for budget in budgets}
+    with transaction.atomic():
+        spent = evaluate_budget_items(budgets)
+        items = BudgetItem.objects.filter(pk__in=spent).values_list('pk', 'budget_id')
+        BudgetSpendCounter.objects.filter(budget_item_id__in=spent).delete()
+        BudgetSpendCounter.objects.bulk_create([
+            BudgetSpendCounter(
+                budget_item_id=item_id,
+                period_start=bounds[budget_id][0],
+                period_end=bounds[budget_id][1],
+                spent=spent[item_id],
+            )
+            for item_id, budget_id in items
+        ], batch_size=1000)
+    return spent
+
+
+def spent_for_budgets(budgets):
+    """Amount spent per BudgetItem id, read from the spend counters.
+
+    Costs one query however many transactions the budgets cover. Items whose
+    counter is missing or belongs to an older period (the budget's dates
+    changed) are recomputed once and stored.
+    """
+    budgets = {budget.pk: budget for budget in budgets if budget.pk}
+    if not budgets:
+        return {}
+
+    bounds = {pk: period_bounds(budget) for pk, budget in budgets.items()}
+    spent = {}
+    stale = set()
+    rows = BudgetItem.objects.filter(budget_id__in=budgets).values_list(
+        'pk', 'budget_id', 'spend_counters__period_start', 'spend_counters__period_end', 'spend_counters__spent'
+    )
+    for item_id, budget_id, period_start, period_end, amount in rows:
+        if (period_start, period_end) == bounds[budget_id]:
+            spent[item_id] = amount
+        else:
+            stale.add((item_id, budget_id))
+
+    pending = {budget_id for item_id, budget_id in stale if item_id not in spent}
+    if pending:
+        spent.update(refresh_counters([budgets[budget_id] for budget_id in pending]))
+    return spent
+
+
+def spent_by_budget(budgets):
+    """Total amount spent per Budget id, summed from the item counters"""
+    budgets = [budget for budget in budgets if budget.pk]
+    item_spent = spent_for_budgets(budgets)
+    totals = {budget.pk: Decimal('0.00') for budget in budgets}
+    for item_id, budget_id in BudgetItem.objects.filter(pk__in=item_spent).values_list('pk', 'budget_id'):
+        totals[budget_id] += item_spent[item_id]
+    return totals
+
+
+def record_spend(user_id, category_id, transaction_type, amount, day):
+    """Add spend on a local calendar day to the counters it falls into.
+
+    Pass a negative amount to take spend back out (a transaction deleted or
+    moved to another category).
+    """
+    if not category_id or transaction_type not in SPEND_TYPES or not amount:
+        return
+    BudgetSpendCounter.objects.filter(
+        budget_item__category_id=category_id,
+        budget_item__budget__user_id=user_id,
+        period_start__lte=day,
+        period_end__gte=day
+    ).update(spent=F('spent') + amount, updated_at=timezone.now())
+
+
+def record_enhanced_transaction(enhanced, old_category_id=None, removed=False):
+    """Apply a create, recategorize or delete of an EnhancedTransaction to the counters"""
+    bank_transaction = enhanced.bank_transaction
+    user_id = bank_transaction.account.user_id
+    transaction_type = bank_transaction.transaction_type
+    amount = bank_transaction.amount
+    day = timezone.localtime(bank_transaction.created_at).date()
+
+    if removed:
+        record_spend(user_id, enhanced.category_id, transaction_type, -amount, day)
+    elif old_category_id != enhanced.category_id:
+        record_spend(user_id, old_category_id, transaction_type, -amount, day)
+        record_spend(user_id, enhanced.category_id, transaction_type, amount, day)
+
+
+def rebuild_counters(user_ids=None, chunk_size=500):
+    """Recompute the counters of all budgets (optionally only some users'), chunk by chunk"""
+    budgets = Budget.objects.order_by('pk')
+    if user_ids:
+        budgets = budgets.filter(user_id__in=user_ids)
+
+    rebuilt = 0
+    last_pk = 0
+    while True:
+        chunk = list(budgets.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        rebuilt += len(refresh_counters(chunk))
+        last_pk = chunk[-1].pk
+    return rebuilt
+
@@ -0,0 +1,68 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from banking.filters import created_between
+from transactions.models import EnhancedTransaction
+
+from .models import BudgetItem
+
+# Transaction types that count as spending against a budget
+SPEND_TYPES = ['withdrawal', 'transfer_out']
+
+
+def period_bounds(budget):
+    """(start_date, end_date) of a budget's current period as dates"""
+    start_date, end_date = budget.start_date, budget.period_end
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    return start_date, end_date
+
+
+def evaluate_budget_items(budgets):
+    """Amount spent per BudgetItem id, for every item of the given budgets.
+
+    Budgets that share a period are evaluated by one grouped query over
+    categorized transactions, restricted in its WHERE clause to the owners'
+    withdrawals and outgoing transfers within the period and to the items'
+    categories, and summed per (owner, category).
+    """
+    budgets = {budget.pk: budget for budget in budgets if budget.pk}
+    if not budgets:
+        return {}
+
+    items = list(BudgetItem.objects.filter(budget_id__in=budgets).values_list('pk', 'budget_id', 'category_id'))
+    windows = {}
+    for item_id, budget_id, category_id in items:
+        budget = budgets[budget_id]
+        users, categories = windows.setdefault(period_bounds(budget), (set(), set()))
+        users.add(budget.user_id)
+        categories.add(category_id)
+
+    totals = {}
+    for (start_date, end_date), (users, categories) in windows.items():
+        rows = EnhancedTransaction.objects.filter(
+            created_between(start_date, end_date, field='bank_transaction__created_at'),
+            bank_transaction__account__user_id__in=users,
+            bank_transaction__transaction_type__in=SPEND_TYPES,
+            category_id__in=categories,
+        ).order_by().values_list('bank_transaction__account__user_id', 'category_id').annotate(
+            spent=Sum('bank_transaction__amount')
+        )
+        for user_id, category_id, spent in rows:
+            totals[(start_date, end_date, user_id, category_id)] = spent
+
+    return {
+        item_id: totals.get((*period_bounds(budgets[budget_id]), budgets[budget_id].user_id, category_id), Decimal('0.00'))
+        for item_id, budget_id, category_id in items
+    }
+
+
+def progress_percentage(amount, spent):
+    """Percentage of a budget amount used, capped at 100"""
+    if amount == 0:
+        return 100 if spent > 0 else 0
+    return min(100, (spent / amount) * 100)
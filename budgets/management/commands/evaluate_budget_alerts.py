@@ -0,0 +1,51 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budgets.alerts import evaluate_alerts
+from budgets.models import Budget
+
+
+class Command(BaseCommand):
+    help = 'Trigger budget alerts whose thresholds were crossed in the current period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Users whose budgets are evaluated together')
+        parser.add_argument('--after-user', type=int, default=0,
+                            help='Resume the pass after this user id')
+        parser.add_argument('--time-budget', type=float, default=None,
+                            help='Seconds the pass may take; it stops between chunks and reports where to resume')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        started = time.monotonic()
+        deadline = started + options['time_budget'] if options['time_budget'] else None
+        now = timezone.now()
+
+        last_user = options['after_user']
+        budgets_seen = triggered = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_user, budgets__is_active=True)
+                .order_by('pk').values_list('pk', flat=True).distinct()[:options['chunk_size']]
+            )
+            if not user_ids:
+                break
+            if deadline and budgets_seen and time.monotonic() > deadline:
+                self.stdout.write(self.style.WARNING(
+                    f'Time budget exhausted; resume with --after-user {last_user}'
+                ))
+                break
+
+            budgets = list(Budget.objects.filter(user_id__in=user_ids, is_active=True))
+            triggered += len(evaluate_alerts(budgets, now=now))
+            budgets_seen += len(budgets)
+            last_user = user_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Evaluated {budgets_seen} budgets and triggered {triggered} alerts '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
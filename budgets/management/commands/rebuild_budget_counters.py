@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from budgets.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the budget spend counters from the categorized transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', type=int,
+                            help='User id to rebuild (repeatable); defaults to all users')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Budgets recomputed per query')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_counters(options['users'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} budget spend counters'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 08:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetSpendCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('spent', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('budget_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_counters', to='budgets.budgetitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period_start', 'period_end'], name='budget_counter_period_idx')],
+                'unique_together': {('budget_item', 'period_start', 'period_end')},
+            },
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from transactions.models import Category
 from django.utils import timezone
+from accounts.cache import invalidate_dashboard
 
 class Budget(models.Model):
     """Budget model for tracking spending limits"""
@@ -24,13 +25,48 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='budget_user_active_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.amount} ({self.get_period_display()})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_dashboard(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            invalidate_dashboard(self.user_id)
+        return result
+
+    @property
+    def period_end(self):
+        """Last day (inclusive) of the current budget period"""
+        start_date = self.start_date
+        if self.period == 'custom' and self.end_date:
+            return self.end_date
+        if self.period == 'daily':
+            return start_date
+        if self.period == 'weekly':
+            return start_date + timezone.timedelta(days=7)
+        if self.period == 'monthly':
+            # Approximate a month
+            return start_date + timezone.timedelta(days=30)
+        if self.period == 'quarterly':
+            return start_date + timezone.timedelta(days=90)
+        if self.period == 'yearly':
+            return start_date + timezone.timedelta(days=365)
+        return timezone.now().date()
+
     @property
     def spent(self):
         """Calculate amount spent in this budget period"""
-        return sum(item.spent for item in self.items.all())
+        from .counters import spent_for_budgets
+        return sum(spent_for_budgets([self]).values())
 
     @property
     def remaining(self):
@@ -40,9 +76,8 @@ class Budget(models.Model):
     @property
     def progress_percentage(self):
         """Calculate percentage of budget used"""
-        if self.amount == 0:
-            return 100 if self.spent > 0 else 0
-        return min(100, (self.spent / self.amount) * 100)
+        from .evaluation import progress_percentage
+        return progress_percentage(self.amount, self.spent)
 
 class BudgetItem(models.Model):
     """Individual category within a budget"""
@@ -53,41 +88,17 @@ class BudgetItem(models.Model):
     def __str__(self):
         return f"{self.category.name} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        # The category may have changed, so let the counters be rebuilt on next read
+        if self.pk:
+            self.spend_counters.all().delete()
+        super().save(*args, **kwargs)
+
     @property
     def spent(self):
         """Calculate amount spent in this category during the budget period"""
-        from transactions.models import EnhancedTransaction
-
-        # Get date range based on budget period
-        start_date = self.budget.start_date
-        if self.budget.period == 'custom' and self.budget.end_date:
-            end_date = self.budget.end_date
-        else:
-            # Calculate end date based on period
-            if self.budget.period == 'daily':
-                end_date = start_date
-            elif self.budget.period == 'weekly':
-                end_date = start_date + timezone.timedelta(days=7)
-            elif self.budget.period == 'monthly':
-                # Approximate a month
-                end_date = start_date + timezone.timedelta(days=30)
-            elif self.budget.period == 'quarterly':
-                end_date = start_date + timezone.timedelta(days=90)
-            elif self.budget.period == 'yearly':
-                end_date = start_date + timezone.timedelta(days=365)
-            else:
-                end_date = timezone.now().date()
-
-        # Query transactions in this category within the date range
-        transactions = EnhancedTransaction.objects.filter(
-            category=self.category,
-            bank_transaction__created_at__date__gte=start_date,
-            bank_transaction__created_at__date__lte=end_date,
-            bank_transaction__account__user=self.budget.user
-        )
-
-        # Sum transaction amounts
-        return sum(t.bank_transaction.amount for t in transactions if t.bank_transaction.transaction_type in ['withdrawal', 'transfer_out'])
+        from .counters import spent_for_budgets
+        return spent_for_budgets([self.budget])[self.pk]
 
     @property
     def remaining(self):
@@ -97,9 +108,25 @@ class BudgetItem(models.Model):
     @property
     def progress_percentage(self):
         """Calculate percentage of category budget used"""
-        if self.amount == 0:
-            return 100 if self.spent > 0 else 0
-        return min(100, (self.spent / self.amount) * 100)
+        from .evaluation import progress_percentage
+        return progress_percentage(self.amount, self.spent)
+
+class BudgetSpendCounter(models.Model):
+    """Running spend of a budget item for one budget period, kept up to date as transactions are categorized"""
+    budget_item = models.ForeignKey(BudgetItem, on_delete=models.CASCADE, related_name='spend_counters')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['budget_item', 'period_start', 'period_end']
+        indexes = [
+            models.Index(fields=['period_start', 'period_end'], name='budget_counter_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.budget_item} - {self.period_start} to {self.period_end}: {self.spent}"
 
 class BudgetAlert(models.Model):
     """Alerts for budget thresholds"""
@@ -1,3 +1,182 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from banking.models import Account, AccountType, Transaction
+from transactions.models import Category, EnhancedTransaction
+
+from .alerts import evaluate_alerts
+from .counters import spent_for_budgets
+from .evaluation import SPEND_TYPES, evaluate_budget_items
+from .models import Budget, BudgetAlert, BudgetItem, BudgetSpendCounter
+
+
+class BudgetTestCase(TestCase):
+
+    def setUp(self):
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.food = Category.objects.create(name='Food', category_type='expense', is_system=True)
+        self.travel = Category.objects.create(name='Travel', category_type='expense', is_system=True)
+        self.start = timezone.localdate() - timedelta(days=10)
+        self.owner, self.owner_account = self.create_user('owner@example.com', 'OWN00001', account_type)
+        self.other, self.other_account = self.create_user('other@example.com', 'OTH00001', account_type)
+
+    def create_user(self, email, account_number, account_type):
+        user = User.objects.create_user(email=email, password='x', first_name='Budget', last_name='Test')
+        account = Account.objects.create(user=user, account_type=account_type, account_number=account_number)
+        account.deposit(Decimal('1000.00'))
+        return user, account
+
+    def spend(self, account, amount, category, transaction_type='withdrawal', days_ago=0):
+        txn = account.transactions.create(transaction_type=transaction_type, amount=Decimal(amount), description='Spend')
+        if days_ago:
+            txn.created_at = timezone.now() - timedelta(days=days_ago)
+            Transaction.objects.filter(pk=txn.pk).update(created_at=txn.created_at)
+        EnhancedTransaction.objects.create(bank_transaction=txn, category=category)
+
+
+class EvaluateBudgetItemsTests(BudgetTestCase):
+    """Spend per item counts only the owner's outgoing transactions in the item's category and period"""
+
+    def test_spend_is_restricted_to_owner_type_and_period(self):
+        budget = Budget.objects.create(user=self.owner, name='Monthly', amount=Decimal('500.00'), start_date=self.start)
+        food = BudgetItem.objects.create(budget=budget, category=self.food, amount=Decimal('100.00'))
+        travel = BudgetItem.objects.create(budget=budget, category=self.travel, amount=Decimal('100.00'))
+        other_budget = Budget.objects.create(user=self.other, name='Monthly', amount=Decimal('500.00'), start_date=self.start)
+        other_food = BudgetItem.objects.create(budget=other_budget, category=self.food, amount=Decimal('100.00'))
+
+        self.spend(self.owner_account, '30.00', self.food)
+        self.spend(self.owner_account, '12.50', self.food, transaction_type='transfer_out')
+        self.spend(self.owner_account, '100.00', self.food, transaction_type='deposit')
+        self.spend(self.owner_account, '5.00', self.food, days_ago=60)
+        self.spend(self.other_account, '40.00', self.food)
+
+        self.assertEqual(evaluate_budget_items([budget, other_budget]), {
+            food.pk: Decimal('42.50'),
+            travel.pk: Decimal('0.00'),
+            other_food.pk: Decimal('40.00'),
+        })
+
+
+class SpendCounterTests(BudgetTestCase):
+    """The stored spend counters follow categorization changes and match a recount"""
+
+    def setUp(self):
+        super().setUp()
+        self.budget = Budget.objects.create(user=self.owner, name='Monthly', amount=Decimal('500.00'), start_date=self.start)
+        self.food_item = BudgetItem.objects.create(budget=self.budget, category=self.food, amount=Decimal('100.00'))
+        self.travel_item = BudgetItem.objects.create(budget=self.budget, category=self.travel, amount=Decimal('100.00'))
+        # Create the counters
+        spent_for_budgets([self.budget])
+
+    def counters(self):
+        return dict(BudgetSpendCounter.objects.filter(budget_item__budget=self.budget).values_list('budget_item_id', 'spent'))
+
+    def ground_truth(self):
+        start, end = self.budget.start_date, self.budget.period_end
+        return {
+            item.pk: Transaction.objects.filter(
+                account__user=self.owner,
+                transaction_type__in=SPEND_TYPES,
+                enhanced_data__category=item.category,
+                created_at__date__gte=start,
+                created_at__date__lte=end,
+            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+            for item in (self.food_item, self.travel_item)
+        }
+
+    def test_counters_follow_create_recategorize_and_delete(self):
+        self.spend(self.owner_account, '30.00', self.food)
+        self.spend(self.owner_account, '12.00', self.travel)
+        self.spend(self.owner_account, '8.00', self.food, days_ago=60)
+        self.assertEqual(self.counters(), self.ground_truth())
+        self.assertEqual(self.counters()[self.food_item.pk], Decimal('30.00'))
+
+        enhanced = EnhancedTransaction.objects.get(bank_transaction__amount=Decimal('30.00'))
+        enhanced.category = self.travel
+        enhanced.save()
+        self.assertEqual(self.counters(), self.ground_truth())
+        self.assertEqual(self.counters()[self.travel_item.pk], Decimal('42.00'))
+
+        enhanced.delete()
+        self.assertEqual(self.counters(), self.ground_truth())
+        self.assertEqual(self.counters(), {self.food_item.pk: Decimal('0.00'), self.travel_item.pk: Decimal('12.00')})
+
+    def test_stale_period_is_recomputed(self):
+        self.spend(self.owner_account, '30.00', self.food, days_ago=25)
+        self.assertEqual(self.counters()[self.food_item.pk], Decimal('0.00'))
+        # Moving the period back leaves the stored counters on the old period
+        self.budget.start_date = self.start - timedelta(days=20)
+        self.budget.save()
+        spent = spent_for_budgets([self.budget])
+        self.assertEqual(spent[self.food_item.pk], Decimal('30.00'))
+        counter = BudgetSpendCounter.objects.get(budget_item=self.food_item)
+        self.assertEqual((counter.period_start, counter.period_end), (self.budget.start_date, self.budget.period_end))
+        self.assertEqual(self.counters(), self.ground_truth())
+
+    def test_rebuild_matches_live_counters(self):
+        self.spend(self.owner_account, '30.00', self.food)
+        self.spend(self.owner_account, '12.50', self.travel, transaction_type='transfer_out')
+        self.spend(self.other_account, '40.00', self.food)
+        live = self.counters()
+        BudgetSpendCounter.objects.update(spent=Decimal('999.00'))
+        call_command('rebuild_budget_counters', user=[self.owner.pk], stdout=StringIO())
+        self.assertEqual(self.counters(), live)
+        self.assertEqual(live, self.ground_truth())
+
+
+class BudgetAlertTests(BudgetTestCase):
+    """Alerts fire once per crossed threshold and period, and the batch command resumes by user id"""
+
+    def create_budget(self, user):
+        budget = Budget.objects.create(user=user, name='Monthly', amount=Decimal('100.00'), start_date=self.start)
+        BudgetItem.objects.create(budget=budget, category=self.food, amount=Decimal('100.00'))
+        for threshold in (50, 90):
+            BudgetAlert.objects.create(budget=budget, threshold_percentage=threshold)
+        spent_for_budgets([budget])
+        return budget
+
+    def triggered(self, budget):
+        return set(BudgetAlert.objects.filter(budget=budget, last_triggered__isnull=False)
+                   .values_list('threshold_percentage', flat=True))
+
+    def test_crossing_triggers_one_alert_once(self):
+        budget = self.create_budget(self.owner)
+        self.spend(self.owner_account, '40.00', self.food)
+        self.assertEqual(evaluate_alerts([budget]), [])
+
+        self.spend(self.owner_account, '15.00', self.food)
+        fired = evaluate_alerts([budget])
+        self.assertEqual(fired, [BudgetAlert.objects.get(budget=budget, threshold_percentage=50).pk])
+        self.assertEqual(self.triggered(budget), {50})
+
+        # Nothing new crossed: a re-run raises no duplicate
+        self.assertEqual(evaluate_alerts([budget]), [])
+        self.assertEqual(self.triggered(budget), {50})
+
+    def test_command_resumes_after_user(self):
+        budgets = [self.create_budget(self.owner), self.create_budget(self.other)]
+        self.spend(self.owner_account, '95.00', self.food)
+        self.spend(self.other_account, '60.00', self.food)
+
+        # A time budget already spent stops the pass after the first chunk
+        output = StringIO()
+        call_command('evaluate_budget_alerts', chunk_size=1, time_budget=1e-9, stdout=output)
+        self.assertIn(f'resume with --after-user {self.owner.pk}', output.getvalue())
+        self.assertEqual(self.triggered(budgets[0]), {50, 90})
+        self.assertEqual(self.triggered(budgets[1]), set())
+
+        call_command('evaluate_budget_alerts', chunk_size=1, after_user=self.owner.pk, stdout=StringIO())
+        self.assertEqual(self.triggered(budgets[1]), {50})
+        self.assertEqual(self.triggered(budgets[0]), {50, 90})
 
-# Create your tests here.
+        # A full re-run finds nothing left to trigger
+        output = StringIO()
+        call_command('evaluate_budget_alerts', stdout=output)
+        self.assertIn('triggered 0 alerts', output.getvalue())
@@ -1,6 +1,17 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from .forecasting import GoalForecast, forecast_goals
 from .models import Goal, GoalContribution, GoalMilestone
 
+class GoalForecastChangeList(ChangeList):
+    """Forecasts the goals on the current page in one pass"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        forecasts = forecast_goals(self.result_list)
+        for goal in self.result_list:
+            goal.forecast = forecasts[goal.pk]
+
 class GoalContributionInline(admin.TabularInline):
     model = GoalContribution
     extra = 1
@@ -11,17 +22,44 @@ class GoalMilestoneInline(admin.TabularInline):
 
 @admin.register(Goal)
 class GoalAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'goal_type', 'target_amount', 'current_amount', 'progress_percentage', 'target_date', 'status')
+    list_display = ('name', 'user', 'goal_type', 'target_amount', 'current_amount', 'progress_percentage', 'target_date', 'days_remaining', 'is_on_track', 'projected_completion_date', 'required_monthly_contribution', 'status')
     list_filter = ('goal_type', 'status', 'created_at')
     search_fields = ('name', 'user__email', 'description')
-    readonly_fields = ('created_at', 'updated_at', 'progress_percentage', 'days_remaining', 'is_on_track')
+    readonly_fields = ('created_at', 'updated_at', 'progress_percentage', 'days_remaining', 'is_on_track', 'projected_completion_date', 'required_monthly_contribution')
     date_hierarchy = 'created_at'
     inlines = [GoalContributionInline, GoalMilestoneInline]
 
+    def get_changelist(self, request, **kwargs):
+        return GoalForecastChangeList
+
+    def get_forecast(self, obj):
+        forecast = getattr(obj, 'forecast', None)
+        if forecast is None:
+            # Nothing to forecast on the add form
+            forecast = forecast_goals([obj]).get(obj.pk) or GoalForecast(None, None, None, None)
+            obj.forecast = forecast
+        return forecast
+
     def progress_percentage(self, obj):
         return f"{obj.progress_percentage:.2f}%"
     progress_percentage.short_description = 'Progress'
 
+    @admin.display(description='Days remaining')
+    def days_remaining(self, obj):
+        return self.get_forecast(obj).days_remaining
+
+    @admin.display(description='On track', boolean=True)
+    def is_on_track(self, obj):
+        return self.get_forecast(obj).is_on_track
+
+    @admin.display(description='Projected completion')
+    def projected_completion_date(self, obj):
+        return self.get_forecast(obj).projected_completion_date
+
+    @admin.display(description='Required monthly')
+    def required_monthly_contribution(self, obj):
+        return self.get_forecast(obj).required_monthly_contribution
+
 @admin.register(GoalContribution)
 class GoalContributionAdmin(admin.ModelAdmin):
     list_display = ('goal', 'amount', 'date', 'from_account')
@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from accounts.cache import invalidate_dashboard
+from banking.ledger import post_batch, post_withdrawal
+
+from .models import Goal, GoalContribution
+
+
+def add_to_goals(deltas):
+    """Add {goal id: amount} to the goals' current amounts and move their status along.
+
+    Each goal gets one UPDATE computed by the database, so concurrent
+    contributions cannot overwrite each other. A goal that reaches its
+    target is completed; one that was not started, or falls back below its
+    target, is in progress.
+    """
+    now = timezone.now()
+    for goal_id, amount in deltas.items():
+        if not amount:
+            continue
+        reached = F('current_amount') + amount
+        Goal.objects.filter(pk=goal_id).update(
+            current_amount=reached,
+            status=Case(
+                When(target_amount__lte=reached, then=Value('completed')),
+                When(status__in=['not_started', 'completed'], then=Value('in_progress')),
+                default=F('status')
+            ),
+            updated_at=now
+        )
+
+
+def post_contribution(goal, amount, notes='', account=None):
+    """Contribute to a goal, withdrawing the amount from ``account`` if given, atomically.
+
+    Raises ValueError (for example on insufficient funds) with nothing posted.
+    """
+    if amount <= 0:
+        raise ValueError("Contribution amount must be positive")
+
+    with transaction.atomic():
+        if account is not None:
+            post_withdrawal(account, amount, description=f"Contribution to goal {goal.name}")
+        contribution = GoalContribution(goal=goal, amount=amount, notes=notes, from_account=account)
+        contribution.save()
+    return contribution
+
+
+def post_contributions(contributions, goals=None, accounts=None):
+    """Post many goal contributions in one transaction.
+
+    ``contributions`` is a sequence of dicts with ``goal`` (id), ``amount``
+    and optional ``notes``, ``date`` and ``account`` (id to withdraw from).
+    Withdrawals go through banking.ledger.post_batch, contributions are bulk
+    inserted and every goal gets one current_amount update. A contribution
+    for an unknown goal or account, or one the account cannot cover, is
+    rejected on its own; the rest of the batch is still posted. Returns one
+    result dict per contribution, in input order.
+    """
+    if goals is None:
+        goals = Goal.objects.all()
+
+    results = [None] * len(contributions)
+    with transaction.atomic():
+        known = goals.filter(pk__in={item['goal'] for item in contributions}).only('pk', 'name', 'user_id').in_bulk()
+
+        accepted = []
+        withdrawals = []
+        withdrawal_indexes = []
+        for index, item in enumerate(contributions):
+            goal = known.get(item['goal'])
+            if goal is None:
+                results[index] = {'index': index, 'success': False, 'error': 'Goal not found'}
+            elif item.get('account'):
+                withdrawal_indexes.append(index)
+                withdrawals.append({
+                    'account': item['account'],
+                    'transaction_type': 'withdrawal',
+                    'amount': item['amount'],
+                    'description': f"Contribution to goal {goal.name}",
+                })
+            else:
+                accepted.append((index, None))
+
+        if withdrawals:
+            for index, posted in zip(withdrawal_indexes, post_batch(withdrawals, accounts=accounts)):
+                if posted['success']:
+                    accepted.append((index, posted['transaction_id']))
+                else:
+                    results[index] = {'index': index, 'success': False, 'error': posted['error']}
+        accepted.sort()
+
+        today = timezone.localdate()
+        created = GoalContribution.objects.bulk_create([
+            GoalContribution(
+                goal_id=contributions[index]['goal'],
+                amount=contributions[index]['amount'],
+                notes=contributions[index].get('notes', ''),
+                date=contributions[index].get('date') or today,
+                from_account_id=contributions[index].get('account') if transaction_id else None,
+            )
+            for index, transaction_id in accepted
+        ], batch_size=1000)
+
+        deltas = {}
+        for contribution in created:
+            deltas[contribution.goal_id] = deltas.get(contribution.goal_id, 0) + contribution.amount
+        add_to_goals(deltas)
+        invalidate_dashboard(*{known[goal_id].user_id for goal_id in deltas})
+
+    for (index, transaction_id), contribution in zip(accepted, created):
+        results[index] = {
+            'index': index,
+            'success': True,
+            'contribution_id': contribution.pk,
+            'goal': contribution.goal_id,
+            'transaction_id': transaction_id,
+        }
+    return results
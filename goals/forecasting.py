@@ -0,0 +1,118 @@
+import math
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_UP
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import GoalContribution
+
+# Average month length, for turning days remaining into months remaining
+DAYS_PER_MONTH = 30.436875
+# A goal may lag its straight-line schedule by this many percentage points
+ON_TRACK_BUFFER = 10
+CENT = Decimal('0.01')
+
+GoalForecast = namedtuple(
+    'GoalForecast',
+    'days_remaining is_on_track projected_completion_date required_monthly_contribution'
+)
+
+
+def on_track(status, progress, start_date, target_date, today):
+    """Whether progress keeps up with a straight line from start_date to target_date"""
+    if isinstance(start_date, datetime):
+        # Unsaved goals still hold the timezone.now default
+        start_date = timezone.localtime(start_date).date()
+    if status == 'completed':
+        return True
+    total_days = (target_date - start_date).days
+    if today >= target_date or total_days <= 0:
+        return progress >= 100
+    expected = (today - start_date).days / total_days * 100
+    return progress >= expected - ON_TRACK_BUFFER
+
+
+def with_contribution_stats(goals, today=None):
+    """Annotate a Goal queryset with contribution totals, in the same query.
+
+    Adds contribution_count, contribution_total, first_contribution_date,
+    last_contribution_date and the amounts contributed over the last 30 and
+    90 days (contributed_30d, contributed_90d).
+    """
+    today = today or timezone.localdate()
+    return goals.annotate(
+        contribution_count=Count('contributions'),
+        contribution_total=Sum('contributions__amount'),
+        first_contribution_date=Min('contributions__date'),
+        last_contribution_date=Max('contributions__date'),
+        contributed_30d=Sum('contributions__amount', filter=Q(contributions__date__gt=today - timedelta(days=30))),
+        contributed_90d=Sum('contributions__amount', filter=Q(contributions__date__gt=today - timedelta(days=90))),
+    )
+
+
+def contribution_velocity(goals, today):
+    """{goal id: average amount contributed per day since the goal's first contribution}
+
+    Goals annotated by with_contribution_stats are read as they are; the
+    rest are totalled with one aggregate query.
+    """
+    totals = {}
+    pending = []
+    for goal in goals:
+        if hasattr(goal, 'contribution_total'):
+            totals[goal.pk] = (goal.contribution_total, goal.first_contribution_date)
+        else:
+            pending.append(goal.pk)
+    if pending:
+        rows = GoalContribution.objects.filter(goal_id__in=pending).order_by().values('goal_id').annotate(
+            total=Sum('amount'), first=Min('date')
+        ).values_list('goal_id', 'total', 'first')
+        totals.update((goal_id, (total, first)) for goal_id, total, first in rows)
+    return {
+        goal_id: total / max(1, (today - first).days + 1)
+        for goal_id, (total, first) in totals.items() if total and total > 0
+    }
+
+
+def forecast_goals(goals, today=None):
+    """Forecast every goal in one pass: {goal id: GoalForecast}.
+
+    Reads all the goals' contribution totals with one aggregate query (none
+    for goals from with_contribution_stats) and evaluates the goals against
+    a single ``today``. A goal with nothing contributed yet has no projected
+    completion date.
+    """
+    goals = [goal for goal in goals if goal.pk]
+    if not goals:
+        return {}
+    today = today or timezone.localdate()
+    velocity = contribution_velocity(goals, today)
+
+    forecasts = {}
+    for goal in goals:
+        remaining = max(goal.target_amount - goal.current_amount, Decimal('0.00'))
+        days_remaining = max(0, (goal.target_date - today).days)
+
+        if remaining == 0:
+            projected = today
+        elif goal.pk in velocity:
+            days_needed = math.ceil(remaining / velocity[goal.pk])
+            projected = today + timedelta(days=days_needed) if days_needed <= (date.max - today).days else None
+        else:
+            projected = None
+
+        months_remaining = Decimal(days_remaining / DAYS_PER_MONTH)
+        if months_remaining >= 1:
+            required = (remaining / months_remaining).quantize(CENT, rounding=ROUND_UP)
+        else:
+            required = remaining
+
+        forecasts[goal.pk] = GoalForecast(
+            days_remaining=days_remaining,
+            is_on_track=on_track(goal.status, goal.progress_percentage, goal.start_date, goal.target_date, today),
+            projected_completion_date=projected,
+            required_monthly_contribution=required,
+        )
+    return forecasts
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_statement_aggregates'),
+        ('goals', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goalcontribution',
+            index=models.Index(fields=['goal', 'date'], name='goal_contribution_date_idx'),
+        ),
+    ]
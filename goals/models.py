@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
+from accounts.cache import invalidate_dashboard
 
 class Goal(models.Model):
     """Financial goals for users"""
@@ -36,9 +37,25 @@ class Goal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='goal_user_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.current_amount}/{self.target_amount}"
 
+    def save(self, *args, **kwargs):
+        # Contributions update current_amount through here as well
+        super().save(*args, **kwargs)
+        invalidate_dashboard(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            invalidate_dashboard(self.user_id)
+        return result
+
     @property
     def progress_percentage(self):
         """Calculate percentage of goal achieved"""
@@ -49,30 +66,17 @@ class Goal(models.Model):
     @property
     def days_remaining(self):
         """Calculate days remaining until target date"""
-        today = timezone.now().date()
-        if today > self.target_date:
-            return 0
-        return (self.target_date - today).days
+        return max(0, (self.target_date - timezone.localdate()).days)
 
     @property
     def is_on_track(self):
-        """Determine if goal is on track to be completed by target date"""
-        if self.status == 'completed':
-            return True
-
-        if self.days_remaining == 0:
-            return self.progress_percentage >= 100
-
-        # Calculate expected progress based on elapsed time
-        total_days = (self.target_date - self.start_date).days
-        if total_days <= 0:
-            return self.progress_percentage >= 100
-
-        elapsed_days = (timezone.now().date() - self.start_date).days
-        expected_progress = (elapsed_days / total_days) * 100
+        """Determine if goal is on track to be completed by target date.
 
-        # Allow for a 10% buffer
-        return self.progress_percentage >= (expected_progress - 10)
+        Lists should use goals.forecasting.forecast_goals, which evaluates many
+        goals at once.
+        """
+        from .forecasting import on_track
+        return on_track(self.status, self.progress_percentage, self.start_date, self.target_date, timezone.localdate())
 
 class GoalContribution(models.Model):
     """Contributions made toward a goal"""
@@ -82,35 +86,46 @@ class GoalContribution(models.Model):
     notes = models.TextField(blank=True, null=True)
     from_account = models.ForeignKey('banking.Account', on_delete=models.SET_NULL, null=True, blank=True, related_name='goal_contributions')
 
+    class Meta:
+        indexes = [
+            # Contribution history pages and windowed totals per goal
+            models.Index(fields=['goal', 'date'], name='goal_contribution_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.goal.name} - {self.amount} on {self.date}"
 
     def save(self, *args, **kwargs):
-        # Update the goal's current amount when a contribution is added
-        is_new = self.pk is None
-        old_amount = 0
-
-        if not is_new:
-            # Get the old amount if this is an update
-            old_obj = GoalContribution.objects.get(pk=self.pk)
-            old_amount = old_obj.amount
-
-        super().save(*args, **kwargs)
-
-        # Update the goal's current amount
-        if is_new:
-            self.goal.current_amount += self.amount
-        else:
-            # Adjust for the difference if this is an update
-            self.goal.current_amount = self.goal.current_amount - old_amount + self.amount
-
-        # Update goal status if completed
-        if self.goal.current_amount >= self.goal.target_amount:
-            self.goal.status = 'completed'
-        elif self.goal.status == 'not_started':
-            self.goal.status = 'in_progress'
-
-        self.goal.save()
+        """Save and move the goal's current amount by the change, in one transaction"""
+        from .contributions import add_to_goals
+
+        with transaction.atomic():
+            old = None
+            if self.pk is not None:
+                old = GoalContribution.objects.filter(pk=self.pk).values_list('goal_id', 'amount').first()
+            super().save(*args, **kwargs)
+
+            deltas = {self.goal_id: self.amount}
+            if old:
+                deltas[old[0]] = deltas.get(old[0], 0) - old[1]
+            add_to_goals(deltas)
+            invalidate_dashboard(self.goal.user_id)
+        self._refresh_goal()
+
+    def delete(self, *args, **kwargs):
+        from .contributions import add_to_goals
+
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            add_to_goals({self.goal_id: -self.amount})
+            invalidate_dashboard(self.goal.user_id)
+        self._refresh_goal()
+        return result
+
+    def _refresh_goal(self):
+        # The amounts were updated in the database; keep an already loaded goal in step
+        if GoalContribution.goal.is_cached(self):
+            self.goal.refresh_from_db(fields=['current_amount', 'status', 'updated_at'])
 
 class GoalMilestone(models.Model):
     """Milestones for tracking progress toward a goal"""
@@ -1,3 +1,128 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from banking.models import Account, AccountType, Transaction
+
+from .contributions import post_contribution
+from .forecasting import forecast_goals
+from .models import Goal, GoalContribution
+
+
+class ContributionTests(TestCase):
+    """A contribution and its withdrawal are posted together or not at all"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='goals@example.com', password='x', first_name='Goal', last_name='Test')
+        self.other = User.objects.create_user(email='goals2@example.com', password='x', first_name='Other', last_name='Goal')
+        account_type = AccountType.objects.create(name='Savings', description='Savings')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='GOAL0001')
+        self.account.deposit(Decimal('100.00'))
+        self.goal = self.create_goal(self.user, 'Holiday', '500.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_goal(self, user, name, target):
+        return Goal.objects.create(user=user, name=name, goal_type='savings', target_amount=Decimal(target),
+                                   current_amount=Decimal('0.00'), target_date='2030-01-01')
+
+    def snapshot(self):
+        return (
+            Account.objects.get(pk=self.account.pk).balance,
+            Transaction.objects.count(),
+            list(Goal.objects.order_by('pk').values_list('current_amount', 'status')),
+            GoalContribution.objects.count(),
+        )
+
+    def test_insufficient_funds_posts_nothing(self):
+        before = self.snapshot()
+        with self.assertRaisesMessage(ValueError, 'Insufficient funds'):
+            post_contribution(self.goal, Decimal('150.00'), account=self.account)
+        self.assertEqual(self.snapshot(), before)
+
+        response = self.client.post(f'/api/goals/{self.goal.pk}/contribute/',
+                                    {'amount': '150.00', 'account_id': self.account.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_failed_contribution_rolls_back_withdrawal(self):
+        before = self.snapshot()
+        with mock.patch.object(GoalContribution, 'save', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                post_contribution(self.goal, Decimal('40.00'), account=self.account)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_contribution_with_withdrawal(self):
+        post_contribution(self.goal, Decimal('40.00'), account=self.account)
+        self.assertEqual(self.snapshot(), (
+            Decimal('60.00'), 2, [(Decimal('40.00'), 'in_progress')], 1
+        ))
+
+    def test_bulk_contribute(self):
+        small = self.create_goal(self.user, 'Bike', '50.00')
+        foreign = self.create_goal(self.other, 'Car', '900.00')
+        response = self.client.post('/api/goals/bulk-contribute/', {'contributions': [
+            {'goal': self.goal.pk, 'amount': '25.00'},
+            {'goal': small.pk, 'amount': '50.00', 'account': self.account.pk},
+            {'goal': self.goal.pk, 'amount': '80.00', 'account': self.account.pk},
+            {'goal': foreign.pk, 'amount': '10.00'},
+            {'goal': self.goal.pk, 'amount': '0'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['posted'], body['failed']), (2, 3))
+        results = body['results']
+        self.assertEqual([result['success'] for result in results], [True, True, False, False, False])
+        self.assertIsNone(results[0]['transaction_id'])
+        self.assertIsNotNone(results[1]['transaction_id'])
+        self.assertEqual(results[2]['error'], 'Insufficient funds')
+        self.assertEqual(results[3]['error'], 'Goal not found')
+        self.assertIn('amount', results[4]['error'])
+
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('50.00'))
+        goals = dict(Goal.objects.values_list('pk', 'current_amount'))
+        self.assertEqual((goals[self.goal.pk], goals[small.pk], goals[foreign.pk]),
+                         (Decimal('25.00'), Decimal('50.00'), Decimal('0.00')))
+        self.assertEqual(Goal.objects.get(pk=small.pk).status, 'completed')
+        self.assertEqual(GoalContribution.objects.count(), 2)
+
+
+class ForecastTests(TestCase):
+    """Projections follow the average daily contribution since the first one"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='forecast@example.com', password='x', first_name='Fore', last_name='Cast')
+        self.today = timezone.localdate()
+        self.goal = Goal.objects.create(
+            user=self.user, name='Car', goal_type='savings', status='in_progress',
+            target_amount=Decimal('1000.00'), current_amount=Decimal('0.00'),
+            start_date=self.today - timedelta(days=60), target_date=self.today + timedelta(days=200)
+        )
+        # 300.00 over the 60 days since the first contribution: 5.00 a day
+        for days_ago, amount in ((59, '150.00'), (20, '100.00'), (5, '50.00')):
+            GoalContribution.objects.create(goal=self.goal, amount=Decimal(amount), date=self.today - timedelta(days=days_ago))
+        self.goal.refresh_from_db()
+
+    def test_forecast(self):
+        forecast = forecast_goals([self.goal], today=self.today)[self.goal.pk]
+        self.assertEqual(forecast.days_remaining, 200)
+        self.assertTrue(forecast.is_on_track)
+        # 700.00 left at 5.00 a day
+        self.assertEqual(forecast.projected_completion_date, self.today + timedelta(days=140))
+        # 700.00 over 200 days, about 6.57 months
+        self.assertEqual(forecast.required_monthly_contribution, Decimal('106.53'))
+
+    def test_goal_api_reports_contribution_totals_and_forecast(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        goal = client.get('/api/goals/').json()[0]
+        self.assertEqual(Decimal(str(goal['contributed_30d'])), Decimal('150.00'))
+        self.assertEqual(Decimal(str(goal['contributed_90d'])), Decimal('300.00'))
+        self.assertEqual(goal['projected_completion_date'], (self.today + timedelta(days=140)).isoformat())
+        self.assertEqual(Decimal(str(goal['required_monthly_contribution'])), Decimal('106.53'))
 
-# Create your tests here.
@@ -1,5 +1,10 @@
+import uuid
+
 from django.contrib import admin
-from .models import Category, EnhancedTransaction, Tag, RecurringGroup, SplitTransaction
+from django.db.models import Q
+
+from .models import Category, EnhancedTransaction, Tag, RecurringGroup, SplitTransaction, CashFlowRollup, CategoryRule
+from .search import matching_transactions
 
 class SplitTransactionInline(admin.TabularInline):
     model = SplitTransaction
@@ -18,6 +23,18 @@ class EnhancedTransactionAdmin(admin.ModelAdmin):
     search_fields = ('bank_transaction__reference_number', 'notes', 'location')
     inlines = [SplitTransactionInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Notes, location, tags and category are all in the full-text index
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        q = matching_transactions(search_term, prefix='bank_transaction__')
+        try:
+            q |= Q(bank_transaction__reference_number=uuid.UUID(search_term))
+        except ValueError:
+            pass
+        return queryset.filter(q), False
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'color')
@@ -33,3 +50,16 @@ class RecurringGroupAdmin(admin.ModelAdmin):
 class SplitTransactionAdmin(admin.ModelAdmin):
     list_display = ('parent_transaction', 'amount', 'category')
     list_filter = ('category',)
+
+@admin.register(CashFlowRollup)
+class CashFlowRollupAdmin(admin.ModelAdmin):
+    list_display = ('account', 'date', 'transaction_type', 'category', 'transaction_count', 'total_amount')
+    list_filter = ('transaction_type', 'date')
+    search_fields = ('account__account_number', 'user__email')
+    date_hierarchy = 'date'
+
+@admin.register(CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('pattern', 'match_type', 'category', 'user', 'account', 'min_amount', 'max_amount', 'priority', 'is_active')
+    list_filter = ('match_type', 'is_active')
+    search_fields = ('pattern', 'category__name', 'user__email')
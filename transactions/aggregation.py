@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from banking.filters import TransactionFilter
+
+from .models import EnhancedTransaction, SplitTransaction
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+def _parent_share(output_field):
+    """The part of a transaction's amount not assigned to any of its splits"""
+    split_total = SplitTransaction.objects.filter(
+        parent_transaction=OuterRef('pk')
+    ).order_by().values('parent_transaction').annotate(total=Sum('amount')).values('total')
+    return F('bank_transaction__amount') - Coalesce(
+        Subquery(split_total, output_field=output_field), Value(Decimal('0.00')), output_field=output_field
+    )
+
+
+def category_totals(user, params=None):
+    """Transaction count and total amount per category name for a user's transactions.
+
+    Split transactions are attributed to the split categories; whatever part of
+    the amount the splits leave unassigned stays with the parent's category.
+    ``params`` are optional TransactionFilter parameters (dates, period,
+    account, transaction_type, amounts) applied to the bank transactions.
+    Runs two grouped queries however many transactions there are.
+    """
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+
+    parents = EnhancedTransaction.objects.filter(bank_transaction__account__user=user)
+    splits = SplitTransaction.objects.filter(parent_transaction__bank_transaction__account__user=user)
+    if params is not None:
+        parents = TransactionFilter(params, prefix='bank_transaction__').filter_queryset(parents)
+        splits = TransactionFilter(params, prefix='parent_transaction__bank_transaction__').filter_queryset(splits)
+
+    parents = parents.annotate(share=_parent_share(decimal))
+
+    totals = {}
+    for rows in (
+        parents.order_by().values('category__name').annotate(
+            count=Count('pk', filter=~Q(share=0)),
+            total=Sum('share'),
+        ).values_list('category__name', 'count', 'total'),
+        splits.order_by().values('category__name').annotate(
+            count=Count('pk'),
+            total=Sum('amount'),
+        ).values_list('category__name', 'count', 'total'),
+    ):
+        for name, count, total in rows:
+            if not count:
+                continue
+            entry = totals.setdefault(name or UNCATEGORIZED, {'count': 0, 'total': Decimal('0.00')})
+            entry['count'] += count
+            entry['total'] += total or Decimal('0.00')
+    return totals
+
+
+def subtree_totals(user, category_ids, params=None):
+    """Count and total of a user's transactions in any of ``category_ids``.
+
+    Pass a category's subtree (see transactions.tree) to roll spending up from
+    all its subcategories with one ``category_id IN (...)`` query per side;
+    split amounts are attributed the same way as in category_totals.
+    """
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    category_ids = list(category_ids)
+
+    parents = EnhancedTransaction.objects.filter(bank_transaction__account__user=user, category_id__in=category_ids)
+    splits = SplitTransaction.objects.filter(
+        parent_transaction__bank_transaction__account__user=user, category_id__in=category_ids
+    )
+    if params is not None:
+        parents = TransactionFilter(params, prefix='bank_transaction__').filter_queryset(parents)
+        splits = TransactionFilter(params, prefix='parent_transaction__bank_transaction__').filter_queryset(splits)
+
+    parent_totals = parents.annotate(share=_parent_share(decimal)).aggregate(
+        count=Count('pk', filter=~Q(share=0)),
+        total=Sum('share'),
+    )
+    split_totals = splits.aggregate(count=Count('pk'), total=Sum('amount'))
+    return {
+        'count': parent_totals['count'] + split_totals['count'],
+        'total': (parent_totals['total'] or Decimal('0.00')) + (split_totals['total'] or Decimal('0.00')),
+    }
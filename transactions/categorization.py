@@ -0,0 +1,268 @@
+import re
+import threading
+from collections import deque
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from banking.models import Transaction as BankTransaction
+
+from .models import CategoryRule, EnhancedTransaction
+from .versions import CATEGORY_RULES, get_version
+
+# Rule sets of the most recently used users, oldest first
+MAX_CACHED_RULESETS = 1000
+_rulesets = {}
+_rulesets_lock = threading.Lock()
+
+_BACKREFERENCE = re.compile(r'\\\d|\(\?P=')
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over lower-cased keywords.
+
+    ``search`` reports every keyword found in a text in one pass over it, so
+    the cost depends on the text length and the number of hits, not on how
+    many keywords there are. Hits must start and end on word boundaries.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+    def add(self, keyword, value):
+        node = 0
+        for char in keyword:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append((len(keyword), value))
+
+    def build(self):
+        """Compute failure links breadth first; call once after the last add()"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def search(self, text):
+        found = set()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, value in self.outputs[node]:
+                start = end - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    found.add(value)
+        return found
+
+
+class RuleSet:
+    """A user's active rules (their own plus the system ones) compiled for matching"""
+
+    def __init__(self, rules):
+        self.rules = []
+        self.automaton = KeywordAutomaton()
+        self.regexes = []
+        self.unconditional = []
+
+        for rule in rules:
+            index = len(self.rules)
+            pattern = rule.pattern.strip()
+            if rule.match_type == 'regex' and pattern:
+                try:
+                    self.regexes.append((re.compile(pattern, re.IGNORECASE), index))
+                except re.error:
+                    continue
+            elif pattern:
+                self.automaton.add(pattern.lower(), index)
+            else:
+                self.unconditional.append(index)
+            # User rules win over system rules of the same priority
+            self.rules.append(((rule.priority, rule.user_id is None, rule.pk), rule))
+        self.automaton.build()
+
+        # One combined pass rejects most descriptions before any single regex
+        # runs; backreferences would be renumbered by combining, so they opt out
+        self.regex_prefilter = None
+        patterns = [regex.pattern for regex, index in self.regexes]
+        if patterns and not any(_BACKREFERENCE.search(pattern) for pattern in patterns):
+            try:
+                self.regex_prefilter = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+            except re.error:
+                pass
+
+    def match(self, description, amount, account_id, transaction_type):
+        """Category id of the best matching rule, or None"""
+        text = (description or '').lower()
+        candidates = self.automaton.search(text)
+        if self.regexes and (self.regex_prefilter is None or self.regex_prefilter.search(text)):
+            candidates.update(index for regex, index in self.regexes if regex.search(text))
+        candidates.update(self.unconditional)
+
+        best = None
+        for index in candidates:
+            key, rule = self.rules[index]
+            if rule.account_id and rule.account_id != account_id:
+                continue
+            if rule.transaction_type and rule.transaction_type != transaction_type:
+                continue
+            if rule.min_amount is not None and amount < rule.min_amount:
+                continue
+            if rule.max_amount is not None and amount > rule.max_amount:
+                continue
+            if best is None or key < best[0]:
+                best = (key, rule.category_id)
+        return best[1] if best else None
+
+
+def get_ruleset(user_id):
+    """The user's compiled RuleSet, recompiled only when a relevant rule changed.
+
+    Each call reads the rule versions from the database, so a batch looks up
+    each user's rule set once through get_rulesets.
+    """
+    version = get_version(CATEGORY_RULES, user_id)
+    with _rulesets_lock:
+        cached = _rulesets.get(user_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    ruleset = RuleSet(CategoryRule.objects.filter(
+        Q(user__isnull=True) | Q(user_id=user_id), is_active=True
+    ).order_by())
+    with _rulesets_lock:
+        _rulesets.pop(user_id, None)
+        _rulesets[user_id] = (version, ruleset)
+        while len(_rulesets) > MAX_CACHED_RULESETS:
+            del _rulesets[next(iter(_rulesets))]
+    return ruleset
+
+
+def get_rulesets(user_ids):
+    """{user id: RuleSet} for the distinct ``user_ids``"""
+    return {user_id: get_ruleset(user_id) for user_id in set(user_ids)}
+
+
+def apply_categories(rows):
+    """Keep the budget counters and cash-flow rollups in step with bulk categorization.
+
+    ``rows`` are (user_id, account_id, created_at, transaction_type, amount,
+    old_category_id, new_category_id) for transactions whose category changed
+    outside EnhancedTransaction.save. Deltas are summed per bucket first.
+    """
+    from budgets.counters import record_spend
+    from .rollups import add_to_rollup
+
+    rollups = {}
+    spend = {}
+    for user_id, account_id, created_at, transaction_type, amount, old_category_id, new_category_id in rows:
+        day = timezone.localtime(created_at).date()
+        for category_id, sign in ((old_category_id, -1), (new_category_id, 1)):
+            key = (user_id, account_id, day, transaction_type, category_id)
+            count, total = rollups.get(key, (0, 0))
+            rollups[key] = (count + sign, total + sign * amount)
+            if category_id:
+                spend_key = (user_id, category_id, transaction_type, day)
+                spend[spend_key] = spend.get(spend_key, 0) + sign * amount
+
+    for key, (count, total) in rollups.items():
+        if count or total:
+            add_to_rollup(*key, count, total)
+    for (user_id, category_id, transaction_type, day), amount in spend.items():
+        record_spend(user_id, category_id, transaction_type, amount, day)
+
+
+def categorize_postings(transactions):
+    """File newly posted transactions under the category of their best matching rule.
+
+    Creates the EnhancedTransactions in one bulk insert and updates the budget
+    counters; returns {transaction id: category id} for the matched ones so
+    the caller can add them to the rollups under that category.
+    """
+    rulesets = get_rulesets(txn.account.user_id for txn in transactions)
+    categories = {}
+    for txn in transactions:
+        category_id = rulesets[txn.account.user_id].match(
+            txn.description, txn.amount, txn.account_id, txn.transaction_type
+        )
+        if category_id:
+            categories[txn.pk] = category_id
+    if not categories:
+        return categories
+
+    from budgets.counters import record_spend
+
+    EnhancedTransaction.objects.bulk_create([
+        EnhancedTransaction(bank_transaction_id=pk, category_id=category_id)
+        for pk, category_id in categories.items()
+    ], batch_size=1000)
+    for txn in transactions:
+        if txn.pk in categories:
+            record_spend(
+                txn.account.user_id, categories[txn.pk], txn.transaction_type, txn.amount,
+                timezone.localtime(txn.created_at).date()
+            )
+    return categories
+
+
+def backfill_categories(user_ids, batch_size=5000):
+    """Categorize the users' uncategorized history by rule; returns the number categorized.
+
+    Works through the history in batches, each committed on its own with one
+    bulk_create of new EnhancedTransactions and one bulk_update of existing
+    uncategorized ones.
+    """
+    rows = BankTransaction.objects.filter(
+        account__user_id__in=user_ids,
+        enhanced_data__category__isnull=True
+    ).order_by('pk').values_list(
+        'pk', 'account__user_id', 'account_id', 'created_at', 'transaction_type', 'amount', 'description',
+        'enhanced_data__id'
+    )
+
+    categorized = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            categorized += _categorize_batch(batch)
+            batch = []
+    if batch:
+        categorized += _categorize_batch(batch)
+    return categorized
+
+
+def _categorize_batch(rows):
+    rulesets = get_rulesets(row[1] for row in rows)
+    to_create, to_update, moves = [], [], []
+    for pk, user_id, account_id, created_at, transaction_type, amount, description, enhanced_id in rows:
+        category_id = rulesets[user_id].match(description, amount, account_id, transaction_type)
+        if not category_id:
+            continue
+        if enhanced_id:
+            to_update.append(EnhancedTransaction(pk=enhanced_id, category_id=category_id))
+        else:
+            to_create.append(EnhancedTransaction(bank_transaction_id=pk, category_id=category_id))
+        moves.append((user_id, account_id, created_at, transaction_type, amount, None, category_id))
+
+    with transaction.atomic():
+        EnhancedTransaction.objects.bulk_create(to_create, batch_size=1000)
+        EnhancedTransaction.objects.bulk_update(to_update, ['category'], batch_size=1000)
+        apply_categories(moves)
+    return len(moves)
@@ -0,0 +1,66 @@
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from transactions.categorization import RuleSet
+from transactions.models import CategoryRule
+
+
+class Command(BaseCommand):
+    help = 'Measure rule matching throughput (rows/sec) for a synthetic rule set'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Rule counts to benchmark')
+        parser.add_argument('--rows', type=int, default=50000,
+                            help='Descriptions matched per rule count')
+        parser.add_argument('--regex-share', type=float, default=0.01,
+                            help='Fraction of the rules that are regular expressions')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def word():
+            return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+        vocabulary = [word() for _ in range(max(options['rules']) * 2)]
+        descriptions = [
+            ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(2, 6))) + f' #{rng.randint(1000, 99999)}'
+            for _ in range(options['rows'])
+        ]
+        amounts = [Decimal(rng.randint(100, 50000)) / 100 for _ in descriptions]
+
+        for count in options['rules']:
+            # Unsaved rules: only matching is measured, the database is not touched
+            rules = []
+            for pk in range(1, count + 1):
+                is_regex = rng.random() < options['regex_share']
+                keyword = rng.choice(vocabulary)
+                rules.append(CategoryRule(
+                    pk=pk,
+                    category_id=pk % 50 + 1,
+                    match_type='regex' if is_regex else 'keyword',
+                    pattern=rf'\b{keyword}\b' if is_regex else keyword,
+                    min_amount=Decimal('10.00') if pk % 7 == 0 else None,
+                    priority=rng.randint(1, 200),
+                ))
+
+            started = time.perf_counter()
+            ruleset = RuleSet(rules)
+            compiled = time.perf_counter() - started
+
+            started = time.perf_counter()
+            matched = sum(
+                1 for description, amount in zip(descriptions, amounts)
+                if ruleset.match(description, amount, None, 'withdrawal')
+            )
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f'{count:>6} rules: compiled in {compiled * 1000:.0f} ms, '
+                f'{len(descriptions) / elapsed:,.0f} rows/sec, {matched} matched'
+            )
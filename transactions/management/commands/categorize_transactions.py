@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from transactions.categorization import backfill_categories
+
+
+class Command(BaseCommand):
+    help = 'Categorize uncategorized transaction history with the category rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', type=int,
+                            help='User id to categorize (repeatable); defaults to all users')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Users whose history is read per query')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Transactions written per bulk insert/update and commit')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = get_user_model().objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        user_ids = list(users.values_list('pk', flat=True))
+
+        chunk_size = options['chunk_size']
+        categorized = 0
+        for start in range(0, len(user_ids), chunk_size):
+            categorized += backfill_categories(user_ids[start:start + chunk_size], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Categorized {categorized} transactions for {len(user_ids)} users '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
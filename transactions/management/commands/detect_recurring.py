@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from transactions.recurring import detect_recurring
+
+
+class Command(BaseCommand):
+    help = 'Detect recurring transactions and group them into RecurringGroups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', type=int,
+                            help='User id to analyse (repeatable); defaults to all users')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Users whose history is loaded per query')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = get_user_model().objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        user_ids = list(users.values_list('pk', flat=True))
+
+        chunk_size = options['chunk_size']
+        groups = flagged = 0
+        for start in range(0, len(user_ids), chunk_size):
+            chunk_groups, chunk_flagged = detect_recurring(user_ids[start:start + chunk_size])
+            groups += chunk_groups
+            flagged += chunk_flagged
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {groups} recurring groups covering {flagged} transactions '
+            f'for {len(user_ids)} users in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from transactions.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily cash-flow rollups from the Transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', type=int,
+                            help='User id to rebuild (repeatable); defaults to all users')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            # One short transaction per user keeps the write lock brief
+            with transaction.atomic():
+                rebuilt += rebuild_rollups(user)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} cash-flow rollup rows'))
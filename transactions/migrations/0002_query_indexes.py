@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0003_query_indexes'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enhancedtransaction',
+            index=models.Index(fields=['category', 'bank_transaction'], name='etxn_category_txn_idx'),
+        ),
+    ]
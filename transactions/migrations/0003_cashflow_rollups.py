@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('banking', 'Transaction')
+    CashFlowRollup = apps.get_model('transactions', 'CashFlowRollup')
+
+    rows = Transaction.objects.annotate(day=TruncDate('created_at')).order_by().values(
+        'account__user_id', 'account_id', 'day', 'transaction_type', 'enhanced_data__category'
+    ).annotate(count=Count('pk'), total=Sum('amount'))
+    CashFlowRollup.objects.bulk_create([
+        CashFlowRollup(
+            user_id=row['account__user_id'],
+            account_id=row['account_id'],
+            date=row['day'],
+            transaction_type=row['transaction_type'],
+            category_id=row['enhanced_data__category'],
+            transaction_count=row['count'],
+            total_amount=row['total']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_statement_aggregates'),
+        ('transactions', '0002_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('transfer_in', 'Transfer In'), ('transfer_out', 'Transfer Out'), ('interest', 'Interest'), ('fee', 'Fee')], max_length=15)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cash_flow_rollups', to='banking.account')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cash_flow_rollups', to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cash_flow_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='rollup_user_date_idx')],
+                'unique_together': {('account', 'date', 'transaction_type', 'category')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
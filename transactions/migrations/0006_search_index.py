@@ -0,0 +1,97 @@
+from django.db import migrations
+
+# One FTS5 row per bank transaction (rowid = banking_transaction.id). "owner"
+# holds a "u<user id>" token so a user's search is an index intersection
+# rather than a filter over every match.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE transactions_search USING fts5(
+    owner, description, notes, location, tags, category,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# Rebuilds the rows of the transactions selected by {where}. Django saves
+# write every column, so the rename triggers below check that the value changed.
+REFRESH = """
+DELETE FROM transactions_search WHERE rowid IN (SELECT t.id FROM banking_transaction t WHERE {where});
+INSERT INTO transactions_search (rowid, owner, description, notes, location, tags, category)
+SELECT t.id,
+       'u' || a.user_id,
+       t.description,
+       COALESCE(e.notes, ''),
+       COALESCE(e.location, ''),
+       COALESCE((SELECT group_concat(g.name, ' ')
+                 FROM transactions_enhancedtransaction_tags x
+                 JOIN transactions_tag g ON g.id = x.tag_id
+                 WHERE x.enhancedtransaction_id = e.id), ''),
+       COALESCE(c.name, '')
+FROM banking_transaction t
+JOIN banking_account a ON a.id = t.account_id
+LEFT JOIN transactions_enhancedtransaction e ON e.bank_transaction_id = t.id
+LEFT JOIN transactions_category c ON c.id = e.category_id
+WHERE {where};
+"""
+
+TAGGED = """t.id IN (SELECT e2.bank_transaction_id FROM transactions_enhancedtransaction e2
+                     JOIN transactions_enhancedtransaction_tags x2 ON x2.enhancedtransaction_id = e2.id
+                     WHERE x2.tag_id = {tag})"""
+
+TRIGGERS = {
+    'transactions_search_txn_insert': ('AFTER INSERT ON banking_transaction', REFRESH.format(where='t.id = NEW.id')),
+    'transactions_search_txn_update': ('AFTER UPDATE OF description, account_id ON banking_transaction '
+                                       'WHEN OLD.description IS NOT NEW.description OR OLD.account_id IS NOT NEW.account_id',
+                                       REFRESH.format(where='t.id = NEW.id')),
+    'transactions_search_txn_delete': ('AFTER DELETE ON banking_transaction',
+                                       'DELETE FROM transactions_search WHERE rowid = OLD.id;'),
+    'transactions_search_etxn_insert': ('AFTER INSERT ON transactions_enhancedtransaction',
+                                        REFRESH.format(where='t.id = NEW.bank_transaction_id')),
+    'transactions_search_etxn_update': ('AFTER UPDATE ON transactions_enhancedtransaction',
+                                        REFRESH.format(where='t.id IN (OLD.bank_transaction_id, NEW.bank_transaction_id)')),
+    'transactions_search_etxn_delete': ('AFTER DELETE ON transactions_enhancedtransaction',
+                                        REFRESH.format(where='t.id = OLD.bank_transaction_id')),
+    'transactions_search_tagged_insert': (
+        'AFTER INSERT ON transactions_enhancedtransaction_tags',
+        REFRESH.format(where='t.id = (SELECT bank_transaction_id FROM transactions_enhancedtransaction WHERE id = NEW.enhancedtransaction_id)')
+    ),
+    'transactions_search_tagged_delete': (
+        'AFTER DELETE ON transactions_enhancedtransaction_tags',
+        REFRESH.format(where='t.id = (SELECT bank_transaction_id FROM transactions_enhancedtransaction WHERE id = OLD.enhancedtransaction_id)')
+    ),
+    'transactions_search_tag_rename': ('AFTER UPDATE OF name ON transactions_tag WHEN OLD.name IS NOT NEW.name',
+                                       REFRESH.format(where=TAGGED.format(tag='NEW.id'))),
+    'transactions_search_category_rename': (
+        'AFTER UPDATE OF name ON transactions_category WHEN OLD.name IS NOT NEW.name',
+        REFRESH.format(where='t.id IN (SELECT bank_transaction_id FROM transactions_enhancedtransaction WHERE category_id = NEW.id)')
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for name, (event, body) in TRIGGERS.items():
+        schema_editor.execute(f'CREATE TRIGGER {name} {event} BEGIN {body} END')
+    for statement in REFRESH.format(where='1').split(';'):
+        if statement.strip():
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    schema_editor.execute('DROP TABLE IF EXISTS transactions_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_statement_aggregates'),
+        ('transactions', '0005_category_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+import re
+
+from django.db import models, transaction
 from django.conf import settings
 from banking.models import Account, Transaction as BankTransaction
+from .versions import CATEGORY_RULES, CATEGORY_TREE, bump_version
 
 class Category(models.Model):
     """Transaction categories for better organization and analysis"""
@@ -22,10 +25,73 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        indexes = [
+            # Lets "system or mine" lookups combine this with the user index
+            models.Index(fields=['is_system'], name='category_system_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def visible_to(user):
+        """Q for the system categories plus the user's own"""
+        # is_system__in rather than a bare boolean test, so SQLite can OR the
+        # is_system and user indexes instead of scanning the table
+        return models.Q(is_system__in=[True]) | models.Q(user=user)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_version(CATEGORY_TREE, None if self.is_system else self.user_id)
+
+    def delete(self, *args, **kwargs):
+        # Bumped once the rows are gone, so they cannot be cached under the new version
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            bump_version(CATEGORY_TREE, None if self.is_system else self.user_id)
+        return result
+
+class CategoryRule(models.Model):
+    """Files incoming transactions under a category; all set conditions must match"""
+    MATCH_TYPES = [
+        ('keyword', 'Keyword'),
+        ('regex', 'Regular expression'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='category_rules', null=True, blank=True)  # NULL for system rules
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    match_type = models.CharField(max_length=10, choices=MATCH_TYPES, default='keyword')
+    pattern = models.CharField(max_length=255, blank=True)  # Matched against the description; blank matches any
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='category_rules', null=True, blank=True)
+    transaction_type = models.CharField(max_length=15, choices=BankTransaction.TRANSACTION_TYPES, blank=True)
+    priority = models.IntegerField(default=100)  # Lower wins when several rules match
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['priority', 'id']
+
+    def __str__(self):
+        return f"{self.get_match_type_display()} '{self.pattern}' -> {self.category}"
+
+    def save(self, *args, **kwargs):
+        if self.match_type == 'regex':
+            try:
+                re.compile(self.pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression: {e}")
+        super().save(*args, **kwargs)
+        bump_version(CATEGORY_RULES, self.user_id)
+
+    def delete(self, *args, **kwargs):
+        # Bumped once the rows are gone, so they cannot be cached under the new version
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            bump_version(CATEGORY_RULES, self.user_id)
+        return result
+
 class EnhancedTransaction(models.Model):
     """Enhanced transaction model with additional metadata for the EcoFin app"""
     bank_transaction = models.OneToOneField(BankTransaction, on_delete=models.CASCADE, related_name='enhanced_data')
@@ -38,9 +104,37 @@ class EnhancedTransaction(models.Model):
     receipt_image = models.ImageField(upload_to='receipts/', blank=True, null=True)
     is_split = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Category spend lookups seek by category and join bank_transaction
+            # without touching the table; created_at is filtered on the joined row
+            models.Index(fields=['category', 'bank_transaction'], name='etxn_category_txn_idx'),
+        ]
+
     def __str__(self):
         return f"Enhanced: {self.bank_transaction}"
 
+    def save(self, *args, **kwargs):
+        # Keep the budget spend counters and cash-flow rollups in step with the category
+        from budgets.counters import record_enhanced_transaction
+        from .rollups import move_category
+        old_category_id = None
+        if self.pk:
+            old_category_id = EnhancedTransaction.objects.filter(pk=self.pk).values_list('category_id', flat=True).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            record_enhanced_transaction(self, old_category_id)
+            move_category(self.bank_transaction, old_category_id, self.category_id)
+
+    def delete(self, *args, **kwargs):
+        from budgets.counters import record_enhanced_transaction
+        from .rollups import move_category
+        with transaction.atomic():
+            record_enhanced_transaction(self, removed=True)
+            move_category(self.bank_transaction, self.category_id, None)
+            return super().delete(*args, **kwargs)
+
 class Tag(models.Model):
     """Tags for transactions"""
     name = models.CharField(max_length=50)
@@ -76,6 +170,25 @@ class RecurringGroup(models.Model):
     def __str__(self):
         return f"{self.name} ({self.frequency})"
 
+class CashFlowRollup(models.Model):
+    """Daily totals per account, transaction type and category (NULL for uncategorized)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cash_flow_rollups')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='cash_flow_rollups')
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=15, choices=BankTransaction.TRANSACTION_TYPES)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='cash_flow_rollups')
+    transaction_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        unique_together = ['account', 'date', 'transaction_type', 'category']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='rollup_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.date} {self.transaction_type}: {self.total_amount}"
+
 class SplitTransaction(models.Model):
     """For transactions that are split across multiple categories"""
     parent_transaction = models.ForeignKey(EnhancedTransaction, on_delete=models.CASCADE, related_name='splits')
@@ -0,0 +1,12 @@
+from .categorization import categorize_postings
+from .rollups import record_postings
+
+
+def process_postings(transactions):
+    """Auto-categorize newly posted bank transactions and add them to the rollups.
+
+    Transaction.save calls this for single rows; the ledger calls it for the
+    rows it bulk creates. ``transactions`` must have their ``account`` loaded.
+    """
+    categories = categorize_postings(transactions)
+    record_postings(transactions, categories)
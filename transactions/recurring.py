@@ -0,0 +1,230 @@
+import re
+from array import array
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from statistics import median
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from banking.models import Transaction as BankTransaction
+
+from .models import EnhancedTransaction, RecurringGroup
+
+# (frequency, typical interval in days, allowed deviation in days)
+FREQUENCIES = [
+    ('daily', 1, 0),
+    ('weekly', 7, 1),
+    ('biweekly', 14, 2),
+    ('monthly', 30.4, 3),
+    ('quarterly', 91.3, 7),
+    ('yearly', 365.25, 10),
+]
+MIN_OCCURRENCES = 3
+# Share of intervals that must match the detected period
+MIN_REGULARITY = 0.75
+# Amounts within this fraction of each other count as the same payment
+AMOUNT_TOLERANCE = Decimal('0.10')
+
+_NOISE = re.compile(r'[\d#*/\\_.,:;()\[\]-]+')
+
+
+def normalize_description(description):
+    """Lower-case a description and drop digits and punctuation (dates, reference numbers)"""
+    return ' '.join(_NOISE.sub(' ', (description or '').lower()).split())
+
+
+def detect_frequency(days):
+    """The frequency matching the intervals between sorted day ordinals, or None"""
+    # Same-day repeats give zero intervals, which count against regularity
+    intervals = [later - earlier for earlier, later in zip(days, days[1:])]
+    if len(intervals) < MIN_OCCURRENCES - 1:
+        return None
+
+    typical = median(intervals)
+    for frequency, period, tolerance in FREQUENCIES:
+        if abs(typical - period) > tolerance:
+            continue
+        matching = sum(1 for interval in intervals if abs(interval - period) <= tolerance)
+        if matching / len(intervals) >= MIN_REGULARITY:
+            return frequency, period
+    return None
+
+
+class UserHistory:
+    """One user's transactions as parallel columns, in created_at order"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.ids = array('q')
+        self.days = array('l')
+        self.amounts = []
+        self.descriptions = []
+        self.categories = []
+        self.enhanced = []
+        self.groups = {}
+
+    def append(self, pk, created_at, amount, description, transaction_type, category_id, enhanced_id):
+        index = len(self.ids)
+        self.ids.append(pk)
+        self.days.append(timezone.localtime(created_at).date().toordinal())
+        self.amounts.append(amount)
+        self.descriptions.append(description)
+        self.categories.append(category_id)
+        self.enhanced.append(enhanced_id)
+        key = (transaction_type, normalize_description(description))
+        self.groups.setdefault(key, []).append(index)
+
+    def amount_clusters(self, indexes):
+        """Split a description group into runs of similar amounts"""
+        clusters = []
+        current = []
+        for index in sorted(indexes, key=lambda i: self.amounts[i]):
+            if current and self.amounts[index] > self.amounts[current[0]] * (1 + AMOUNT_TOLERANCE):
+                clusters.append(current)
+                current = []
+            current.append(index)
+        if current:
+            clusters.append(current)
+        return clusters
+
+    def detect(self, today):
+        """Detected recurring series as dicts, at most one per normalized name and frequency"""
+        detections = {}
+        for (transaction_type, normalized), indexes in self.groups.items():
+            if not normalized or len(indexes) < MIN_OCCURRENCES:
+                continue
+            for cluster in self.amount_clusters(indexes):
+                if len(cluster) < MIN_OCCURRENCES:
+                    continue
+                cluster.sort(key=lambda i: (self.days[i], self.ids[i]))
+                days = [self.days[i] for i in cluster]
+                found = detect_frequency(days)
+                if not found:
+                    continue
+
+                frequency, period = found
+                name = Counter(self.descriptions[i] for i in cluster).most_common(1)[0][0][:100]
+                category = Counter(self.categories[i] for i in cluster if self.categories[i]).most_common(1)
+                last_day = days[-1]
+                is_active = last_day + 2 * period >= today.toordinal()
+                detection = {
+                    'name': name,
+                    'key': normalize_description(name),
+                    'frequency': frequency,
+                    'start_date': days[0],
+                    'end_date': None if is_active else last_day,
+                    'is_active': is_active,
+                    'expected_amount': median(self.amounts[i] for i in cluster),
+                    'category_id': category[0][0] if category else None,
+                    'members': [(self.ids[i], self.enhanced[i]) for i in cluster],
+                }
+                # Keep the longest series when two clusters end up with the same name
+                key = (detection['key'], frequency)
+                if key not in detections or len(cluster) > len(detections[key]['members']):
+                    detections[key] = detection
+        return list(detections.values())
+
+
+def load_histories(user_ids):
+    """Stream the users' transactions into one UserHistory per user"""
+    histories = {}
+    rows = BankTransaction.objects.filter(account__user_id__in=user_ids).order_by(
+        'account__user_id', 'created_at', 'pk'
+    ).values_list(
+        'account__user_id', 'pk', 'created_at', 'amount', 'description', 'transaction_type',
+        'enhanced_data__category_id', 'enhanced_data__id'
+    )
+    for user_id, *row in rows.iterator(chunk_size=5000):
+        history = histories.get(user_id)
+        if history is None:
+            history = histories[user_id] = UserHistory(user_id)
+        history.append(*row)
+    return histories
+
+
+def save_detections(user_id, detections, today):
+    """Create or update the user's RecurringGroups and flag their member transactions.
+
+    Groups are matched on their normalized name and frequency, so a series
+    keeps its group when its most common spelling changes. Groups no longer
+    detected are deactivated, and transactions left in a group by an earlier
+    run but no longer part of any detected series are unflagged.
+    Returns the number of flagged transactions.
+    """
+    existing = {}
+    for group in RecurringGroup.objects.filter(user_id=user_id).order_by('pk'):
+        existing.setdefault((normalize_description(group.name), group.frequency), group)
+    to_create, to_update = [], []
+    for detection in detections:
+        group = existing.get((detection['key'], detection['frequency']))
+        if group is None:
+            group = RecurringGroup(user_id=user_id, frequency=detection['frequency'])
+            to_create.append(group)
+        else:
+            to_update.append(group)
+        group.name = detection['name']
+        group.start_date = date.fromordinal(detection['start_date'])
+        group.end_date = date.fromordinal(detection['end_date']) if detection['end_date'] else None
+        group.is_active = detection['is_active']
+        group.expected_amount = detection['expected_amount']
+        group.category_id = detection['category_id']
+        detection['group'] = group
+
+    flagged = 0
+    with transaction.atomic():
+        RecurringGroup.objects.bulk_create(to_create)
+        RecurringGroup.objects.bulk_update(
+            to_update, ['name', 'start_date', 'end_date', 'is_active', 'expected_amount', 'category'], batch_size=500
+        )
+        RecurringGroup.objects.filter(user_id=user_id, is_active=True).exclude(
+            pk__in=[detection['group'].pk for detection in detections]
+        ).update(is_active=False, end_date=Coalesce(F('end_date'), Value(today)))
+
+        members = {enhanced_id for detection in detections for _, enhanced_id in detection['members'] if enhanced_id}
+        dropped = [
+            enhanced_id
+            for enhanced_id in EnhancedTransaction.objects.filter(
+                recurring_group__user_id=user_id
+            ).values_list('pk', flat=True).iterator()
+            if enhanced_id not in members
+        ]
+        for start in range(0, len(dropped), 1000):
+            EnhancedTransaction.objects.filter(pk__in=dropped[start:start + 1000]).update(
+                is_recurring=False, recurring_group=None
+            )
+
+        new_enhanced = []
+        for detection in detections:
+            group = detection['group']
+            enhanced_ids = [enhanced_id for _, enhanced_id in detection['members'] if enhanced_id]
+            for start in range(0, len(enhanced_ids), 1000):
+                EnhancedTransaction.objects.filter(pk__in=enhanced_ids[start:start + 1000]).update(
+                    is_recurring=True, recurring_group=group
+                )
+            # Uncategorized transactions have no EnhancedTransaction yet; bulk
+            # creating them skips the category hooks, which have nothing to move
+            new_enhanced.extend(
+                EnhancedTransaction(bank_transaction_id=pk, is_recurring=True, recurring_group=group)
+                for pk, enhanced_id in detection['members'] if not enhanced_id
+            )
+            flagged += len(detection['members'])
+        EnhancedTransaction.objects.bulk_create(new_enhanced, batch_size=1000)
+    return flagged
+
+
+def detect_recurring(user_ids, today=None):
+    """Run detection for a chunk of users; returns (groups saved, transactions flagged)"""
+    today = today or timezone.localdate()
+    groups = flagged = 0
+    histories = load_histories(user_ids)
+    for user_id in user_ids:
+        # Saved even when nothing is detected, so earlier flags and groups are cleared
+        history = histories.get(user_id)
+        detections = history.detect(today) if history else []
+        flagged += save_detections(user_id, detections, today)
+        groups += len(detections)
+    return groups, flagged
@@ -0,0 +1,146 @@
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from banking.models import Transaction as BankTransaction
+
+from .models import CashFlowRollup
+
+GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _local_date(value):
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def add_to_rollup(user_id, account_id, day, transaction_type, category_id, count, amount):
+    """Fold a count/amount delta into one rollup row, creating it if needed.
+
+    Rows are looked up and then updated by primary key, so rows left sharing
+    the NULL category (a deleted category's totals fall back to uncategorized)
+    are never updated twice.
+    """
+    pk = CashFlowRollup.objects.filter(
+        account_id=account_id,
+        date=day,
+        transaction_type=transaction_type,
+        category_id=category_id
+    ).values_list('pk', flat=True).first()
+    if pk:
+        CashFlowRollup.objects.filter(pk=pk).update(
+            transaction_count=F('transaction_count') + count,
+            total_amount=F('total_amount') + amount
+        )
+    else:
+        CashFlowRollup.objects.create(
+            user_id=user_id,
+            account_id=account_id,
+            date=day,
+            transaction_type=transaction_type,
+            category_id=category_id,
+            transaction_count=count,
+            total_amount=amount
+        )
+
+
+def record_postings(transactions, categories=None):
+    """Add newly posted bank transactions to the rollups.
+
+    ``categories`` maps transaction ids to the category they were filed under
+    on posting; the rest count as uncategorized. ``transactions`` must have
+    their ``account`` loaded.
+    """
+    categories = categories or {}
+    deltas = {}
+    for txn in transactions:
+        key = (
+            txn.account.user_id, txn.account_id, _local_date(txn.created_at),
+            txn.transaction_type, categories.get(txn.pk)
+        )
+        count, amount = deltas.get(key, (0, Decimal('0.00')))
+        deltas[key] = (count + 1, amount + txn.amount)
+
+    for key, (count, amount) in deltas.items():
+        add_to_rollup(*key, count, amount)
+
+
+def move_category(bank_transaction, old_category_id, new_category_id):
+    """Move a bank transaction's amount from one category's rollup row to another's"""
+    if old_category_id == new_category_id:
+        return
+    key = (
+        bank_transaction.account.user_id,
+        bank_transaction.account_id,
+        _local_date(bank_transaction.created_at),
+        bank_transaction.transaction_type
+    )
+    add_to_rollup(*key, old_category_id, -1, -bank_transaction.amount)
+    add_to_rollup(*key, new_category_id, 1, bank_transaction.amount)
+
+
+def rebuild_rollups(user):
+    """Recompute one user's rollups from the Transaction rows; returns the number of rows"""
+    rows = BankTransaction.objects.filter(account__user=user).annotate(
+        day=TruncDate('created_at')
+    ).order_by().values(
+        'account_id', 'day', 'transaction_type', 'enhanced_data__category'
+    ).annotate(count=Count('pk'), total=Sum('amount'))
+
+    rollups = [
+        CashFlowRollup(
+            user=user,
+            account_id=row['account_id'],
+            date=row['day'],
+            transaction_type=row['transaction_type'],
+            category_id=row['enhanced_data__category'],
+            transaction_count=row['count'],
+            total_amount=row['total']
+        )
+        for row in rows
+    ]
+    CashFlowRollup.objects.filter(user=user).delete()
+    CashFlowRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def cash_flow(user, granularity, start_date, end_date, account_ids=None, category_ids=None):
+    """Credits, debits and net flow per day, week or month, read from the rollups.
+
+    Each bucket is keyed by its first day; weeks start on Monday. Credits are
+    deposits, incoming transfers and interest; debits are withdrawals, outgoing
+    transfers and fees.
+    """
+    rollups = CashFlowRollup.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
+    if account_ids:
+        rollups = rollups.filter(account_id__in=account_ids)
+    if category_ids:
+        rollups = rollups.filter(category_id__in=category_ids)
+
+    trunc = GRANULARITIES[granularity]
+    bucket = trunc('date') if trunc else F('date')
+    rows = rollups.annotate(period=bucket).order_by().values('period').annotate(
+        credits=Sum('total_amount', filter=Q(transaction_type__in=BankTransaction.CREDIT_TYPES)),
+        debits=Sum('total_amount', filter=Q(transaction_type__in=BankTransaction.DEBIT_TYPES)),
+        count=Sum('transaction_count'),
+    ).order_by('period')
+
+    series = []
+    for row in rows:
+        if not row['count']:
+            continue
+        credits = row['credits'] or Decimal('0.00')
+        debits = row['debits'] or Decimal('0.00')
+        series.append({
+            'period': row['period'],
+            'credits': credits,
+            'debits': debits,
+            'net': credits - debits,
+            'transaction_count': row['count'],
+        })
+    return series
@@ -0,0 +1,82 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'transactions_search'
+SEARCH_COLUMNS = 'description notes location tags category'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    """The FTS5 index only exists on SQLite (see transactions migration 0006)"""
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query, user_id=None):
+    """Turn free text into an FTS5 MATCH expression, or None if it has no words.
+
+    Every word must match, as a prefix, in one of the searchable columns, so
+    'coff star' finds 'Coffee at Starbucks'. Words are quoted, so FTS5 query
+    syntax typed by the user is matched literally.
+    """
+    tokens = _TOKEN.findall(query or '')
+    if not tokens:
+        return None
+    terms = ' AND '.join(f'"{token}"*' for token in tokens)
+    match = f'{{{SEARCH_COLUMNS}}} : ({terms})'
+    if user_id is not None:
+        match = f'owner : "u{int(user_id)}" AND {match}'
+    return match
+
+
+def search_ranked(user, query, after=None, limit=50):
+    """Ranked (transaction id, rank) pairs for a user's search, best first.
+
+    ``after`` is the (rank, id) of the last row of the previous page; the next
+    page seeks past it, so deep pages cost the same as the first one.
+    """
+    match = build_match(query, user.pk)
+    if match is None:
+        return []
+    if not is_available():
+        return _search_unranked(user, query, after, limit)
+
+    sql = f'SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    params = [match]
+    if after is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_unranked(user, query, after, limit):
+    """Description LIKE search for databases without the FTS5 index; every rank is 0"""
+    from banking.models import Transaction
+
+    transactions = Transaction.objects.filter(account__user=user)
+    for token in _TOKEN.findall(query):
+        transactions = transactions.filter(description__icontains=token)
+    if after is not None:
+        transactions = transactions.filter(pk__gt=after[1])
+    return [(pk, 0.0) for pk in transactions.order_by('pk').values_list('pk', flat=True)[:limit]]
+
+
+def matching_transactions(query, prefix=''):
+    """Q selecting rows whose bank transaction (reached through ``prefix``) matches the query.
+
+    Used by the admin search across all users.
+    """
+    if not is_available():
+        return Q(**{f'{prefix}description__icontains': query})
+    match = build_match(query)
+    if match is None:
+        return Q()
+    return Q(**{f'{prefix}pk__in': RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])})
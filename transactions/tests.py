@@ -1,3 +1,243 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import CacheVersion, User
+from banking.ledger import post_deposit
+from banking.models import Account, AccountType, Transaction
+
+from .aggregation import category_totals, subtree_totals
+from .categorization import KeywordAutomaton, RuleSet
+from .models import Category, CategoryRule, EnhancedTransaction, RecurringGroup, SplitTransaction
+from .recurring import detect_recurring
+from .search import search_ranked
+from .tree import get_category_tree
+from .versions import CATEGORY_RULES, CATEGORY_TREE, SYSTEM, version_key
+
+
+class CategoryTreeCacheTests(TestCase):
+    """The cached category trees follow the version counters in the database"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='tree@example.com', password='x', first_name='Tree', last_name='Test')
+        self.food = Category.objects.create(name='Food', category_type='expense', is_system=True)
+
+    def test_saved_category_is_seen(self):
+        self.assertEqual(set(get_category_tree(self.user).names), {self.food.pk})
+        child = Category.objects.create(name='Groceries', category_type='expense', user=self.user, parent=self.food)
+        tree = get_category_tree(self.user)
+        self.assertEqual(tree.subtree(self.food.pk), {self.food.pk, child.pk})
+
+    def test_bump_from_another_process_is_seen(self):
+        get_category_tree(self.user)
+        # Another server process writes the row and bumps the shared counter;
+        # nothing in this process is told about it
+        other = Category.objects.bulk_create([Category(name='Travel', category_type='expense', is_system=True)])[0]
+        self.assertNotIn(other.pk, get_category_tree(self.user))
+        CacheVersion.objects.filter(key=version_key(CATEGORY_TREE, SYSTEM)).update(version=99)
+        self.assertIn(other.pk, get_category_tree(self.user))
+
+
+class RuleMatchingTests(SimpleTestCase):
+    """RuleSet.match picks the best rule whose every condition holds"""
+
+    def ruleset(self, *rules):
+        return RuleSet([
+            CategoryRule(pk=pk, category_id=category, pattern=pattern, user_id=options.pop('user', 1), **options)
+            for pk, (category, pattern, options) in enumerate(rules, start=1)
+        ])
+
+    def test_overlapping_keywords_match_on_word_boundaries(self):
+        automaton = KeywordAutomaton()
+        for keyword in ('coffee', 'coffee shop', 'shop', 'hop'):
+            automaton.add(keyword, keyword)
+        automaton.build()
+        self.assertEqual(automaton.search('the coffee shop, downtown'), {'coffee', 'coffee shop', 'shop'})
+        self.assertEqual(automaton.search('coffeeshop'), set())
+        self.assertEqual(automaton.search('hip hop'), {'hop'})
+
+    def test_lowest_priority_wins_and_user_rules_break_ties(self):
+        ruleset = self.ruleset(
+            (10, 'coffee', {'priority': 50}),
+            (20, 'coffee shop', {'priority': 10}),
+            (30, 'coffee shop', {'priority': 10, 'user': None}),
+        )
+        self.assertEqual(ruleset.match('Coffee Shop #12', 4, 1, 'withdrawal'), 20)
+        self.assertEqual(ruleset.match('Coffee beans', 4, 1, 'withdrawal'), 10)
+        self.assertIsNone(ruleset.match('Tea room', 4, 1, 'withdrawal'))
+
+    def test_regex_rules(self):
+        ruleset = self.ruleset(
+            (10, r'^uber\s+(eats|trip)', {'match_type': 'regex'}),
+            (20, r'(\w)\1{2}', {'match_type': 'regex', 'priority': 200}),
+            (30, '[unclosed', {'match_type': 'regex'}),
+        )
+        self.assertEqual(ruleset.match('UBER  Trip 4411', 18, 1, 'withdrawal'), 10)
+        self.assertIsNone(ruleset.match('Paid uber eats', 18, 1, 'withdrawal'))
+        # A backreference keeps its rule out of the combined prefilter
+        self.assertIsNone(ruleset.regex_prefilter)
+        self.assertEqual(ruleset.match('Zzz Hotel', 18, 1, 'withdrawal'), 20)
+
+    def test_amount_account_and_type_conditions(self):
+        ruleset = self.ruleset(
+            (10, 'rent', {'min_amount': Decimal('500.00'), 'priority': 10}),
+            (20, 'rent', {'account_id': 7, 'priority': 20}),
+            (30, 'rent', {'transaction_type': 'deposit', 'priority': 30}),
+            (40, '', {'max_amount': Decimal('1.00'), 'priority': 40}),
+        )
+        self.assertEqual(ruleset.match('Rent', Decimal('800.00'), 3, 'withdrawal'), 10)
+        self.assertEqual(ruleset.match('Rent', Decimal('80.00'), 7, 'withdrawal'), 20)
+        self.assertEqual(ruleset.match('Rent', Decimal('80.00'), 3, 'deposit'), 30)
+        self.assertIsNone(ruleset.match('Rent', Decimal('80.00'), 3, 'withdrawal'))
+        # A blank pattern matches any description
+        self.assertEqual(ruleset.match('Card check', Decimal('0.50'), 3, 'withdrawal'), 40)
+
+
+class CategorizationRuleCacheTests(TestCase):
+    """Postings are categorized by the current rules, whichever process changed them"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='rules@example.com', password='x', first_name='Rule', last_name='Test')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='RULE0001')
+        self.food = Category.objects.create(name='Food', category_type='expense', is_system=True)
+        self.travel = Category.objects.create(name='Travel', category_type='expense', is_system=True)
+        self.rule = CategoryRule.objects.create(user=self.user, category=self.food, pattern='refund')
+
+    def category_of_next_posting(self):
+        txn = post_deposit(self.account, Decimal('10.00'), 'Airline refund')
+        return txn.enhanced_data.category_id
+
+    def test_changed_rule_applies_to_next_posting(self):
+        self.assertEqual(self.category_of_next_posting(), self.food.pk)
+        self.rule.category = self.travel
+        self.rule.save()
+        self.assertEqual(self.category_of_next_posting(), self.travel.pk)
+
+    def test_rule_changed_by_another_process_applies_to_next_posting(self):
+        self.assertEqual(self.category_of_next_posting(), self.food.pk)
+        CategoryRule.objects.filter(pk=self.rule.pk).update(category=self.travel)
+        CacheVersion.objects.filter(key=version_key(CATEGORY_RULES, self.user.pk)).update(version=99)
+        self.assertEqual(self.category_of_next_posting(), self.travel.pk)
+
+
+class CategoryTotalsTests(TestCase):
+    """Split amounts count towards their split categories and the remainder towards the parent's"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='totals@example.com', password='x', first_name='Tot', last_name='Als')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        account = Account.objects.create(user=self.user, account_type=account_type, account_number='TOTL0001')
+        self.food = Category.objects.create(name='Food', category_type='expense', is_system=True)
+        self.fun = Category.objects.create(name='Fun', category_type='expense', is_system=True)
+        for amount, split in (('30.00', '10.00'), ('15.00', '15.00')):
+            txn = account.transactions.create(transaction_type='withdrawal', amount=Decimal(amount), description='Night out')
+            parent = EnhancedTransaction.objects.create(bank_transaction=txn, category=self.food)
+            SplitTransaction.objects.create(parent_transaction=parent, amount=Decimal(split), category=self.fun)
+
+    def test_split_parent_keeps_the_remainder(self):
+        self.assertEqual(category_totals(self.user), {
+            'Food': {'count': 1, 'total': Decimal('20.00')},
+            'Fun': {'count': 2, 'total': Decimal('25.00')},
+        })
+
+    def test_subtree_totals_attribute_splits_alike(self):
+        self.assertEqual(subtree_totals(self.user, [self.food.pk]), {'count': 1, 'total': Decimal('20.00')})
+        self.assertEqual(subtree_totals(self.user, [self.food.pk, self.fun.pk]), {'count': 3, 'total': Decimal('45.00')})
+
+
+class RecurringDetectionTests(TestCase):
+    """Recurring series are grouped once, and re-runs keep the groups in step with the history"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='recurring@example.com', password='x', first_name='Recur', last_name='Ring')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        self.account = Account.objects.create(user=self.user, account_type=account_type, account_number='RECU0001')
+        self.account.deposit(Decimal('1000.00'))
+        self.today = timezone.localdate()
+        self.rent = [self.post(f'Rent payment #{n}', '500.00', days_ago=30 * n) for n in range(1, 5)]
+        self.post('Bookshop', '23.10', days_ago=40)
+        self.post('Bookshop', '8.45', days_ago=3)
+
+    def post(self, description, amount, days_ago):
+        txn = self.account.transactions.create(transaction_type='withdrawal', amount=Decimal(amount), description=description)
+        Transaction.objects.filter(pk=txn.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return txn.pk
+
+    def flagged(self):
+        return set(EnhancedTransaction.objects.filter(is_recurring=True, recurring_group__isnull=False)
+                   .values_list('bank_transaction_id', flat=True))
+
+    def test_monthly_series_is_detected(self):
+        self.assertEqual(detect_recurring([self.user.pk], today=self.today), (1, 4))
+        group = RecurringGroup.objects.get(user=self.user)
+        self.assertEqual((group.frequency, group.expected_amount, group.is_active), ('monthly', Decimal('500.00'), True))
+        self.assertEqual(self.flagged(), set(self.rent))
+
+    def test_rerun_is_idempotent(self):
+        detect_recurring([self.user.pk], today=self.today)
+        group = RecurringGroup.objects.get(user=self.user)
+        detect_recurring([self.user.pk], today=self.today)
+        self.assertEqual(list(RecurringGroup.objects.filter(user=self.user)), [group])
+        self.assertEqual(self.flagged(), set(self.rent))
+        # No second EnhancedTransaction for the transactions flagged before
+        self.assertEqual(EnhancedTransaction.objects.count(), len(self.rent))
+
+    def test_transactions_leaving_a_series_are_unflagged(self):
+        detect_recurring([self.user.pk], today=self.today)
+        group = RecurringGroup.objects.get(user=self.user)
+        Transaction.objects.filter(pk=self.rent[0]).update(description='Deposit refund')
+        detect_recurring([self.user.pk], today=self.today)
+        self.assertEqual(self.flagged(), set(self.rent[1:]))
+        cleared = EnhancedTransaction.objects.get(bank_transaction_id=self.rent[0])
+        self.assertEqual((cleared.is_recurring, cleared.recurring_group_id), (False, None))
+        self.assertEqual(list(RecurringGroup.objects.filter(user=self.user)), [group])
+
+        # Once no series is left, every flag goes and the group is closed
+        Transaction.objects.filter(pk__in=self.rent[1:3]).delete()
+        detect_recurring([self.user.pk], today=self.today)
+        self.assertEqual(self.flagged(), set())
+        group.refresh_from_db()
+        self.assertEqual((group.is_active, group.end_date), (False, self.today))
+
+    def test_group_follows_the_series_when_its_spelling_changes(self):
+        detect_recurring([self.user.pk], today=self.today)
+        group = RecurringGroup.objects.get(user=self.user)
+        Transaction.objects.filter(pk__in=self.rent).update(description='RENT PAYMENT')
+        detect_recurring([self.user.pk], today=self.today)
+        group.refresh_from_db()
+        self.assertEqual(list(RecurringGroup.objects.filter(user=self.user)), [group])
+        self.assertEqual((group.name, group.is_active), ('RENT PAYMENT', True))
+
+    def test_user_without_history_has_groups_closed(self):
+        detect_recurring([self.user.pk], today=self.today)
+        Transaction.objects.filter(account=self.account).delete()
+        detect_recurring([self.user.pk], today=self.today)
+        self.assertFalse(RecurringGroup.objects.filter(user=self.user, is_active=True).exists())
+
+
+class SearchIndexTests(TestCase):
+    """The FTS5 triggers keep the search index in step with edits and deletes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='search@example.com', password='x', first_name='Sear', last_name='Ch')
+        account_type = AccountType.objects.create(name='Checking', description='Checking')
+        account = Account.objects.create(user=self.user, account_type=account_type, account_number='SRCH0001')
+        self.txn = account.transactions.create(transaction_type='deposit', amount=Decimal('5.00'), description='Bakery')
+
+    def found(self, query):
+        return [pk for pk, rank in search_ranked(self.user, query)]
+
+    def test_edited_description_is_reindexed(self):
+        self.assertEqual(self.found('bakery'), [self.txn.pk])
+        self.txn.description = 'Florist'
+        self.txn.save()
+        self.assertEqual(self.found('florist'), [self.txn.pk])
+        self.assertEqual(self.found('bakery'), [])
+
+    def test_deleted_transaction_leaves_the_index(self):
+        self.txn.delete()
+        self.assertEqual(self.found('bakery'), [])
 
-# Create your tests here.
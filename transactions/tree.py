@@ -0,0 +1,70 @@
+import threading
+
+from .versions import CATEGORY_TREE, get_version
+
+# Trees of the most recently used users, oldest first
+MAX_CACHED_TREES = 1000
+_trees = {}
+_trees_lock = threading.Lock()
+
+
+class CategoryTree:
+    """The categories a user can see, with ancestor and descendant sets per category"""
+
+    def __init__(self, rows):
+        self.names = {}
+        self.parents = {}
+        for pk, name, parent_id in rows:
+            self.names[pk] = name
+            self.parents[pk] = parent_id
+
+        self.ancestors = {pk: self._walk_up(pk) for pk in self.names}
+        self.descendants = {pk: set() for pk in self.names}
+        for pk, ancestors in self.ancestors.items():
+            for ancestor in ancestors:
+                self.descendants[ancestor].add(pk)
+
+    def _walk_up(self, pk):
+        # Parents outside the visible set are treated as roots; the seen set
+        # stops on cycles an admin edit could introduce
+        ancestors = []
+        seen = {pk}
+        parent = self.parents[pk]
+        while parent in self.names and parent not in seen:
+            ancestors.append(parent)
+            seen.add(parent)
+            parent = self.parents[parent]
+        return ancestors
+
+    def __contains__(self, pk):
+        return pk in self.names
+
+    def subtree(self, pk):
+        """The category and all its descendants"""
+        return {pk} | self.descendants[pk]
+
+    def path(self, pk):
+        """Ancestors from the root down to the category's parent"""
+        return list(reversed(self.ancestors[pk]))
+
+
+def get_category_tree(user):
+    """The user's category tree, rebuilt only when a relevant category changed"""
+    from .models import Category
+
+    version = get_version(CATEGORY_TREE, user.pk)
+
+    with _trees_lock:
+        cached = _trees.get(user.pk)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    tree = CategoryTree(
+        Category.objects.filter(Category.visible_to(user)).order_by().values_list('pk', 'name', 'parent_id')
+    )
+    with _trees_lock:
+        _trees.pop(user.pk, None)
+        _trees[user.pk] = (version, tree)
+        while len(_trees) > MAX_CACHED_TREES:
+            del _trees[next(iter(_trees))]
+    return tree
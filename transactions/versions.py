@@ -0,0 +1,24 @@
+from accounts.cache import bump_versions, get_versions
+
+# The owner shared by every user for system-wide rows (user is NULL)
+SYSTEM = 'system'
+
+CATEGORY_TREE = 'category_tree'
+CATEGORY_RULES = 'category_rules'
+
+
+def version_key(namespace, owner):
+    return f'{namespace}_version:{owner}'
+
+
+def bump_version(namespace, user_id=None):
+    """Invalidate the caches built from a user's rows (or the system rows) in every process.
+
+    Called from the save or delete of such a row, inside its transaction.
+    """
+    bump_versions(version_key(namespace, user_id or SYSTEM))
+
+
+def get_version(namespace, user_id):
+    """(system version, user version); changes whenever either side is bumped"""
+    return get_versions(version_key(namespace, SYSTEM), version_key(namespace, user_id))